@@ -0,0 +1,275 @@
+"""Non-interactive subcommands for scripting: import, export, search, stats, shopping-list, plan,
+history, convert, and serve (the local HTTP/JSON service in server.py). search --catalogs DIR searches
+every catalog in a directory at once (see catalogs.py).
+
+Records are JSON Lines: one recipe object per line, in the same shape as
+the entries of recipes_data.json. Results go to stdout; status messages and
+per-record errors go to stderr.
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+from contextlib import redirect_stdout
+from datetime import datetime, date
+from typing import Iterable, Iterator, List, TextIO, Tuple
+from catalogs import CatalogRegistry
+from import_pipeline import import_lines
+from meal_planner import PlanConstraints
+from recipe_manager import RecipeManager
+from server import serve
+from storage import DataFileError, JsonStorage
+
+def _parse_date(value: str) -> date:
+    try:
+        return datetime.strptime(value, "%Y-%m-%d").date()
+    except ValueError:
+        raise argparse.ArgumentTypeError("use YYYY-MM-DD")
+
+def _parse_meal_categories(value: str) -> Tuple[str, List[str]]:
+    meal_type, sep, categories = value.partition('=')
+    if not sep or not meal_type.strip():
+        raise argparse.ArgumentTypeError("use MEAL=CATEGORY[,CATEGORY]")
+    return meal_type.strip().lower(), [category.strip() for category in categories.split(',')]
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        description="Personal Recipe Manager & Meal Planner. "
+                    "Run without a command to open the interactive menu.")
+    parser.add_argument('--data-file', default='recipes_data.json',
+                        help="catalog file (.json, or .db/.sqlite for SQLite)")
+    parser.add_argument('--journal', action='store_true',
+                        help="append each change to a journal instead of rewriting the file")
+    parser.add_argument('--lazy', action='store_true',
+                        help="load recipes from the JSON file on first use")
+    parser.add_argument('--max-resident', type=int,
+                        help="with --lazy, keep at most this many recipes in memory")
+    parser.add_argument('--metrics', metavar='FILE',
+                        help="write operation timings and I/O counters as JSON on exit")
+    parser.add_argument('--profile', metavar='FILE',
+                        help="run the session under cProfile and save the stats to FILE")
+    commands = parser.add_subparsers(dest='command')
+    
+    import_parser = commands.add_parser('import', help="add recipes from JSON Lines files")
+    import_parser.add_argument('files', nargs='*', default=['-'],
+                               help="input files ('-' or nothing for stdin)")
+    import_parser.add_argument('--workers', type=int, default=1,
+                               help="processes used to validate and normalize records")
+    import_parser.add_argument('--chunk-size', type=int, default=1000,
+                               help="records handed to a worker at a time")
+    
+    export_parser = commands.add_parser('export', help="write every recipe as JSON Lines")
+    export_parser.add_argument('-o', '--output', default='-', help="output file (default stdout)")
+    
+    search_parser = commands.add_parser('search', help="print matching recipes as JSON Lines")
+    search_parser.add_argument('query')
+    search_parser.add_argument('--limit', type=int, help="matches printed (per catalog with --catalogs)")
+    search_parser.add_argument('--catalogs', metavar='DIR',
+                               help="search every catalog in DIR (<name>.json or <name>.db) at once "
+                                    "instead of --data-file; results carry a 'catalog' field")
+    
+    commands.add_parser('stats', help="print recipe statistics as JSON")
+    
+    shopping_parser = commands.add_parser('shopping-list', help="print a shopping list as JSON Lines")
+    shopping_parser.add_argument('--start', type=_parse_date, default=date.today(),
+                                 help="first day (YYYY-MM-DD, default today)")
+    shopping_parser.add_argument('--days', type=int, default=7)
+    shopping_parser.add_argument('--itemized', action='store_true',
+                                 help="list amounts per recipe instead of totals")
+    
+    plan_parser = commands.add_parser('plan', help="generate a meal plan and print it as JSON Lines")
+    plan_parser.add_argument('--start', type=_parse_date, default=date.today(),
+                             help="first day (YYYY-MM-DD, default today)")
+    plan_parser.add_argument('--days', type=int, default=7)
+    plan_parser.add_argument('--max-time', type=int, help="maximum total minutes of cooking per day")
+    plan_parser.add_argument('--min-rating', type=int, default=0)
+    plan_parser.add_argument('--no-repeat', type=int, default=7,
+                             help="don't repeat a recipe within this many days")
+    plan_parser.add_argument('--category', action='append', default=[], type=_parse_meal_categories,
+                             metavar='MEAL=CATEGORY[,CATEGORY]',
+                             help="allowed categories for a meal type (repeatable)")
+    plan_parser.add_argument('--max-per-category', type=int,
+                             help="maximum meals of one category per day")
+    plan_parser.add_argument('--replace', action='store_true',
+                             help="replace meals already planned in the period")
+    plan_parser.add_argument('--time-budget', type=float, default=0.5,
+                             help="seconds spent improving the plan")
+    
+    history_parser = commands.add_parser('history', help="print meal-plan usage analytics as JSON")
+    history_parser.add_argument('--start', type=_parse_date, help="first day, YYYY-MM-DD (default: all history)")
+    history_parser.add_argument('--end', type=_parse_date, help="day after the last (default: all history)")
+    history_parser.add_argument('--period', choices=['week', 'month'], default='month',
+                                help="bucket size for ingredient and category usage")
+    history_parser.add_argument('--limit', type=int, default=10, help="recipes and ingredients listed")
+    history_parser.add_argument('--not-cooked', type=int, metavar='DAYS',
+                                help="also list recipes not planned in the last DAYS days")
+    
+    convert_parser = commands.add_parser('convert', help="rewrite the JSON data file in another format")
+    convert_parser.add_argument('--to', choices=['json', 'gzip', 'lzma'], required=True,
+                                help="plain JSON, or the dictionary-encoded format compressed with gzip or xz")
+    
+    serve_parser = commands.add_parser('serve', help="share the catalog over a local HTTP/JSON API")
+    serve_parser.add_argument('--host', default='127.0.0.1')
+    serve_parser.add_argument('--port', type=int, default=8080)
+    return parser
+
+def open_manager(args: argparse.Namespace) -> RecipeManager:
+    # A long-running server makes many small changes: journal them rather
+    # than rewriting the data file for each group
+    journal = args.journal or getattr(args, 'command', None) == 'serve'
+    return RecipeManager(args.data_file, journal=journal, lazy=args.lazy,
+                         max_resident=args.max_resident, compression=getattr(args, 'to', None))
+
+def write_diagnostics(manager: RecipeManager, path: str):
+    """Dump manager.diagnostics() as JSON"""
+    with open(path, 'w') as f:
+        json.dump(manager.diagnostics(), f, indent=2)
+        f.write('\n')
+
+def iter_lines(files: List[str]) -> Iterator[Tuple[str, int, str]]:
+    """Yield (source, line number, line) for every non-blank input line"""
+    for path in files:
+        f = sys.stdin if path == '-' else open(path, 'r', encoding='utf-8')
+        try:
+            for line_no, line in enumerate(f, 1):
+                if line.strip():
+                    yield ('<stdin>' if path == '-' else path), line_no, line
+        finally:
+            if f is not sys.stdin:
+                f.close()
+
+def write_lines(records: Iterable, out: TextIO):
+    for record in records:
+        out.write(json.dumps(record, ensure_ascii=False))
+        out.write('\n')
+
+def cmd_import(manager: RecipeManager, args: argparse.Namespace, out: TextIO) -> int:
+    report = import_lines(manager, iter_lines(args.files), args.workers, args.chunk_size)
+    print(f"Imported {report.imported} recipes in {report.elapsed:.2f}s "
+          f"({report.rate:.0f} recipes/s), {len(report.errors)} rejected, "
+          f"{report.unparsed_amounts} amounts without a quantity")
+    return 1 if report.errors else 0
+
+def cmd_export(manager: RecipeManager, args: argparse.Namespace, out: TextIO) -> int:
+    if args.output == '-':
+        write_lines(manager.iter_recipe_dicts(), out)
+    else:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            write_lines(manager.iter_recipe_dicts(), f)
+    return 0
+
+def cmd_search(manager: RecipeManager, args: argparse.Namespace, out: TextIO) -> int:
+    write_lines((recipe.to_dict() for recipe in manager.search_recipes(args.query)[:args.limit]), out)
+    return 0
+
+def cmd_search_catalogs(args: argparse.Namespace, out: TextIO) -> int:
+    if not os.path.isdir(args.catalogs):
+        print(f"No catalog directory {args.catalogs}")
+        return 1
+    registry = CatalogRegistry(args.catalogs, lazy=args.lazy, max_resident=args.max_resident)
+    try:
+        results = registry.search(args.query, limit=args.limit)
+    finally:
+        registry.close()
+    write_lines((dict(recipe.to_dict(), catalog=name)
+                 for name, recipes in results.items() for recipe in recipes), out)
+    return 0
+
+def cmd_stats(manager: RecipeManager, args: argparse.Namespace, out: TextIO) -> int:
+    out.write(json.dumps(manager.get_recipe_stats(), ensure_ascii=False) + '\n')
+    return 0
+
+def cmd_shopping_list(manager: RecipeManager, args: argparse.Namespace, out: TextIO) -> int:
+    if args.itemized:
+        shopping_list = manager.generate_shopping_list(args.start, args.days)
+    else:
+        shopping_list = manager.generate_aggregated_shopping_list(args.start, args.days)
+    write_lines(({'ingredient': ingredient, 'amounts': amounts}
+                 for ingredient, amounts in shopping_list.items()), out)
+    return 0
+
+def cmd_plan(manager: RecipeManager, args: argparse.Namespace, out: TextIO) -> int:
+    constraints = PlanConstraints(max_day_time=args.max_time, min_rating=args.min_rating,
+                                  meal_categories=dict(args.category),
+                                  max_per_category=args.max_per_category,
+                                  no_repeat_days=args.no_repeat)
+    result = manager.generate_meal_plan(args.start, args.days, constraints, args.replace,
+                                        args.time_budget)
+    write_lines(({'date': meal_date.isoformat(), 'meal_type': meal_type, 'recipe_id': recipe_id}
+                 for meal_date, meal_type, recipe_id in result.meals), out)
+    print(f"Planned {len(result.meals)} meals with {result.ingredients} distinct ingredients "
+          f"in {result.elapsed:.2f}s, {len(result.unfilled)} slots left empty")
+    return 1 if result.unfilled else 0
+
+def cmd_history(manager: RecipeManager, args: argparse.Namespace, out: TextIO) -> int:
+    report = {
+        'most_planned': [{'id': recipe.id, 'name': recipe.name, 'meals': meals}
+                         for recipe, meals in manager.most_planned(args.start, args.end, args.limit)],
+        'category_mix': [{'period': period.isoformat(), 'meals': mix}
+                         for period, mix in manager.category_mix(args.start, args.end, args.period)],
+        'ingredient_usage': [{'period': period.isoformat(), 'meals': dict(list(usage.items())[:args.limit])}
+                             for period, usage in manager.ingredient_usage(args.start, args.end, args.period)]
+    }
+    if args.not_cooked is not None:
+        report['not_cooked'] = [{'id': recipe.id, 'name': recipe.name, 'last_planned': last.isoformat()}
+                                for recipe, last in manager.not_cooked_in(args.not_cooked)]
+    out.write(json.dumps(report, ensure_ascii=False) + '\n')
+    return 0
+
+def cmd_convert(manager: RecipeManager, args: argparse.Namespace, out: TextIO) -> int:
+    if not isinstance(manager.storage, JsonStorage):
+        print("Only JSON data files can be converted; use storage.py to move a catalog to SQLite")
+        return 1
+    before = os.path.getsize(manager.data_file) if os.path.exists(manager.data_file) else 0
+    manager.save_data()
+    print(f"Wrote {manager.data_file} as {args.to}: {before:,} -> {os.path.getsize(manager.data_file):,} bytes")
+    return 0
+
+def cmd_serve(manager: RecipeManager, args: argparse.Namespace, out: TextIO) -> int:
+    try:
+        asyncio.run(serve(manager, args.host, args.port))
+    except KeyboardInterrupt:
+        print("Server stopped")
+    return 0
+
+COMMANDS = {
+    'import': cmd_import,
+    'export': cmd_export,
+    'search': cmd_search,
+    'stats': cmd_stats,
+    'shopping-list': cmd_shopping_list,
+    'plan': cmd_plan,
+    'history': cmd_history,
+    'convert': cmd_convert,
+    'serve': cmd_serve,
+}
+
+def run_command(args: argparse.Namespace) -> int:
+    """Run one subcommand; returns the process exit code"""
+    out = sys.stdout
+    # Keep stdout clean for results: the manager's progress messages go to stderr
+    with redirect_stdout(sys.stderr):
+        try:
+            if getattr(args, 'catalogs', None):
+                # Opens each catalog itself rather than --data-file
+                return cmd_search_catalogs(args, out)
+            manager = open_manager(args)
+        except DataFileError as e:
+            print(f"{e}. Nothing was changed; fix or move the file and try again.")
+            return 1
+        status = 1
+        try:
+            status = COMMANDS[args.command](manager, args, out)
+            if args.metrics:
+                write_diagnostics(manager, args.metrics)
+        except DataFileError as e:
+            print(e)
+        finally:
+            # Saves anything still pending and releases the data file
+            try:
+                manager.close()
+            except DataFileError as e:
+                print(e)
+                status = 1
+        return status
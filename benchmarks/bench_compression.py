@@ -0,0 +1,98 @@
+"""Compare the plain JSON data file with the gzip and xz compressed formats.
+
+For each catalog size, reports file size, save time, load time and peak
+memory while loading (traced in a separate run), plus each as a ratio of
+plain JSON. Usage:
+
+    python benchmarks/bench_compression.py --sizes 1000 10000 100000 -o compression.json
+"""
+import argparse
+import gc
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from contextlib import redirect_stdout
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from recipe_manager import RecipeManager
+from storage import JsonStorage
+from synthetic import write_catalog
+
+FORMATS = ('json', 'gzip', 'lzma')
+
+
+def timed(action, repeat: int) -> float:
+    """Median seconds of repeat runs of action()"""
+    samples = []
+    for _ in range(repeat):
+        gc.collect()
+        started = time.perf_counter()
+        action()
+        samples.append(time.perf_counter() - started)
+    return statistics.median(samples)
+
+
+def load(path: str) -> RecipeManager:
+    with redirect_stdout(sys.stderr):
+        return RecipeManager(path, snapshot=False)
+
+
+def peak_load_memory(path: str) -> int:
+    gc.collect()
+    tracemalloc.start()
+    manager = load(path)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    del manager
+    return peak
+
+
+def bench_size(tmp: str, size: int, days: int, repeat: int) -> dict:
+    source = load(write_catalog(os.path.join(tmp, f"source_{size}.json"), size, days))
+    results = {}
+    for name in FORMATS:
+        path = os.path.join(tmp, f"catalog_{size}.{name}")
+        storage = JsonStorage(path, name)
+        save = timed(lambda: storage.save(source.iter_recipe_dicts(), source.meal_plan.to_dict()), repeat)
+        results[name] = {
+            "file_bytes": os.path.getsize(path),
+            "save_s": round(save, 4),
+            "load_s": round(timed(lambda: load(path), repeat), 4),
+            "load_peak_bytes": peak_load_memory(path)
+        }
+    plain = results['json']
+    for name in FORMATS[1:]:
+        results[name]["vs_json"] = {key: round(results[name][key] / plain[key], 3)
+                                    for key in ("file_bytes", "save_s", "load_s", "load_peak_bytes")}
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark compressed data file formats")
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10000])
+    parser.add_argument('--days', type=int, default=365 * 3, help="days in the synthetic meal plan")
+    parser.add_argument('--repeat', type=int, default=3, help="runs per timing (median is reported)")
+    parser.add_argument('-o', '--output', default='-', help="JSON report file (default stdout)")
+    args = parser.parse_args(argv)
+
+    report = {"formats": list(FORMATS), "catalogs": {}}
+    with tempfile.TemporaryDirectory() as tmp:
+        for size in args.sizes:
+            print(f"Benchmarking {size} recipes...", file=sys.stderr)
+            report["catalogs"][str(size)] = bench_size(tmp, size, args.days, args.repeat)
+
+    output = json.dumps(report, indent=2)
+    if args.output == '-':
+        print(output)
+    else:
+        with open(args.output, 'w') as f:
+            f.write(output + '\n')
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,51 @@
+"""Time the bulk import pipeline at several worker counts.
+
+Reports the parallel phase (decoding, validating and normalizing records in
+worker processes) on its own, next to the whole import, which also merges
+the records into a manager on one thread and saves. Each has its speedup
+over one worker; the parallel phase can only scale up to the number of
+CPUs. Usage: python benchmarks/bench_import.py [count]
+"""
+import json
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from import_pipeline import import_lines, process_lines
+from recipe_manager import RecipeManager
+from synthetic import iter_recipe_dicts
+
+WORKER_COUNTS = (1, 2, 4, 8)
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 50000
+    lines = [("bench", i + 1, json.dumps(record))
+             for i, record in enumerate(iter_recipe_dicts(count))]
+    print(f"Records: {count} ({os.cpu_count()} CPUs)")
+
+    normalize_baseline = import_baseline = None
+    for workers in WORKER_COUNTS:
+        started = time.perf_counter()
+        for _ in process_lines(lines, workers):
+            pass
+        normalize = time.perf_counter() - started
+
+        with tempfile.TemporaryDirectory() as tmp:
+            manager = RecipeManager(os.path.join(tmp, "recipes.json"))
+            report = import_lines(manager, lines, workers)
+
+        normalize_baseline = normalize_baseline or normalize
+        import_baseline = import_baseline or report.elapsed
+        oversubscribed = "  (more workers than CPUs)" if workers > (os.cpu_count() or 1) else ""
+        print(f"  workers={workers}: normalize {normalize:6.2f}s ({count / normalize:8.0f} records/s, "
+              f"{normalize_baseline / normalize:.2f}x), "
+              f"import {report.elapsed:6.2f}s ({report.rate:8.0f} recipes/s, "
+              f"{import_baseline / report.elapsed:.2f}x){oversubscribed}")
+
+
+if __name__ == "__main__":
+    main()
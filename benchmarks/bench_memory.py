@@ -0,0 +1,99 @@
+"""Measure bytes per recipe / per planned day for the compact models.
+
+Compares the current Recipe/MealPlan against a copy of the original
+dict-backed classes, and shows what a plan's usage history adds once
+analytics have built it. Usage: python benchmarks/bench_memory.py [count]
+"""
+import gc
+import json
+import os
+import sys
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from models import MealPlan, Recipe
+from synthetic import make_meal_plan_dict, make_recipe_dicts
+
+
+class LegacyRecipe:
+    """The original dict-backed Recipe, kept here as the baseline"""
+
+    def __init__(self, data: dict):
+        self.id = data['id']
+        self.name = data['name']
+        self.ingredients = data['ingredients']
+        self.instructions = data['instructions']
+        self.prep_time = data['prep_time']
+        self.cook_time = data['cook_time']
+        self.servings = data['servings']
+        self.category = data['category']
+        self.created_date = data['created_date']
+        self.rating = data.get('rating', 0)
+        self.tags = data.get('tags', [])
+
+
+def measure(build, payload: str) -> int:
+    """Bytes still allocated by build(decoded payload) once the decoded input is gone"""
+    gc.collect()
+    tracemalloc.start()
+    baseline = tracemalloc.get_traced_memory()[0]
+    data = json.loads(payload)
+    result = build(data)
+    del data
+    gc.collect()
+    retained = tracemalloc.get_traced_memory()[0] - baseline
+    tracemalloc.stop()
+    del result
+    return retained
+
+
+def build_legacy_meals(meals: dict) -> dict:
+    return meals
+
+
+def build_meal_plan(meals: dict) -> MealPlan:
+    return MealPlan.from_dict({'meals': meals})
+
+
+def build_analysed_meal_plan(meals: dict) -> MealPlan:
+    meal_plan = build_meal_plan(meals)
+    meal_plan.history  # built on first use
+    return meal_plan
+
+
+def change(new: int, old: int) -> str:
+    """new relative to old, e.g. 35% smaller or 12% larger"""
+    ratio = 1 - new / old
+    return f"{100 * ratio:.0f}% smaller" if ratio >= 0 else f"{-100 * ratio:.0f}% larger"
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    recipes = make_recipe_dicts(count)
+    payload = json.dumps(recipes)
+    ids = [recipe['id'] for recipe in recipes]
+
+    # A household rotates through a few hundred favourites over three years
+    days = 365 * 3
+    meals = make_meal_plan_dict(ids, days)
+    meals_payload = json.dumps(meals)
+
+    legacy = measure(lambda data: [LegacyRecipe(item) for item in data], payload)
+    compact = measure(lambda data: [Recipe.from_dict(item) for item in data], payload)
+    legacy_plan = measure(build_legacy_meals, meals_payload)
+    compact_plan = measure(build_meal_plan, meals_payload)
+    analysed_plan = measure(build_analysed_meal_plan, meals_payload)
+
+    print(f"Recipes: {count}")
+    print(f"  dict-backed Recipe: {legacy / count:8.0f} bytes/recipe")
+    print(f"  compact Recipe:     {compact / count:8.0f} bytes/recipe ({change(compact, legacy)})")
+    print(f"Meal plan: {days} days x 3 meals")
+    print(f"  ISO-string dict:    {legacy_plan / days:8.0f} bytes/day")
+    print(f"  ordinal MealPlan:   {compact_plan / days:8.0f} bytes/day ({change(compact_plan, legacy_plan)})")
+    print(f"  with its history:   {analysed_plan / days:8.0f} bytes/day "
+          f"({change(analysed_plan, legacy_plan)})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,278 @@
+"""Time the main RecipeManager operations on synthetic catalogs.
+
+Writes one JSON document with latency percentiles and peak memory per
+catalog size, so results from two commits can be diffed or compared by a
+script. Usage:
+
+    python benchmarks/bench_suite.py --sizes 1000 10000 -o before.json
+    python benchmarks/bench_suite.py --sizes 1000 10000 --compare before.json
+    python benchmarks/bench_suite.py --sizes 100000 --backend sqlite
+    python benchmarks/bench_suite.py --sizes 20000 --baseline REVISION --max-cold-ratio 3
+
+--baseline also times a cold load (fresh interpreter, nothing cached) of
+the same catalog with the tree at that git revision, and --max-cold-ratio
+fails the run when this tree's cold load is more than that many times
+slower.
+"""
+import argparse
+import gc
+import io
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import tarfile
+import tempfile
+import time
+import tracemalloc
+from contextlib import redirect_stdout
+from datetime import date, datetime, timedelta
+from typing import Callable, Dict, List
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from meal_planner import PlanConstraints
+from recipe_manager import RecipeManager
+from synthetic import CATEGORIES, write_catalog
+
+SEARCH_QUERIES = ["chicken", "spicy curry", "garlic", "pasta", "basil", "no such dish"]
+MAX_TIMES = [15, 30, 45, 60, 90]
+PANTRIES = [["eggs", "flour", "milk", "butter", "sugar"], ["chicken", "rice", "garlic", "onion"],
+            ["pasta", "tomatoes", "basil", "parmesan cheese", "olive oil", "garlic"]]
+PLAN_START = date(2024, 1, 1)
+GENERATED_PLAN_START = date(2100, 1, 1)  # clear of the synthetic plan
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# Run in a fresh interpreter by cold_load(): argv is the source tree and the
+# data file; prints the seconds RecipeManager() took. Older trees have no
+# snapshot option, and this tree must not start from one.
+COLD_LOAD_SCRIPT = """
+import contextlib, inspect, os, sys, time
+sys.path.insert(0, sys.argv[1])
+from recipe_manager import RecipeManager
+options = {'snapshot': False} if 'snapshot' in inspect.signature(RecipeManager).parameters else {}
+with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+    started = time.perf_counter()
+    RecipeManager(sys.argv[2], **options)
+    elapsed = time.perf_counter() - started
+print(elapsed)
+"""
+
+
+def percentiles(samples: List[float]) -> Dict[str, float]:
+    """Summary of latencies in milliseconds (nearest-rank percentiles)"""
+    ordered = sorted(samples)
+
+    def ms(seconds: float) -> float:
+        return round(seconds * 1000, 4)
+
+    def rank(p: float) -> float:
+        return ms(ordered[min(len(ordered) - 1, int(p / 100 * len(ordered)))])
+
+    return {
+        "count": len(ordered),
+        "min_ms": ms(ordered[0]),
+        "p50_ms": rank(50),
+        "p90_ms": rank(90),
+        "p99_ms": rank(99),
+        "max_ms": ms(ordered[-1]),
+        "mean_ms": ms(sum(ordered) / len(ordered))
+    }
+
+
+def time_calls(call: Callable[[int], object], repeat: int) -> Dict[str, float]:
+    """Latency summary of call(i) for i in range(repeat)"""
+    samples = []
+    for i in range(repeat):
+        started = time.perf_counter()
+        call(i)
+        samples.append(time.perf_counter() - started)
+    return percentiles(samples)
+
+
+def open_manager(path: str, lazy: bool, snapshot: bool = False,
+                 query_cache_size: int = 0) -> RecipeManager:
+    # The query cache is off by default: the suite rotates through a few
+    # queries, so with it on most calls would measure a dict lookup
+    with open(os.devnull, 'w') as devnull, redirect_stdout(devnull):
+        return RecipeManager(path, lazy=lazy, snapshot=snapshot, query_cache_size=query_cache_size)
+
+
+def cold_load(tree: str, path: str, repeat: int) -> Dict[str, float]:
+    """Latency summary of loading path with the sources in tree, each in a new interpreter"""
+    samples = []
+    for _ in range(repeat):
+        completed = subprocess.run([sys.executable, "-c", COLD_LOAD_SCRIPT, tree, path],
+                                   capture_output=True, text=True, check=True)
+        samples.append(float(completed.stdout.split()[-1]))
+    return percentiles(samples)
+
+
+def checkout(revision: str, directory: str) -> str:
+    """Extract the tree at a git revision into directory and return it"""
+    archive = subprocess.run(["git", "archive", revision], capture_output=True, check=True,
+                             cwd=REPO_ROOT).stdout
+    with tarfile.open(fileobj=io.BytesIO(archive)) as tar:
+        tar.extractall(directory)
+    return directory
+
+
+def bench_catalog(path: str, args: argparse.Namespace, baseline_tree: str = None) -> dict:
+    results = {}
+
+    gc.collect()
+    tracemalloc.start()
+    manager = open_manager(path, args.lazy)
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    results["memory"] = {"load_peak_bytes": peak, "resident_bytes": current}
+    del manager
+    gc.collect()
+
+    results["load_data"] = time_calls(lambda i: open_manager(path, args.lazy), args.io_repeat)
+    if not args.lazy and args.backend == 'json':
+        # Before any snapshot or similarity sidecar exists
+        results["cold_load"] = cold_load(REPO_ROOT, path, args.io_repeat)
+        if baseline_tree is not None:
+            results["cold_load_baseline"] = cold_load(baseline_tree, path, args.io_repeat)
+    if not args.lazy and args.backend == 'json':
+        # Startup from the binary snapshot written after the first load
+        open_manager(path, False, snapshot=True)._snapshot.wait()
+        results["load_data_snapshot"] = time_calls(
+            lambda i: open_manager(path, False, snapshot=True), args.io_repeat)
+    manager = open_manager(path, args.lazy, query_cache_size=args.query_cache)
+
+    def save(i):
+        with open(os.devnull, 'w') as devnull, redirect_stdout(devnull):
+            manager.save_data()
+
+    results["save_data"] = time_calls(save, args.io_repeat)
+
+    repeat = args.repeat
+    results["search_recipes"] = time_calls(
+        lambda i: manager.search_recipes(SEARCH_QUERIES[i % len(SEARCH_QUERIES)]), repeat)
+    results["filter_by_category"] = time_calls(
+        lambda i: manager.filter_by_category(CATEGORIES[i % len(CATEGORIES)]), repeat)
+    results["filter_by_time"] = time_calls(
+        lambda i: manager.filter_by_time(MAX_TIMES[i % len(MAX_TIMES)]), repeat)
+    results["get_top_rated"] = time_calls(lambda i: manager.get_top_rated(10), repeat)
+    results["generate_shopping_list"] = time_calls(
+        lambda i: manager.generate_shopping_list(PLAN_START + timedelta(weeks=i % 52), 7), repeat)
+    results["get_recipe_stats"] = time_calls(lambda i: manager.get_recipe_stats(), repeat)
+    results["find_by_pantry"] = time_calls(
+        lambda i: manager.find_by_pantry(PANTRIES[i % len(PANTRIES)], ignore_staples=True), repeat)
+    # A month of generated meals, greedy pass only so the time budget does not dominate;
+    # batched so the plan is saved once, outside the timed calls
+    constraints = PlanConstraints(max_day_time=120, min_rating=3)
+    with open(os.devnull, 'w') as devnull, redirect_stdout(devnull), manager.batch():
+        results["generate_meal_plan"] = time_calls(
+            lambda i: manager.generate_meal_plan(GENERATED_PLAN_START, 31, constraints, replace=True,
+                                                 time_budget=0), min(repeat, 10))
+    return results
+
+
+def git_revision() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except OSError:
+        return ""
+
+
+def compare(baseline: dict, report: dict):
+    """Print p50 ratios against a previous report (>1.00x means slower now)"""
+    for size, catalog in report["catalogs"].items():
+        before = baseline.get("catalogs", {}).get(size)
+        if before is None:
+            continue
+        print(f"{size} recipes (vs {baseline.get('revision') or 'baseline'}):", file=sys.stderr)
+        for name, stats in catalog.items():
+            if isinstance(stats, dict) and "p50_ms" in stats and name in before:
+                old = before[name]["p50_ms"]
+                ratio = stats["p50_ms"] / old if old else float('inf')
+                print(f"  {name:24} {old:10.3f} ms -> {stats['p50_ms']:10.3f} ms  {ratio:6.2f}x",
+                      file=sys.stderr)
+
+
+def cold_load_ratios(report: dict) -> Dict[str, float]:
+    """{size: p50 cold load of this tree / p50 cold load of the baseline tree}"""
+    ratios = {}
+    for size, catalog in report["catalogs"].items():
+        if "cold_load_baseline" in catalog:
+            ratios[size] = catalog["cold_load"]["p50_ms"] / catalog["cold_load_baseline"]["p50_ms"]
+            print(f"{size} recipes: cold load {catalog['cold_load_baseline']['p50_ms']:.1f} ms at "
+                  f"{report['baseline']} -> {catalog['cold_load']['p50_ms']:.1f} ms  "
+                  f"{ratios[size]:.2f}x", file=sys.stderr)
+    return ratios
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark RecipeManager on synthetic catalogs")
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000],
+                        help="catalog sizes to run (e.g. 1000 10000 100000 1000000)")
+    parser.add_argument('--days', type=int, default=365 * 3, help="days in the meal plan")
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--repeat', type=int, default=100, help="calls per query benchmark")
+    parser.add_argument('--io-repeat', type=int, default=3, help="calls per load/save benchmark")
+    parser.add_argument('--backend', choices=['json', 'sqlite'], default='json')
+    parser.add_argument('--lazy', action='store_true', help="load JSON catalogs lazily")
+    parser.add_argument('--query-cache', type=int, default=0, metavar='SIZE',
+                        help="query cache size for the query benchmarks (default 0, off)")
+    parser.add_argument('-o', '--output', default='-', help="result file (default stdout)")
+    parser.add_argument('--compare', metavar='REPORT', help="print p50 changes against an earlier report")
+    parser.add_argument('--baseline', metavar='REVISION',
+                        help="also time a cold load with the tree at this git revision (JSON, eager only)")
+    parser.add_argument('--max-cold-ratio', type=float, metavar='RATIO',
+                        help="exit with status 1 if a cold load is more than RATIO times the baseline's")
+    args = parser.parse_args(argv)
+    if args.max_cold_ratio is not None and args.baseline is None:
+        parser.error("--max-cold-ratio needs --baseline")
+
+    report = {
+        "created": datetime.now().isoformat(),
+        "revision": git_revision(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "backend": args.backend,
+        "lazy": args.lazy,
+        "query_cache": args.query_cache,
+        "seed": args.seed,
+        "days": args.days,
+        "baseline": args.baseline,
+        "catalogs": {}
+    }
+    extension = '.db' if args.backend == 'sqlite' else '.json'
+    with tempfile.TemporaryDirectory() as tmp:
+        baseline_tree = None
+        if args.baseline:
+            baseline_tree = checkout(args.baseline, os.path.join(tmp, "baseline"))
+        for size in args.sizes:
+            print(f"Benchmarking {size} recipes...", file=sys.stderr)
+            path = write_catalog(os.path.join(tmp, f"catalog_{size}{extension}"), size,
+                                 days=args.days, seed=args.seed)
+            catalog = bench_catalog(path, args, baseline_tree)
+            catalog["file_bytes"] = os.path.getsize(path)
+            report["catalogs"][str(size)] = catalog
+            os.remove(path)
+    # ru_maxrss is in KiB on Linux
+    report["max_rss_kib"] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    if args.compare:
+        with open(args.compare) as f:
+            compare(json.load(f), report)
+    ratios = cold_load_ratios(report)
+
+    output = json.dumps(report, indent=2)
+    if args.output == '-':
+        print(output)
+    else:
+        with open(args.output, 'w') as f:
+            f.write(output + '\n')
+    if args.max_cold_ratio is not None and any(r > args.max_cold_ratio for r in ratios.values()):
+        print(f"Cold load is more than {args.max_cold_ratio}x the baseline's", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,197 @@
+"""Measure requests per second against the HTTP service (python main.py serve).
+
+Opens --clients keep-alive connections that each send requests back to back
+for --duration seconds: mostly searches, filters, stats and shopping lists,
+plus a --write-ratio share of ratings and planned meals. Prints throughput
+and latency percentiles for reads and writes as JSON. Without --url a server
+is started on a synthetic catalog of --size recipes in a temporary directory:
+
+    python benchmarks/load_test.py --size 10000 --clients 32 --duration 10
+    python benchmarks/load_test.py --url http://127.0.0.1:8080 --write-ratio 0.2
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import quote, urlsplit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench_suite import MAX_TIMES, SEARCH_QUERIES, percentiles
+from synthetic import CATEGORIES, write_catalog
+
+MAIN = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'main.py')
+
+
+class Client:
+    """One keep-alive HTTP/1.1 connection"""
+
+    def __init__(self, host: str, port: int):
+        self.host = host
+        self.port = port
+        self._reader = None
+        self._writer = None
+
+    async def request(self, method: str, path: str, payload: Optional[dict] = None) -> Tuple[int, object]:
+        if self._writer is None:
+            self._reader, self._writer = await asyncio.open_connection(self.host, self.port)
+        body = json.dumps(payload).encode('utf-8') if payload is not None else b''
+        self._writer.write((f"{method} {path} HTTP/1.1\r\nHost: {self.host}\r\n"
+                            f"Content-Length: {len(body)}\r\n\r\n").encode('latin-1') + body)
+        await self._writer.drain()
+        status = int((await self._reader.readline()).split()[1])
+        length = 0
+        while True:
+            line = await self._reader.readline()
+            if line in (b'\r\n', b''):
+                break
+            name, _, value = line.decode('latin-1').partition(':')
+            if name.strip().lower() == 'content-length':
+                length = int(value)
+        return status, json.loads(await self._reader.readexactly(length))
+
+    def close(self):
+        if self._writer is not None:
+            self._writer.close()
+
+
+def read_request(rng: random.Random) -> str:
+    kind = rng.randrange(5)
+    if kind == 0:
+        return f"/recipes?q={quote(rng.choice(SEARCH_QUERIES))}&limit=20"
+    if kind == 1:
+        return f"/recipes?category={quote(rng.choice(CATEGORIES))}&limit=20"
+    if kind == 2:
+        return f"/recipes?max_time={rng.choice(MAX_TIMES)}&limit=20"
+    if kind == 3:
+        return "/stats"
+    start = date(2024, 1, 1) + timedelta(days=rng.randrange(365))
+    return f"/shopping-list?start={start.isoformat()}&days=7"
+
+
+def write_request(rng: random.Random, recipe_ids: List[str]) -> Tuple[str, dict]:
+    recipe_id = rng.choice(recipe_ids)
+    if rng.random() < 0.5:
+        return f"/recipes/{recipe_id}/rating", {'rating': rng.randint(1, 5)}
+    day = date(2025, 1, 1) + timedelta(days=rng.randrange(365))
+    return "/meal-plan", {'date': day.isoformat(), 'meal_type': rng.choice(["breakfast", "lunch", "dinner"]),
+                          'recipe_id': recipe_id}
+
+
+async def run_client(client: Client, seed: int, deadline: float, write_ratio: float,
+                     recipe_ids: List[str], samples: Dict[str, List[float]], errors: List[str]):
+    rng = random.Random(seed)
+    while time.perf_counter() < deadline:
+        started = time.perf_counter()
+        if recipe_ids and rng.random() < write_ratio:
+            kind = 'writes'
+            path, payload = write_request(rng, recipe_ids)
+            status, body = await client.request('POST', path, payload)
+        else:
+            kind = 'reads'
+            path = read_request(rng)
+            status, body = await client.request('GET', path)
+        samples[kind].append(time.perf_counter() - started)
+        if status != 200:
+            errors.append(f"{status} {path}: {body}")
+    client.close()
+
+
+async def load_test(host: str, port: int, clients: int, duration: float, write_ratio: float) -> dict:
+    probe = Client(host, port)
+    status, top = await probe.request('GET', "/recipes/top?limit=200")
+    recipe_ids = [recipe['id'] for recipe in top['recipes']]
+    probe.close()
+
+    samples = {'reads': [], 'writes': []}
+    errors = []
+    started = time.perf_counter()
+    await asyncio.gather(*(run_client(Client(host, port), seed, started + duration, write_ratio,
+                                      recipe_ids, samples, errors) for seed in range(clients)))
+    elapsed = time.perf_counter() - started
+
+    probe = Client(host, port)
+    status, diagnostics = await probe.request('GET', "/diagnostics")
+    probe.close()
+    total = len(samples['reads']) + len(samples['writes'])
+    return {
+        "clients": clients,
+        "duration_s": round(elapsed, 3),
+        "requests": total,
+        "requests_per_s": round(total / elapsed, 1),
+        "errors": len(errors),
+        "first_errors": errors[:5],
+        "reads": percentiles(samples['reads']) if samples['reads'] else None,
+        "writes": percentiles(samples['writes']) if samples['writes'] else None,
+        "server": diagnostics.get('server')
+    }
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def wait_for_port(host: str, port: int, process: subprocess.Popen, timeout: float = 120):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError("server exited during startup")
+        try:
+            socket.create_connection((host, port), timeout=1).close()
+            return
+        except OSError:
+            time.sleep(0.2)
+    raise RuntimeError("server did not start in time")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Load test the recipe HTTP service")
+    parser.add_argument('--url', help="server to test (default: start one on a synthetic catalog)")
+    parser.add_argument('--size', type=int, default=10000, help="recipes in the synthetic catalog")
+    parser.add_argument('--days', type=int, default=365, help="days in the synthetic meal plan")
+    parser.add_argument('--clients', type=int, default=16, help="concurrent connections")
+    parser.add_argument('--duration', type=float, default=10.0, help="seconds to run")
+    parser.add_argument('--write-ratio', type=float, default=0.05, help="share of requests that write")
+    parser.add_argument('-o', '--output', help="write the JSON report here as well")
+    args = parser.parse_args(argv)
+
+    process = None
+    with tempfile.TemporaryDirectory() as workdir:
+        if args.url:
+            url = urlsplit(args.url)
+            host, port = url.hostname, url.port or 80
+        else:
+            path = os.path.join(workdir, 'catalog.json')
+            write_catalog(path, args.size, args.days, seed=42)
+            host, port = '127.0.0.1', free_port()
+            process = subprocess.Popen([sys.executable, MAIN, '--data-file', path, 'serve',
+                                        '--host', host, '--port', str(port)],
+                                       stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        try:
+            if process is not None:
+                wait_for_port(host, port, process)
+            report = asyncio.run(load_test(host, port, args.clients, args.duration, args.write_ratio))
+        finally:
+            if process is not None:
+                process.terminate()
+                process.wait()
+
+    text = json.dumps(report, indent=2)
+    print(text)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(text + '\n')
+
+
+if __name__ == '__main__':
+    main()
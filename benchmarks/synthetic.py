@@ -0,0 +1,85 @@
+"""Seeded generator for synthetic catalogs and meal plans.
+
+The same (count, seed) always produces the same catalog, so numbers from
+different commits are comparable.
+"""
+import os
+import random
+import sys
+import uuid
+from datetime import date, datetime, timedelta
+from typing import Iterator, List
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from storage import JsonStorage, migrate_json_to_sqlite
+
+CATEGORIES = ["Main Course", "Dessert", "Salad", "Appetizer", "Breakfast", "Soup"]
+INGREDIENTS = ["flour", "butter", "eggs", "salt", "pepper", "olive oil", "garlic", "onion",
+               "tomatoes", "milk", "sugar", "chicken", "rice", "parmesan cheese", "basil",
+               "lemon", "beef", "carrots", "potatoes", "cream", "mushrooms", "spinach",
+               "pasta", "cumin", "ginger", "soy sauce", "honey", "yogurt", "bacon", "tofu"]
+AMOUNTS = ["to taste", "1 tsp", "2 tbsp", "1 cup", "200g", "4 large", "1/2 cup",
+           "2 cloves", "500g", "1 l", "3 tbsp", "1 1/2 cups"]
+TAGS = ["quick", "healthy", "vegetarian", "italian", "baking", "family-friendly", "spicy",
+        "comfort", "summer", "one-pot"]
+ADJECTIVES = ["Spicy", "Creamy", "Classic", "Roasted", "Grilled", "Lemon", "Garlic",
+              "Smoky", "Herbed", "Crispy", "Slow-Cooked", "Easy"]
+DISHES = ["Pasta", "Curry", "Salad", "Soup", "Stew", "Risotto", "Tacos", "Pie", "Stir Fry",
+          "Casserole", "Omelette", "Pancakes", "Burger", "Bowl"]
+MEAL_TYPES = ("breakfast", "lunch", "dinner")
+
+
+def iter_recipe_dicts(count: int, seed: int = 42) -> Iterator[dict]:
+    """Yield count recipes in Recipe.to_dict() form"""
+    rng = random.Random(seed)
+    start = datetime(2020, 1, 1)
+    for i in range(count):
+        main_ingredient = rng.choice(INGREDIENTS)
+        yield {
+            'id': str(uuid.UUID(int=rng.getrandbits(128), version=4)),
+            'name': f"{rng.choice(ADJECTIVES)} {main_ingredient.title()} {rng.choice(DISHES)} {i}",
+            'ingredients': {name: rng.choice(AMOUNTS) for name in rng.sample(INGREDIENTS, 8)},
+            'instructions': [f"Step {step}" for step in range(1, 6)],
+            'prep_time': rng.randint(0, 60),
+            'cook_time': rng.randint(0, 120),
+            'servings': rng.randint(1, 8),
+            'category': rng.choice(CATEGORIES),
+            'created_date': (start + timedelta(seconds=rng.randint(0, 10 ** 8))).isoformat(),
+            'rating': rng.randint(0, 5),
+            'tags': rng.sample(TAGS, 3)
+        }
+
+
+def make_recipe_dicts(count: int, seed: int = 42) -> list:
+    return list(iter_recipe_dicts(count, seed))
+
+
+def make_meal_plan_dict(recipe_ids: List[str], days: int, first_day: date = date(2024, 1, 1),
+                        seed: int = 7, favourites: int = 300) -> dict:
+    """Three meals a day for days days, drawn from a pool of favourite recipes"""
+    rng = random.Random(seed)
+    pool = rng.sample(recipe_ids, min(favourites, len(recipe_ids)))
+    return {(first_day + timedelta(days=i)).isoformat():
+            {meal_type: rng.choice(pool) for meal_type in MEAL_TYPES}
+            for i in range(days)}
+
+
+def write_catalog(path: str, count: int, days: int = 365 * 3, seed: int = 42) -> str:
+    """Write a synthetic catalog in the format RecipeManager loads.
+
+    A .db/.sqlite path gets a JSON catalog migrated into SQLite. Returns path.
+    """
+    json_path = path
+    if os.path.splitext(path)[1].lower() in ('.db', '.sqlite', '.sqlite3'):
+        json_path = path + ".json"
+
+    # The generator is deterministic, so a first pass collects the ids the
+    # meal plan needs without holding every recipe in memory
+    recipe_ids = [recipe_data['id'] for recipe_data in iter_recipe_dicts(count, seed)]
+    meal_plan = {'meals': make_meal_plan_dict(recipe_ids, days)}
+    JsonStorage(json_path).save(iter_recipe_dicts(count, seed), meal_plan)
+    if json_path != path:
+        migrate_json_to_sqlite(json_path, path)
+        os.remove(json_path)
+    return path
@@ -0,0 +1,206 @@
+"""Several named catalogs served from one process.
+
+Each catalog is a data file in one directory (<name>.json, or <name>.db for
+SQLite). CatalogRegistry opens them on first use and keeps the most recently
+used ones loaded, within a count and an estimated memory budget; a catalog
+pushed out saves anything it has not persisted yet. Searches can fan out
+over every catalog at once on a thread pool.
+"""
+import os
+import re
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Dict, Iterable, List, Optional
+from recipe_manager import RecipeManager
+from models import Recipe
+from storage import DataFileError
+
+CATALOG_NAME = re.compile(r'^[A-Za-z0-9][A-Za-z0-9_-]*$')
+EXTENSIONS = ('.json', '.db')  # the first is used for new catalogs
+DEFAULT_MAX_OPEN = 8
+DEFAULT_WORKERS = 4
+
+class _Catalog:
+    __slots__ = ('manager', 'lock', 'pins', 'closing', 'memory')
+
+    def __init__(self):
+        self.manager = None
+        self.lock = threading.RLock()  # held while the catalog is loaded, in use or closing
+        self.pins = 0  # users right now, or waiting; a pinned catalog is never evicted
+        # Being closed by an eviction. The entry stays registered until the
+        # manager is closed, so a caller asking for it in the meantime waits
+        # on lock instead of opening a second manager on the same file.
+        self.closing = False
+        # manager.memory_estimate() when last used, taken under lock: the
+        # manager itself may be in use by another thread when it is needed
+        self.memory = 0
+
+class CatalogRegistry:
+    """Open catalogs by name, keeping at most max_open (and max_memory bytes) loaded.
+
+    Use a catalog inside `with registry.catalog(name) as manager:`; the
+    manager belongs to the caller until the block ends, so a catalog is
+    used by one thread at a time and is never evicted while in use.
+    Managers are opened with manager_options (e.g. journal=True).
+    """
+
+    def __init__(self, root: str, max_open: int = DEFAULT_MAX_OPEN, max_memory: Optional[int] = None,
+                 workers: int = DEFAULT_WORKERS, **manager_options):
+        self.root = root
+        self.max_open = max(max_open, 1)
+        self.max_memory = max_memory
+        self.workers = workers
+        self.manager_options = manager_options
+        self._catalogs = OrderedDict()  # {name: _Catalog}, least recently used first
+        self._lock = threading.Lock()  # guards _catalogs and pin counts
+        self.loads = 0
+        self.evictions = 0
+
+    def path_of(self, name: str) -> str:
+        """Data file of catalog name; a new catalog gets the first of EXTENSIONS"""
+        if not CATALOG_NAME.match(name):
+            raise ValueError(f"invalid catalog name {name!r}: use letters, digits, '-' and '_'")
+        for extension in EXTENSIONS:
+            path = os.path.join(self.root, name + extension)
+            if os.path.exists(path):
+                return path
+        return os.path.join(self.root, name + EXTENSIONS[0])
+
+    def names(self) -> List[str]:
+        """Catalogs on disk, sorted by name"""
+        found = set()
+        for entry in os.listdir(self.root):
+            name, extension = os.path.splitext(entry)
+            if extension in EXTENSIONS and CATALOG_NAME.match(name):
+                found.add(name)
+        return sorted(found)
+
+    def loaded(self) -> List[str]:
+        """Catalogs in memory, least recently used first"""
+        with self._lock:
+            return [name for name, catalog in self._catalogs.items() if catalog.manager is not None]
+
+    @contextmanager
+    def catalog(self, name: str):
+        """Borrow the manager of catalog name, loading it if needed"""
+        path = self.path_of(name)
+        with self._lock:
+            catalog = self._catalogs.get(name)
+            if catalog is None:
+                catalog = self._catalogs[name] = _Catalog()
+            self._catalogs.move_to_end(name)
+            catalog.pins += 1
+        try:
+            with catalog.lock:
+                if catalog.manager is None:
+                    catalog.manager = RecipeManager(path, **self.manager_options)
+                    with self._lock:
+                        self.loads += 1
+                try:
+                    yield catalog.manager
+                finally:
+                    catalog.memory = catalog.manager.memory_estimate()
+        finally:
+            with self._lock:
+                catalog.pins -= 1
+            self._evict()
+
+    def _unregister(self, name: str, catalog: _Catalog):
+        """Drop a closed catalog's entry unless a caller is already waiting to reopen it"""
+        with self._lock:
+            catalog.closing = False
+            if not catalog.pins and self._catalogs.get(name) is catalog:
+                del self._catalogs[name]
+
+    def _evict(self):
+        """Close least recently used idle catalogs until within max_open and max_memory"""
+        while True:
+            with self._lock:
+                loaded = [(name, catalog) for name, catalog in self._catalogs.items()
+                          if catalog.manager is not None and not catalog.closing]
+                over = len(loaded) > self.max_open
+                if not over and self.max_memory is not None and len(loaded) > 1:
+                    over = sum(catalog.memory for _, catalog in loaded) > self.max_memory
+                # The most recently used catalog always stays
+                idle = [(name, catalog) for name, catalog in loaded[:-1] if not catalog.pins]
+                if not over or not idle:
+                    return
+                name, catalog = idle[0]
+                catalog.closing = True
+            with catalog.lock:
+                with self._lock:
+                    if catalog.pins or catalog.manager is None:
+                        # Taken again (or closed) before we got the lock
+                        catalog.closing = False
+                        continue
+                try:
+                    catalog.manager.close()
+                except DataFileError as e:
+                    # Its changes are not on disk: keep it loaded, as the
+                    # least recently used, and try again on a later eviction
+                    print(f"Could not unload catalog {name}: {e}")
+                    with self._lock:
+                        catalog.closing = False
+                        if self._catalogs.get(name) is catalog:
+                            self._catalogs.move_to_end(name, last=False)
+                    return
+                catalog.manager = None
+                self._unregister(name, catalog)
+            with self._lock:
+                self.evictions += 1
+
+    def flush(self):
+        """Save every loaded catalog with unsaved changes"""
+        with self._lock:
+            catalogs = list(self._catalogs.values())
+        for catalog in catalogs:
+            with catalog.lock:
+                if catalog.manager is not None and catalog.manager.unsaved_changes:
+                    catalog.manager.save_data()
+
+    def close(self):
+        """Close every loaded catalog, saving unsaved changes.
+
+        Raises the first DataFileError once every catalog has been tried;
+        catalogs that could not be saved stay loaded.
+        """
+        with self._lock:
+            catalogs = list(self._catalogs.items())
+        failure = None
+        for name, catalog in catalogs:
+            with catalog.lock:
+                if catalog.manager is not None:
+                    try:
+                        catalog.manager.close()
+                    except DataFileError as e:
+                        failure = failure or e
+                        continue
+                    catalog.manager = None
+                self._unregister(name, catalog)
+        if failure is not None:
+            raise failure
+
+    def _search_one(self, name: str, query: str, limit: Optional[int]) -> List[Recipe]:
+        with self.catalog(name) as manager:
+            return manager.search_recipes(query)[:limit]
+
+    def search(self, query: str, names: Optional[Iterable[str]] = None,
+               limit: Optional[int] = None) -> Dict[str, List[Recipe]]:
+        """Search several catalogs (default: all) concurrently; {name: matches}, in name order.
+
+        limit caps the matches kept per catalog.
+        """
+        names = sorted(names) if names is not None else self.names()
+        with ThreadPoolExecutor(max_workers=max(1, min(self.workers, len(names)))) as pool:
+            futures = [(name, pool.submit(self._search_one, name, query, limit)) for name in names]
+            return {name: future.result() for name, future in futures}
+
+    def stats(self) -> Dict[str, object]:
+        with self._lock:
+            loaded = [(name, catalog) for name, catalog in self._catalogs.items()
+                      if catalog.manager is not None]
+            return {"loaded": [name for name, _ in loaded], "loads": self.loads,
+                    "evictions": self.evictions,
+                    "estimated_memory": sum(catalog.memory for _, catalog in loaded)}
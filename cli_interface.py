@@ -1,10 +1,15 @@
+import json
 from datetime import date, datetime, timedelta
+from typing import List, Optional
 from recipe_manager import RecipeManager
 from models import Recipe
+from recipe_browser import RecipeBrowser
+from meal_planner import MEAL_TYPES, PlanConstraints
+from storage import DataFileError
 
 class RecipeManagerCLI:
-    def __init__(self):
-        self.manager = RecipeManager()
+    def __init__(self, manager: Optional[RecipeManager] = None):
+        self.manager = manager if manager is not None else RecipeManager()
     
     def display_menu(self):
         print("\n" + "="*50)
@@ -18,7 +23,9 @@ class RecipeManagerCLI:
         print("6. Plan Meals")
         print("7. Generate Shopping List")
         print("8. View Statistics")
-        print("9. Exit")
+        print("9. What Can I Cook?")
+        print("10. Diagnostics")
+        print("11. Exit")
         print("-"*50)
     
     def get_user_input(self, prompt: str, input_type: type = str):
@@ -85,14 +92,34 @@ class RecipeManagerCLI:
             print("No recipes found. Add some recipes first!")
             return
         
-        for i, recipe in enumerate(self.manager.recipes.values(), 1):
-            print(f"\n{i}. {recipe.name}")
-            print(f"   Category: {recipe.category}")
-            print(f"   Time: {recipe.total_time()} minutes ({recipe.prep_time} prep + {recipe.cook_time} cook)")
-            print(f"   Servings: {recipe.servings}")
-            print(f"   Rating: {'⭐' * recipe.rating if recipe.rating > 0 else 'Not rated'}")
-            if recipe.tags:
-                print(f"   Tags: {', '.join(recipe.tags)}")
+        browser = RecipeBrowser(self.manager, describe=self._recipe_lines)
+        while True:
+            recipe_id = browser.browse("Show a recipe")
+            if recipe_id is None:
+                return
+            self.show_recipe(self.manager.recipes[recipe_id])
+            input("\nPress Enter to go back to the list...")
+    
+    def _recipe_lines(self, recipe: Recipe) -> List[str]:
+        lines = [recipe.name,
+                 f"Category: {recipe.category}",
+                 f"Time: {recipe.total_time()} minutes ({recipe.prep_time} prep + {recipe.cook_time} cook)",
+                 f"Servings: {recipe.servings}",
+                 f"Rating: {'⭐' * recipe.rating if recipe.rating > 0 else 'Not rated'}"]
+        if recipe.tags:
+            lines.append(f"Tags: {', '.join(recipe.tags)}")
+        return lines
+    
+    def show_recipe(self, recipe: Recipe):
+        print(f"\n{recipe.name} [{recipe.id}]")
+        for line in self._recipe_lines(recipe)[1:]:
+            print(f"   {line}")
+        print("   Ingredients:")
+        for ingredient, amount in recipe.ingredients.items():
+            print(f"   • {ingredient}: {amount}")
+        print("   Instructions:")
+        for step, instruction in enumerate(recipe.instructions, 1):
+            print(f"   {step}. {instruction}")
     
     def search_recipes(self):
         print("\n🔍 Search Recipes")
@@ -105,6 +132,12 @@ class RecipeManagerCLI:
             print(f"\nFound {len(results)} recipe(s):")
             for recipe in results:
                 print(f"- {recipe.name} ({recipe.category})")
+            
+            similar = self.manager.similar_recipes(results[0].id, 3)
+            if similar:
+                print(f"\nSimilar to {results[0].name}:")
+                for recipe, score in similar:
+                    print(f"- {recipe.name} ({score:.0%} overlap)")
         else:
             print("No recipes found matching your search.")
     
@@ -124,7 +157,8 @@ class RecipeManagerCLI:
             max_time = self.get_user_input("Maximum cooking time (minutes): ", int)
             results = self.manager.filter_by_time(max_time)
         elif choice == 3:
-            results = self.manager.get_top_rated()
+            self.browse_top_rated()
+            return
         else:
             print("Invalid option")
             return
@@ -136,6 +170,26 @@ class RecipeManagerCLI:
         else:
             print("No recipes found with the specified criteria.")
     
+    def browse_top_rated(self, page_size: int = 5):
+        """Page through rated recipes, best first"""
+        offset = 0
+        while True:
+            results = self.manager.get_top_rated(page_size, offset)
+            if not results:
+                if offset == 0:
+                    print("No recipes found with the specified criteria.")
+                break
+            
+            print(f"\nTop rated (#{offset + 1}-{offset + len(results)}):")
+            for recipe in results:
+                print(f"- {recipe.name} ({recipe.total_time()} min, Rating: {recipe.rating})")
+            
+            if len(results) < page_size:
+                break
+            if input("Show more? (y/n): ").lower() not in ['y', 'yes']:
+                break
+            offset += page_size
+    
     def rate_recipe(self):
         print("\n⭐ Rate Recipe")
         print("-" * 13)
@@ -144,21 +198,16 @@ class RecipeManagerCLI:
             print("No recipes to rate!")
             return
         
-        # Show recipes
-        recipes_list = list(self.manager.recipes.values())
-        for i, recipe in enumerate(recipes_list, 1):
-            print(f"{i}. {recipe.name} (Current rating: {recipe.rating})")
+        recipe_id = RecipeBrowser(self.manager).browse("Recipe to rate")
+        if recipe_id is None:
+            return
         
+        recipe = self.manager.recipes[recipe_id]
         try:
-            choice = self.get_user_input("Select recipe number: ", int) - 1
-            if 0 <= choice < len(recipes_list):
-                rating = self.get_user_input("Enter rating (1-5): ", int)
-                recipes_list[choice].set_rating(rating)
-                self.manager.save_data()
-                print(f"Rating updated for '{recipes_list[choice].name}'!")
-            else:
-                print("Invalid recipe selection.")
-        except (ValueError, IndexError):
+            rating = self.get_user_input(f"Enter rating for '{recipe.name}' (1-5): ", int)
+            recipe.set_rating(rating)
+            print(f"Rating updated for '{recipe.name}'!")
+        except ValueError:
             print("Invalid input.")
     
     def plan_meals(self):
@@ -169,27 +218,59 @@ class RecipeManagerCLI:
             print("No recipes available for meal planning!")
             return
         
-        # Show available recipes
-        recipes_list = list(self.manager.recipes.values())
-        print("Available recipes:")
-        for i, recipe in enumerate(recipes_list, 1):
-            print(f"{i}. {recipe.name}")
+        print("1. Plan a single meal")
+        print("2. Generate a plan automatically")
+        if self.get_user_input("Choose option: ", int) == 2:
+            self.generate_meal_plan()
+            return
         
         try:
             date_str = input("Enter date (YYYY-MM-DD): ")
             meal_date = datetime.strptime(date_str, "%Y-%m-%d").date()
-            meal_type = input("Meal type (breakfast/lunch/dinner): ").lower()
-            recipe_choice = self.get_user_input("Select recipe number: ", int) - 1
-            
-            if 0 <= recipe_choice < len(recipes_list):
-                recipe_id = recipes_list[recipe_choice].id
-                self.manager.meal_plan.add_meal(meal_date, meal_type, recipe_id)
-                self.manager.save_data()
-                print(f"Meal planned: {recipes_list[recipe_choice].name} for {meal_type} on {meal_date}")
-            else:
-                print("Invalid recipe selection.")
         except ValueError:
             print("Invalid date format. Use YYYY-MM-DD.")
+            return
+        meal_type = input("Meal type (breakfast/lunch/dinner): ").lower()
+        
+        recipe_id = RecipeBrowser(self.manager).browse(f"Recipe for {meal_type} on {meal_date}")
+        if recipe_id is None:
+            return
+        self.manager.plan_meal(meal_date, meal_type, recipe_id)
+        print(f"Meal planned: {self.manager.recipes[recipe_id].name} for {meal_type} on {meal_date}")
+    
+    def generate_meal_plan(self):
+        try:
+            start_date = datetime.strptime(input("Start date (YYYY-MM-DD): "), "%Y-%m-%d").date()
+        except ValueError:
+            print("Invalid date format. Use YYYY-MM-DD.")
+            return
+        days = self.get_user_input("Number of days: ", int)
+        max_time = input("Maximum cooking time per day in minutes (Enter for no limit): ").strip()
+        min_rating = input("Minimum rating 0-5 (Enter for any): ").strip()
+        no_repeat = input("Don't repeat a recipe within how many days? (Enter for 7): ").strip()
+        meal_categories = {}
+        for meal_type in MEAL_TYPES:
+            categories = input(f"Categories for {meal_type} (comma-separated, Enter for any): ")
+            meal_categories[meal_type] = [category.strip() for category in categories.split(',')
+                                          if category.strip()]
+        replace = input("Replace meals already planned in this period? (y/n): ")
+        try:
+            constraints = PlanConstraints(max_day_time=int(max_time) if max_time else None,
+                                          min_rating=int(min_rating) if min_rating else 0,
+                                          meal_categories=meal_categories,
+                                          no_repeat_days=int(no_repeat) if no_repeat else 7)
+        except ValueError:
+            print("Please enter whole numbers.")
+            return
+        
+        result = self.manager.generate_meal_plan(start_date, days, constraints,
+                                                 replace.lower() in ['y', 'yes'])
+        for meal_date, meal_type, recipe_id in result.meals:
+            print(f"{meal_date} {meal_type:9} {self.manager.recipes[recipe_id].name}")
+        print(f"\nPlanned {len(result.meals)} meals using {result.ingredients} distinct ingredients "
+              f"({result.elapsed:.2f}s)")
+        if result.unfilled:
+            print(f"{len(result.unfilled)} slot(s) left empty: no recipe fits the constraints.")
     
     def generate_shopping_list(self):
         print("\n🛒 Shopping List Generator")
@@ -200,15 +281,20 @@ class RecipeManagerCLI:
             start_date = datetime.strptime(start_date_str, "%Y-%m-%d").date()
             days = self.get_user_input("Number of days: ", int)
             
-            shopping_list = self.manager.generate_shopping_list(start_date, days)
+            shopping_list = self.manager.generate_aggregated_shopping_list(start_date, days)
             
             if shopping_list:
                 print(f"\n🛒 Shopping List ({start_date} to {start_date + timedelta(days=days-1)}):")
                 print("-" * 40)
                 for ingredient, amounts in shopping_list.items():
-                    print(f"• {ingredient}:")
-                    for amount in amounts:
-                        print(f"  - {amount}")
+                    print(f"• {ingredient}: {', '.join(amounts)}")
+                
+                show_details = input("\nShow amounts per recipe? (y/n): ")
+                if show_details.lower() in ['y', 'yes']:
+                    for ingredient, amounts in self.manager.generate_shopping_list(start_date, days).items():
+                        print(f"• {ingredient}:")
+                        for amount in amounts:
+                            print(f"  - {amount}")
             else:
                 print("No meals planned for the specified period.")
         except ValueError:
@@ -232,15 +318,111 @@ class RecipeManagerCLI:
         print("\nRecipes by Category:")
         for category, count in stats['categories'].items():
             print(f"  • {category}: {count}")
+        
+        if self.manager.meal_plan.meals:
+            if input("\nShow meal history analytics? (y/n): ").lower() in ['y', 'yes']:
+                self.view_meal_history()
+    
+    def view_meal_history(self, limit: int = 5):
+        try:
+            start = input("From date (YYYY-MM-DD, Enter for all history): ").strip()
+            end = input("Until date, exclusive (YYYY-MM-DD, Enter for all history): ").strip()
+            start_date = datetime.strptime(start, "%Y-%m-%d").date() if start else None
+            end_date = datetime.strptime(end, "%Y-%m-%d").date() if end else None
+        except ValueError:
+            print("Invalid date format. Use YYYY-MM-DD.")
+            return
+        
+        print("\nMost planned:")
+        for recipe, meals in self.manager.most_planned(start_date, end_date, limit):
+            print(f"  • {recipe.name}: {meals} meal(s)")
+        
+        print("\nCategory mix by month:")
+        for month, mix in self.manager.category_mix(start_date, end_date, 'month'):
+            if mix:
+                print(f"  {month:%Y-%m}: " + ", ".join(f"{category} {meals}" for category, meals in mix.items()))
+        
+        print(f"\nMost used ingredients by month (top {limit}):")
+        for month, usage in self.manager.ingredient_usage(start_date, end_date, 'month'):
+            if usage:
+                print(f"  {month:%Y-%m}: " + ", ".join(f"{name} {meals}" for name, meals in
+                                                   list(usage.items())[:limit]))
+        
+        days = input("\nList recipes not cooked in how many days? (Enter to skip): ").strip()
+        if days.isdigit():
+            stale = self.manager.not_cooked_in(int(days), limit=20)
+            for recipe, last in stale:
+                print(f"  • {recipe.name}: last planned {last}")
+            if not stale:
+                print("  Every planned recipe was cooked in that time.")
+    
+    def cook_from_pantry(self, limit: int = 10):
+        print("\n🥕 What Can I Cook?")
+        print("-" * 19)
+        
+        pantry = [item.strip() for item in input("Ingredients you have (comma-separated): ").split(',')]
+        pantry = [item for item in pantry if item]
+        if not pantry:
+            print("Enter at least one ingredient.")
+            return
+        ignore_staples = input("Assume staples (salt, pepper, oil, flour...) are on hand? (y/n): ")
+        results = self.manager.find_by_pantry(pantry, ignore_staples.lower() in ['y', 'yes'], limit)
+        
+        if not results:
+            print("No recipes found. Add some recipes first!")
+            return
+        print("\nBest matches for your pantry:")
+        for recipe, missing in results:
+            if missing:
+                print(f"- {recipe.name}: missing {len(missing)} ({', '.join(missing)})")
+            else:
+                print(f"- {recipe.name}: ✅ you have everything")
+    
+    def view_diagnostics(self):
+        print("\n🩺 Diagnostics")
+        print("-" * 14)
+        
+        report = self.manager.diagnostics()
+        if report["operations"]:
+            for line in self.manager.metrics.report_lines():
+                print(line)
+        else:
+            print("No operations timed yet.")
+        
+        for name, io in report["io"].items():
+            print(f"{name.title()} I/O: {io['bytes_read']:,} bytes read, "
+                  f"{io['bytes_written']:,} bytes written")
+        quantities = report["caches"]["quantities"]
+        print(f"Amount cache: {quantities['hits']} hits, {quantities['misses']} misses")
+        queries = report["caches"]["queries"]
+        print(f"Query cache: {queries['entries']}/{queries['maxsize']} entries, {queries['hits']} hits, "
+              f"{queries['misses']} misses, {queries['invalidations']} invalidations")
+        if "resident_recipes" in report["caches"]:
+            print(f"Recipes in memory: {report['caches']['resident_recipes']} of "
+                  f"{report['catalog']['recipes']}")
+        
+        path = input("\nWrite a JSON dump to file (Enter to skip): ").strip()
+        if path:
+            try:
+                with open(path, 'w') as f:
+                    json.dump(report, f, indent=2)
+                print(f"Diagnostics written to {path}")
+            except OSError as e:
+                print(f"Could not write {path}: {e}")
     
     def run(self):
         """Main application loop"""
         print("Welcome to Personal Recipe Manager & Meal Planner!")
         
         while True:
+            try:
+                if self.manager.reload_if_changed():
+                    print("\n🔄 Catalog updated with changes from another session.")
+            except DataFileError as e:
+                print(f"\n❌ Could not pick up changes from another session: {e}")
             self.display_menu()
             try:
-                choice = self.get_user_input("Select an option (1-9): ", int)
+                choice = self.get_user_input("Select an option (1-11): ", int)
                 
                 if choice == 1:
                     self.add_recipe()
@@ -259,10 +441,14 @@ class RecipeManagerCLI:
                 elif choice == 8:
                     self.view_statistics()
                 elif choice == 9:
+                    self.cook_from_pantry()
+                elif choice == 10:
+                    self.view_diagnostics()
+                elif choice == 11:
                     print("Thanks for using Recipe Manager! Goodbye! 👋")
                     break
                 else:
-                    print("Invalid option. Please choose 1-9.")
+                    print("Invalid option. Please choose 1-11.")
                 
                 input("\nPress Enter to continue...")
                 
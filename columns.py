@@ -0,0 +1,120 @@
+from array import array
+from itertools import compress
+from typing import Dict, Iterator, List, Tuple
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - numpy is optional
+    np = None
+
+class RecipeColumns:
+    """Numeric recipe attributes kept in parallel arrays, one row per recipe.
+
+    Rows follow insertion order, so filtered ids come back in the same order
+    as iterating RecipeManager.recipes. Range filters run vectorized with
+    NumPy when it is installed and fall back to a tight loop over the arrays.
+    Catalog-wide aggregates are updated on every change, so summary() is O(1).
+    """
+
+    def __init__(self):
+        self._rows = {}  # {recipe_id: row}
+        self._ids = []  # row -> recipe_id
+        self._prep = array('d')
+        self._cook = array('d')
+        self._total = array('d')
+        self._servings = array('d')
+        self._rating = array('b')
+        self._category = array('l')
+        self._category_codes = {}  # {category: code}
+        self._categories = []  # code -> category
+        self.category_counts = {}  # {category: recipe count}
+        self.total_time = 0
+        self.rated_count = 0
+        self.rating_sum = 0
+
+    def _category_code(self, category: str) -> int:
+        code = self._category_codes.get(category)
+        if code is None:
+            code = self._category_codes[category] = len(self._categories)
+            self._categories.append(category)
+        return code
+
+    def _count(self, category: str, total_time, rating: int, sign: int):
+        count = self.category_counts.get(category, 0) + sign
+        if count:
+            self.category_counts[category] = count
+        else:
+            del self.category_counts[category]
+        self.total_time += sign * total_time
+        if rating > 0:
+            self.rated_count += sign
+            self.rating_sum += sign * rating
+
+    def add(self, recipe_id: str, category: str, prep_time, cook_time, servings, rating: int):
+        """Add a recipe, or overwrite its row if it is already present"""
+        row = self._rows.get(recipe_id)
+        if row is None:
+            row = self._rows[recipe_id] = len(self._ids)
+            self._ids.append(recipe_id)
+            for column in (self._prep, self._cook, self._total, self._servings,
+                           self._rating, self._category):
+                column.append(0)
+        else:
+            self._count(self._categories[self._category[row]], self._total[row],
+                        self._rating[row], -1)
+
+        self._prep[row] = prep_time
+        self._cook[row] = cook_time
+        self._total[row] = prep_time + cook_time
+        self._servings[row] = servings
+        self._rating[row] = rating
+        self._category[row] = self._category_code(category)
+        self._count(category, prep_time + cook_time, rating, 1)
+
+    def set_rating(self, recipe_id: str, rating: int):
+        row = self._rows[recipe_id]
+        old_rating = self._rating[row]
+        if old_rating > 0:
+            self.rated_count -= 1
+            self.rating_sum -= old_rating
+        if rating > 0:
+            self.rated_count += 1
+            self.rating_sum += rating
+        self._rating[row] = rating
+
+    def ids_within_time(self, max_time) -> List[str]:
+        """Ids of recipes whose total time is at most max_time"""
+        if np is not None:
+            totals = np.frombuffer(self._total, dtype=np.float64)
+            return [self._ids[row] for row in np.flatnonzero(totals <= max_time)]
+        return list(compress(self._ids, (total <= max_time for total in self._total)))
+
+    def ids_in_category(self, category: str) -> List[str]:
+        """Ids of recipes whose category matches case-insensitively"""
+        category = category.lower()
+        codes = [code for code, name in enumerate(self._categories) if name.lower() == category]
+        if not codes:
+            return []
+        if np is not None:
+            column = np.frombuffer(self._category, dtype=np.dtype(f'i{self._category.itemsize}'))
+            return [self._ids[row] for row in np.flatnonzero(np.isin(column, codes))]
+        wanted = set(codes)
+        return list(compress(self._ids, (code in wanted for code in self._category)))
+
+    def rows(self) -> Iterator[Tuple[str, str, float, int]]:
+        """(recipe_id, category, total_time, rating) per recipe, in insertion order"""
+        categories = self._categories
+        for recipe_id, code, total, rating in zip(self._ids, self._category, self._total, self._rating):
+            yield recipe_id, categories[code], total, rating
+
+    def summary(self) -> Dict[str, any]:
+        return {
+            "total_recipes": len(self._ids),
+            "categories": dict(self.category_counts),
+            "total_time": self.total_time,
+            "rated_recipes": self.rated_count,
+            "total_rating": self.rating_sum
+        }
+
+    def __len__(self) -> int:
+        return len(self._ids)
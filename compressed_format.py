@@ -0,0 +1,159 @@
+"""Compressed data file format: gzip or xz compressed JSON Lines with a string dictionary.
+
+The decompressed stream holds one JSON value per line:
+
+    {"format": "recipe-catalog", "version": 1}
+    ["D", "2024-06-01", {"dinner": "<recipe id>", ...}]     one per planned day
+    ["S", "olive oil", "2 tbsp", ...]                        strings joining the dictionary
+    ["R", id, name, [ingredient, amount, ...], instructions, prep_time, cook_time,
+          servings, category, created_date, rating, [tag, ...]]
+
+Ingredient names and amounts, categories and tags are written as positions
+in the dictionary, and an "S" line adds new strings just before the first
+recipe using them, so neither writer nor reader needs a second pass. The
+meal plan comes first so recipes can be handed out one at a time as the
+file is read. Compressed files are recognized by their magic bytes.
+"""
+import gzip
+import json
+import lzma
+import os
+from typing import Iterable, Iterator, Optional, Tuple
+
+FORMAT = 'recipe-catalog'
+FORMAT_VERSION = 1
+COMPRESSIONS = ('gzip', 'lzma')
+MAGIC = {'gzip': b'\x1f\x8b', 'lzma': b'\xfd7zXZ\x00'}
+# A new data file named like this is written compressed from the start
+EXTENSIONS = {'.gz': 'gzip', '.xz': 'lzma'}
+# zlib's default level. xz's default preset 6 makes files about 15% smaller
+# than preset 3 but takes about 2.5x as long to write, and without a journal
+# every change is a full save
+GZIP_LEVEL = 6
+LZMA_PRESET = 3
+# Lines are handed to the compressor in batches of this many
+WRITE_BATCH = 512
+
+def detect_compression(path: str) -> Optional[str]:
+    """'gzip' or 'lzma' for a compressed data file, None for plain JSON.
+
+    A file that does not exist yet is judged by its extension.
+    """
+    try:
+        with open(path, 'rb') as f:
+            head = f.read(max(len(magic) for magic in MAGIC.values()))
+    except FileNotFoundError:
+        return EXTENSIONS.get(os.path.splitext(path)[1].lower())
+    for compression, magic in MAGIC.items():
+        if head.startswith(magic):
+            return compression
+    return None
+
+def open_compressed(file, mode: str, compression: str):
+    """Binary file object that (de)compresses file (a path or an open binary file) on the fly"""
+    if compression == 'gzip':
+        return gzip.open(file, mode, compresslevel=GZIP_LEVEL) if 'w' in mode else gzip.open(file, mode)
+    if compression == 'lzma':
+        return lzma.open(file, mode, preset=LZMA_PRESET) if 'w' in mode else lzma.open(file, mode)
+    raise ValueError(f"unknown compression {compression!r}: use one of {', '.join(COMPRESSIONS)}")
+
+def _line(value) -> bytes:
+    return (json.dumps(value, ensure_ascii=False, separators=(',', ':')) + '\n').encode('utf-8')
+
+def write_catalog(f, recipe_dicts: Iterable[dict], meal_plan_dict: dict) -> int:
+    """Stream a catalog to the binary file f; returns the number of recipes written"""
+    lines = [_line({'format': FORMAT, 'version': FORMAT_VERSION})]
+    for date_str, meals in meal_plan_dict.get('meals', {}).items():
+        lines.append(_line(['D', date_str, meals]))
+        if len(lines) >= WRITE_BATCH:
+            f.write(b''.join(lines))
+            lines = []
+
+    codes = {}  # {string: position in the dictionary}
+    new = []  # strings to announce before the current record
+
+    def code(text: str) -> int:
+        position = codes.get(text)
+        if position is None:
+            position = codes[text] = len(codes)
+            new.append(text)
+        return position
+
+    count = 0
+    for recipe_data in recipe_dicts:
+        ingredients = []
+        for ingredient, amount in recipe_data['ingredients'].items():
+            ingredients.append(code(ingredient))
+            ingredients.append(code(amount))
+        category = code(recipe_data['category'])
+        tags = [code(tag) for tag in recipe_data.get('tags', [])]
+        if new:
+            lines.append(_line(['S'] + new))
+            new.clear()
+        lines.append(_line(['R', recipe_data['id'], recipe_data['name'], ingredients,
+                            recipe_data['instructions'], recipe_data['prep_time'],
+                            recipe_data['cook_time'], recipe_data['servings'], category,
+                            recipe_data['created_date'], recipe_data.get('rating', 0), tags]))
+        count += 1
+        if len(lines) >= WRITE_BATCH:
+            f.write(b''.join(lines))
+            lines = []
+    f.write(b''.join(lines))
+    return count
+
+def _records(f, first_line: bytes) -> Iterator[dict]:
+    """Decode recipe records from the rest of f, closing it when done"""
+    strings = []
+    try:
+        line = first_line
+        while line:
+            entry = json.loads(line)
+            kind = entry[0]
+            if kind == 'S':
+                strings.extend(entry[1:])
+            elif kind == 'R':
+                (_, recipe_id, name, ingredients, instructions, prep_time, cook_time, servings,
+                 category, created_date, rating, tags) = entry
+                yield {
+                    'id': recipe_id,
+                    'name': name,
+                    'ingredients': {strings[ingredients[i]]: strings[ingredients[i + 1]]
+                                    for i in range(0, len(ingredients), 2)},
+                    'instructions': instructions,
+                    'prep_time': prep_time,
+                    'cook_time': cook_time,
+                    'servings': servings,
+                    'category': strings[category],
+                    'created_date': created_date,
+                    'rating': rating,
+                    'tags': [strings[tag] for tag in tags]
+                }
+            else:
+                raise ValueError(f"unexpected {kind!r} entry among recipes")
+            line = f.readline()
+    finally:
+        f.close()
+
+def read_catalog(path: str, compression: str) -> Tuple[dict, Iterator[dict]]:
+    """(meal plan dict, iterator over recipe dicts) of a compressed data file.
+
+    Only the meal plan is read up front; recipes are decompressed and
+    decoded one line at a time as the iterator is consumed.
+    """
+    f = open_compressed(path, 'rb', compression)
+    try:
+        header = json.loads(f.readline() or b'null')
+        if not isinstance(header, dict) or header.get('format') != FORMAT:
+            raise ValueError("not a compressed recipe catalog")
+        if header.get('version') != FORMAT_VERSION:
+            raise ValueError(f"unsupported catalog format version {header.get('version')}")
+        meals = {}
+        line = f.readline()
+        while line.startswith(b'["D"'):
+            _, date_str, day_meals = json.loads(line)
+            meals[date_str] = day_meals
+            line = f.readline()
+    except BaseException:
+        f.close()
+        raise
+    return {'meals': meals}, _records(f, line)
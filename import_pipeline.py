@@ -0,0 +1,158 @@
+"""Chunked, optionally parallel pipeline for importing external recipe dumps.
+
+Decoding, validation and normalization of each record is CPU-bound and
+independent, so chunks of raw JSON lines are fanned out to a
+ProcessPoolExecutor. Results come back in input order and are merged into
+the manager in one batch, so the outcome does not depend on the worker count.
+"""
+import json
+import time
+import uuid
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from typing import Iterable, Iterator, List, NamedTuple, Tuple
+from models import Recipe
+from quantities import collapse_spaces, normalize_name, parse_amount
+
+class RecordError(NamedTuple):
+    source: str
+    line_no: int
+    message: str
+
+class ImportReport:
+    def __init__(self):
+        self.imported = 0
+        self.errors = []  # [RecordError]
+        self.unparsed_amounts = 0  # amounts like "to taste" that won't sum in shopping lists
+        self.elapsed = 0.0
+
+    @property
+    def rate(self) -> float:
+        """Recipes imported per second"""
+        return self.imported / self.elapsed if self.elapsed > 0 else 0.0
+
+def normalize_record(record: dict) -> dict:
+    """Validate an imported record and return it in Recipe.to_dict() form.
+
+    id, created_date, rating and tags are optional. Raises ValueError with a
+    readable message for records that cannot be imported.
+    """
+    if not isinstance(record, dict):
+        raise ValueError("expected a JSON object")
+    name = record.get('name')
+    if not isinstance(name, str) or not name.strip():
+        raise ValueError("missing recipe name")
+    ingredients = record.get('ingredients', {})
+    if not isinstance(ingredients, dict):
+        raise ValueError("ingredients must be an object of name -> amount")
+    instructions = record.get('instructions', [])
+    if not isinstance(instructions, list):
+        raise ValueError("instructions must be a list")
+    tags = record.get('tags', [])
+    if not isinstance(tags, list):
+        raise ValueError("tags must be a list")
+
+    numbers = {}
+    for field, default in (('prep_time', 0), ('cook_time', 0), ('servings', 1), ('rating', 0)):
+        try:
+            numbers[field] = int(record.get(field, default))
+        except (TypeError, ValueError):
+            raise ValueError(f"{field} must be a whole number")
+        if numbers[field] < 0:
+            raise ValueError(f"{field} cannot be negative")
+    if numbers['rating'] > 5:
+        raise ValueError("rating must be between 0 and 5")
+
+    normalized_ingredients = {}
+    for ingredient, amount in ingredients.items():
+        ingredient = normalize_name(ingredient)
+        if ingredient:
+            normalized_ingredients[ingredient] = collapse_spaces(amount)
+    normalized_tags = []
+    for tag in tags:
+        tag = normalize_name(tag)
+        if tag and tag not in normalized_tags:
+            normalized_tags.append(tag)
+
+    created_date = str(record.get('created_date') or datetime.now().isoformat())
+    return {
+        'id': str(record['id']) if record.get('id') else None,
+        'name': collapse_spaces(name),
+        'ingredients': normalized_ingredients,
+        'instructions': [str(step).strip() for step in instructions if str(step).strip()],
+        'prep_time': numbers['prep_time'],
+        'cook_time': numbers['cook_time'],
+        'servings': numbers['servings'],
+        'category': collapse_spaces(record.get('category') or "Main Course"),
+        'created_date': created_date,
+        'rating': numbers['rating'],
+        'tags': normalized_tags
+    }
+
+def process_chunk(lines: List[Tuple[str, int, str]]) -> List[tuple]:
+    """Decode and normalize raw lines; runs in a worker process.
+
+    Returns (source, line_no, recipe_data or None, error message or None,
+    number of amounts that do not parse) per line, in input order.
+    """
+    results = []
+    for source, line_no, line in lines:
+        try:
+            recipe_data = normalize_record(json.loads(line))
+        except (ValueError, KeyError, TypeError) as e:
+            results.append((source, line_no, None, str(e), None))
+            continue
+        unparsed = sum(1 for amount in recipe_data['ingredients'].values()
+                       if parse_amount(amount) is None)
+        results.append((source, line_no, recipe_data, None, unparsed))
+    return results
+
+def _chunks(lines: Iterable[Tuple[str, int, str]], chunk_size: int) -> Iterator[list]:
+    chunk = []
+    for line in lines:
+        chunk.append(line)
+        if len(chunk) == chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+def process_lines(lines: Iterable[Tuple[str, int, str]], workers: int = 1,
+                  chunk_size: int = 1000) -> Iterator[tuple]:
+    """Yield process_chunk results for every line, in input order"""
+    if workers <= 1:
+        for chunk in _chunks(lines, chunk_size):
+            yield from process_chunk(chunk)
+        return
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        # A couple of chunks in flight per worker keeps them busy without
+        # reading the whole input into memory
+        pending = deque()
+        for chunk in _chunks(lines, chunk_size):
+            pending.append(executor.submit(process_chunk, chunk))
+            if len(pending) >= workers * 2:
+                yield from pending.popleft().result()
+        while pending:
+            yield from pending.popleft().result()
+
+def import_lines(manager, lines: Iterable[Tuple[str, int, str]], workers: int = 1,
+                 chunk_size: int = 1000) -> ImportReport:
+    """Import (source, line_no, json_line) records into a RecipeManager"""
+    report = ImportReport()
+    started = time.perf_counter()
+
+    def recipes() -> Iterator[Recipe]:
+        for source, line_no, recipe_data, error, unparsed in process_lines(lines, workers, chunk_size):
+            if error is not None:
+                report.errors.append(RecordError(source, line_no, error))
+                print(f"{source}:{line_no}: {error}")
+                continue
+            report.unparsed_amounts += unparsed
+            recipe_data['id'] = recipe_data['id'] or str(uuid.uuid4())
+            yield Recipe.from_dict(recipe_data)
+
+    report.imported = manager.add_recipes(recipes())
+    report.elapsed = time.perf_counter() - started
+    return report
@@ -0,0 +1,98 @@
+import json
+import os
+from typing import List, Tuple
+
+class Journal:
+    """Append-only log of catalog mutations kept next to the data file.
+
+    Each mutation is one JSON line, flushed and fsynced before append()
+    returns. Several processes may share a journal: appends happen under
+    the data file's lock, while readers take only complete lines and never
+    modify the file. A record torn by a crash is cut off by the next append.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._count = 0
+        self.offset = 0  # bytes of the file already read or written by us
+        self.bytes_read = 0
+        self.bytes_written = 0
+
+    def size(self) -> int:
+        try:
+            return os.path.getsize(self.path)
+        except OSError:
+            return 0
+
+    def append(self, op: dict):
+        """Durably append one mutation record"""
+        self.append_many([op])
+
+    def append_many(self, ops: List[dict]):
+        """Durably append several records with a single fsync (call with the file locked)"""
+        data = b''.join((json.dumps(op, separators=(',', ':')) + '\n').encode('utf-8') for op in ops)
+        with open(self.path, 'ab') as f:
+            end = f.seek(0, os.SEEK_END)
+            if end > self.offset:
+                self._truncate_torn_tail(f, end)
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+            self.offset = f.tell()
+        self._count += len(ops)
+        self.bytes_written += len(data)
+
+    def _truncate_torn_tail(self, f, end: int):
+        """Drop a partial last line left by a crashed writer"""
+        with open(self.path, 'rb') as reader:
+            reader.seek(self.offset)
+            tail = reader.read(end - self.offset)
+        complete = self.offset + tail.rfind(b'\n') + 1
+        if complete != end:
+            f.truncate(complete)
+            f.seek(complete)
+            print(f"Discarded incomplete journal record in {self.path}")
+
+    def tell(self) -> Tuple[int, int]:
+        """Where reading stopped, for seek() to go back to"""
+        return self.offset, self._count
+
+    def seek(self, position: Tuple[int, int]):
+        self.offset, self._count = position
+
+    def replay(self) -> List[dict]:
+        """Return every complete record from the start of the journal"""
+        self.offset = 0
+        self._count = 0
+        return self.read_new()
+
+    def read_new(self) -> List[dict]:
+        """Return complete records appended (by anyone) since the last read or append"""
+        records = []
+        try:
+            f = open(self.path, 'rb')
+        except FileNotFoundError:
+            return records
+        with f:
+            f.seek(self.offset)
+            for line in f:
+                if not line.endswith(b'\n'):
+                    break
+                try:
+                    records.append(json.loads(line))
+                except ValueError:
+                    break
+                self.offset += len(line)
+                self.bytes_read += len(line)
+        self._count += len(records)
+        return records
+
+    def clear(self):
+        """Drop all records once they have been folded into a snapshot"""
+        if os.path.exists(self.path):
+            os.remove(self.path)
+        self._count = 0
+        self.offset = 0
+
+    def __len__(self) -> int:
+        return self._count
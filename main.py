@@ -1,6 +1,10 @@
+import cProfile
+import sys
+from batch_cli import build_parser, open_manager, run_command, write_diagnostics
 from cli_interface import RecipeManagerCLI
 from recipe_manager import RecipeManager
 from models import Recipe
+from storage import DataFileError
 
 def add_sample_recipes(manager: RecipeManager):
     """Add some sample recipes for demonstration"""
@@ -110,12 +114,20 @@ def add_sample_recipes(manager: RecipeManager):
     
     print("✅ Sample recipes added successfully!")
 
-def main():
-    """Main function to run the Recipe Manager application"""
+def run_session(args) -> int:
+    """Run one subcommand or the interactive menu; returns the exit code"""
+    if args.command:
+        return run_command(args)
+    
     print("🍳 Initializing Personal Recipe Manager...")
     
     # Create CLI interface
-    app = RecipeManagerCLI()
+    try:
+        app = RecipeManagerCLI(open_manager(args))
+    except DataFileError as e:
+        print(f"❌ {e}")
+        print("Nothing was changed. Fix or move the file, or pick another with --data-file.")
+        return 1
     
     # Check if this is first run (no existing data)
     if not app.manager.recipes:
@@ -127,6 +139,24 @@ def main():
     
     # Run the main application
     app.run()
+    if args.metrics:
+        write_diagnostics(app.manager, args.metrics)
+    return 0
+
+def main(argv=None):
+    """Main function to run the Recipe Manager application"""
+    args = build_parser().parse_args(argv)
+    if not args.profile:
+        sys.exit(run_session(args))
+    
+    profiler = cProfile.Profile()
+    try:
+        status = profiler.runcall(run_session, args)
+    finally:
+        profiler.dump_stats(args.profile)
+        print(f"Profile written to {args.profile} (inspect with: python -m pstats {args.profile})",
+              file=sys.stderr)
+    sys.exit(status)
 
 if __name__ == "__main__":
     main()
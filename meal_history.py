@@ -0,0 +1,121 @@
+"""Rolling counts of planned meals, for usage analytics over any date window.
+
+MealPlan builds a MealHistory the first time analytics ask for it and then
+keeps it up to date as meals are planned, replaced and removed. The history
+holds counts only, per Monday-based week and per recipe; the meals
+themselves stay in the plan, which it reads for the two ragged ends of a
+window. Asking about years of history costs a few hundred dictionary
+merges, not a scan of every meal, and a plan nobody analyses carries no
+aggregates at all.
+"""
+from collections import Counter
+from datetime import date
+from typing import Dict, Iterator, Tuple
+
+WEEK = 7
+MAX_ORDINAL = date.max.toordinal()
+
+def week_of(ordinal: int) -> int:
+    """Monday-based week number of a date ordinal (ordinal 1 is a Monday)"""
+    return (ordinal - 1) // WEEK
+
+def periods(start_date: date, end_date: date, period: str) -> Iterator[Tuple[date, date]]:
+    """Split [start_date, end_date) into weeks (from Monday) or calendar months"""
+    if period not in ('day', 'week', 'month'):
+        raise ValueError(f"unknown period {period!r}: use day, week or month")
+    start, end = start_date.toordinal(), end_date.toordinal()
+    while start < end:
+        if period == 'day':
+            next_start = start + 1
+        elif period == 'week':
+            next_start = (week_of(start) + 1) * WEEK + 1
+        else:
+            day = date.fromordinal(start)
+            next_start = (date(day.year + 1, 1, 1) if day.month == 12
+                          else date(day.year, day.month + 1, 1)).toordinal()
+        yield date.fromordinal(start), date.fromordinal(min(next_start, end))
+        start = next_start
+
+class MealHistory:
+    __slots__ = ('_plan', '_weeks', '_totals')
+
+    def __init__(self, plan):
+        self._plan = plan  # the MealPlan counted, only read here
+        self._weeks = {}  # {week: {recipe_id: meals}}
+        self._totals = {}  # {recipe_id: meals}
+        for day, _, recipe_id in plan.iter_meals(date.min, date.max):
+            self.add(day.toordinal(), recipe_id)
+
+    @staticmethod
+    def _bump(counts: Dict[str, int], recipe_id: str, delta: int):
+        count = counts.get(recipe_id, 0) + delta
+        if count > 0:
+            counts[recipe_id] = count
+        else:
+            counts.pop(recipe_id, None)
+
+    def add(self, ordinal: int, recipe_id: str):
+        self._bump(self._weeks.setdefault(week_of(ordinal), {}), recipe_id, 1)
+        self._bump(self._totals, recipe_id, 1)
+
+    def remove(self, ordinal: int, recipe_id: str):
+        week = week_of(ordinal)
+        bucket = self._weeks.get(week)
+        if bucket is not None:
+            self._bump(bucket, recipe_id, -1)
+            if not bucket:
+                del self._weeks[week]
+        self._bump(self._totals, recipe_id, -1)
+
+    def _meals(self, start: int, end: int) -> Iterator[Tuple[date, str, str]]:
+        """The plan's (date, meal_type, recipe_id) from ordinal start up to end"""
+        start, end = max(start, 1), min(end, MAX_ORDINAL)
+        if start >= end:
+            return iter(())
+        return self._plan.iter_meals(date.fromordinal(start), date.fromordinal(end))
+
+    def _count_days(self, totals: Counter, start: int, end: int):
+        totals.update(recipe_id for _, _, recipe_id in self._meals(start, end))
+
+    def counts(self, start_date: date, end_date: date) -> Counter:
+        """{recipe_id: meals planned in [start_date, end_date)}"""
+        start, end = start_date.toordinal(), end_date.toordinal()
+        totals = Counter()
+        first_week = week_of(start - 1) + 1  # first week starting on or after start
+        last_week = week_of(end)  # week containing end, excluded
+        if first_week >= last_week:
+            self._count_days(totals, start, end)
+            return totals
+        self._count_days(totals, start, first_week * WEEK + 1)
+        if last_week - first_week < len(self._weeks):
+            for week in range(first_week, last_week):
+                totals.update(self._weeks.get(week, {}))
+        else:
+            for week, bucket in self._weeks.items():
+                if first_week <= week < last_week:
+                    totals.update(bucket)
+        self._count_days(totals, last_week * WEEK + 1, end)
+        return totals
+
+    def last_planned(self, before: date) -> Dict[str, date]:
+        """{recipe_id: latest day before before it is planned on}, for recipes planned before then"""
+        end = before.toordinal()
+        last = {}
+
+        def scan(first: int, stop: int):
+            for day, _, recipe_id in reversed(list(self._meals(first, stop))):
+                last.setdefault(recipe_id, day)
+
+        # The days of before's own week, then whole weeks going back, only
+        # opening the weeks that hold a recipe not seen yet
+        current = week_of(end - 1)
+        scan(current * WEEK + 1, end)
+        for week in sorted((week for week in self._weeks if week < current), reverse=True):
+            if len(last) == len(self._totals):
+                break
+            if not self._weeks[week].keys() <= last.keys():
+                scan(week * WEEK + 1, (week + 1) * WEEK + 1)
+        return last
+
+    def __len__(self) -> int:
+        return sum(self._totals.values())
@@ -0,0 +1,290 @@
+"""Automatic meal plans: fill every meal slot of a date range under constraints.
+
+Planning works on compact candidates (id, category, total time, rating and
+an ingredient bitset from PantryIndex), never on full Recipe objects. A
+greedy pass builds a complete plan from a shortlist of promising recipes
+per meal type; the rest of the time budget goes to local search, which
+swaps single meals whenever that keeps every constraint and buys fewer
+distinct ingredients or better-rated recipes.
+"""
+import random
+import time
+from datetime import date
+from heapq import nsmallest
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+from pantry import _popcount
+
+MEAL_TYPES = ("breakfast", "lunch", "dinner")
+# The greedy pass only looks at the best POOL_SIZE recipes per meal type,
+# plus the FAST_POOL_SIZE quickest so tight daily time limits stay solvable
+POOL_SIZE = 300
+FAST_POOL_SIZE = 50
+# Recipes tried per slot before giving up on keeping the rest of its day solvable
+LOOKAHEAD_TRIES = 50
+# Local search samples a replacement from the whole catalog this often,
+# and from the shortlist otherwise
+EXPLORE_RATE = 0.3
+MAX_ITERATIONS = 200000
+
+class PlanConstraints:
+    """What a generated plan must satisfy, and how plans are compared.
+
+    max_day_time caps the summed total time of a day's meals. meal_categories
+    maps a meal type to the categories allowed for it (any if absent), and
+    max_per_category caps the meals of one category per day. A recipe is not
+    planned again within no_repeat_days days of itself (1: not twice a day).
+    Among valid plans, each distinct ingredient to buy costs
+    ingredient_weight and each rating star earns rating_weight.
+    """
+
+    def __init__(self, max_day_time: Optional[int] = None, min_rating: int = 0,
+                 meal_categories: Optional[Dict[str, Iterable[str]]] = None,
+                 max_per_category: Optional[int] = None, no_repeat_days: int = 7,
+                 meal_types: Sequence[str] = MEAL_TYPES, ingredient_weight: float = 1.0,
+                 rating_weight: float = 1.0):
+        self.max_day_time = max_day_time
+        self.min_rating = min_rating
+        self.meal_categories = {meal_type: {category.lower() for category in categories}
+                                for meal_type, categories in (meal_categories or {}).items()
+                                if categories}
+        self.max_per_category = max_per_category
+        self.no_repeat_days = no_repeat_days
+        self.meal_types = tuple(meal_types)
+        self.ingredient_weight = ingredient_weight
+        self.rating_weight = rating_weight
+
+class PlanResult:
+    def __init__(self):
+        self.meals = []  # [(date, meal_type, recipe_id)] generated, in slot order
+        self.unfilled = []  # [(date, meal_type)] slots no recipe could fill
+        self.ingredients = 0  # distinct ingredients over the range, kept meals included
+        self.total_rating = 0  # of the generated meals
+        self.iterations = 0  # local search moves tried
+        self.elapsed = 0.0
+
+class MealPlanGenerator:
+    """Constraint-respecting plan search over a catalog of candidates.
+
+    candidates are (recipe_id, category, total_time, rating, ingredient
+    bitset) tuples; bits only need to be consistent across candidates.
+    """
+
+    def __init__(self, candidates: Iterable[Tuple[str, str, float, int, int]],
+                 constraints: Optional[PlanConstraints] = None, seed: int = 0):
+        self.constraints = constraints if constraints is not None else PlanConstraints()
+        self._ids = []
+        self._categories = []  # lowercased
+        self._times = []
+        self._ratings = []
+        self._masks = []  # candidate -> ingredient bitset
+        self._bits = []  # candidate -> tuple of its set bits, filled on first use
+        self._index = {}  # {recipe_id: candidate}
+        for recipe_id, category, total_time, rating, mask in candidates:
+            self._index[recipe_id] = len(self._ids)
+            self._ids.append(recipe_id)
+            self._categories.append(category.lower())
+            self._times.append(total_time)
+            self._ratings.append(rating)
+            self._masks.append(mask)
+            self._bits.append(None)
+        self._random = random.Random(seed)
+
+    def _bits_of(self, candidate: int) -> Tuple[int, ...]:
+        bits = self._bits[candidate]
+        if bits is None:
+            mask = self._masks[candidate]
+            found = []
+            while mask:
+                lowest = mask & -mask
+                found.append(lowest.bit_length() - 1)
+                mask ^= lowest
+            bits = self._bits[candidate] = tuple(found)
+        return bits
+
+    def _eligible(self, meal_type: str) -> List[int]:
+        """Candidates allowed in meal_type slots, in catalog order"""
+        constraints = self.constraints
+        allowed = constraints.meal_categories.get(meal_type)
+        max_time = constraints.max_day_time
+        return [candidate for candidate in range(len(self._ids))
+                if self._ratings[candidate] >= constraints.min_rating
+                and (max_time is None or self._times[candidate] <= max_time)
+                and (allowed is None or self._categories[candidate] in allowed)]
+
+    def _shortlist(self, eligible: List[int]) -> List[int]:
+        """Best-rated recipes with the fewest ingredients, plus the quickest ones"""
+        rating_weight = self.constraints.rating_weight
+        ingredient_weight = self.constraints.ingredient_weight
+        masks, ratings, times = self._masks, self._ratings, self._times
+        best = nsmallest(POOL_SIZE, eligible, key=lambda candidate: (
+            ingredient_weight * _popcount(masks[candidate]) - rating_weight * ratings[candidate],
+            times[candidate]))
+        fastest = nsmallest(FAST_POOL_SIZE, eligible, key=times.__getitem__)
+        return list(dict.fromkeys(best + fastest))
+
+    def generate(self, start_date: date, days: int,
+                 fixed: Iterable[Tuple[date, str, str]] = (),
+                 time_budget: float = 0.5) -> PlanResult:
+        """Fill the open slots of days days from start_date.
+
+        fixed lists meals that are already planned, (date, meal_type,
+        recipe_id): those inside the range occupy their slot and count
+        toward that day's limits and the ingredient total; those outside it
+        only count for no_repeat_days. Stops improving after time_budget
+        seconds; the first complete plan is always returned.
+        """
+        started = time.perf_counter()
+        deadline = started + time_budget
+        constraints = self.constraints
+        meal_types = constraints.meal_types
+        window = constraints.no_repeat_days
+        max_time = constraints.max_day_time
+        max_per_category = constraints.max_per_category
+        times, ratings, categories, masks = self._times, self._ratings, self._categories, self._masks
+        ingredient_weight, rating_weight = constraints.ingredient_weight, constraints.rating_weight
+        result = PlanResult()
+        days = max(days, 0)
+
+        eligible = {meal_type: self._eligible(meal_type) for meal_type in meal_types}
+        shortlist = {meal_type: self._shortlist(candidates) for meal_type, candidates in eligible.items()}
+        quickest = {meal_type: min((times[candidate] for candidate in candidates), default=None)
+                    for meal_type, candidates in eligible.items()}
+
+        # Plan state: slot = day * len(meal_types) + meal type position
+        slots = [None] * (days * len(meal_types))
+        open_slots = set(range(len(slots)))
+        day_time = [0] * days
+        day_categories = [dict() for _ in range(days)]
+        uses = {}  # {candidate: [day offsets it is planned on]}
+        counts = {}  # {ingredient bit: meals in the range using it}
+
+        def place(slot: Optional[int], day: int, candidate: int):
+            if slot is not None:
+                slots[slot] = candidate
+            if 0 <= day < days:
+                day_time[day] += times[candidate]
+                day_categories[day][categories[candidate]] = day_categories[day].get(categories[candidate], 0) + 1
+                for bit in self._bits_of(candidate):
+                    counts[bit] = counts.get(bit, 0) + 1
+            uses.setdefault(candidate, []).append(day)
+
+        def unplace(slot: int, day: int, candidate: int):
+            slots[slot] = None
+            day_time[day] -= times[candidate]
+            day_categories[day][categories[candidate]] -= 1
+            for bit in self._bits_of(candidate):
+                counts[bit] -= 1
+            uses[candidate].remove(day)
+
+        def allowed(candidate: int, day: int, extra_time: float = 0, replacing: Optional[int] = None) -> bool:
+            """Whether candidate fits day, optionally in place of the meal replacing"""
+            if candidate == replacing:
+                return False
+            if max_time is not None:
+                spent = day_time[day] - (times[replacing] if replacing is not None else 0)
+                if spent + times[candidate] + extra_time > max_time:
+                    return False
+            if max_per_category is not None:
+                same = day_categories[day].get(categories[candidate], 0)
+                if replacing is not None and categories[replacing] == categories[candidate]:
+                    same -= 1
+                if same >= max_per_category:
+                    return False
+            if window > 0:
+                for used in uses.get(candidate, ()):
+                    if abs(used - day) < window:
+                        return False
+            return True
+
+        def gain(candidate: int, replacing: Optional[int] = None) -> float:
+            """Change in plan score from putting candidate in (replacing's) slot"""
+            added = sum(1 for bit in self._bits_of(candidate) if not counts.get(bit))
+            score = rating_weight * ratings[candidate] - ingredient_weight * added
+            if replacing is not None:
+                mask = masks[candidate]
+                removed = sum(1 for bit in self._bits_of(replacing)
+                              if counts[bit] == 1 and not mask >> bit & 1)
+                score += ingredient_weight * removed - rating_weight * ratings[replacing]
+            return score
+
+        # Meals already planned stay; those inside the range take their slot
+        first = start_date.toordinal()
+        positions = {meal_type: position for position, meal_type in enumerate(meal_types)}
+        for meal_date, meal_type, recipe_id in fixed:
+            candidate = self._index.get(recipe_id)
+            if candidate is None:
+                continue
+            day = meal_date.toordinal() - first
+            slot = day * len(meal_types) + positions[meal_type] if 0 <= day < days and meal_type in positions else None
+            place(None, day, candidate)
+            if slot is not None:
+                open_slots.discard(slot)
+
+        def reserve(slot: int) -> float:
+            """Least time the open slots after slot on the same day will take"""
+            total = 0
+            for later in range(slot + 1, (slot // len(meal_types) + 1) * len(meal_types)):
+                if later in open_slots and quickest[meal_types[later % len(meal_types)]] is not None:
+                    total += quickest[meal_types[later % len(meal_types)]]
+            return total
+
+        def completable(slot: int) -> bool:
+            """Whether each open slot after slot on the same day still has a recipe that fits"""
+            day = slot // len(meal_types)
+            for later in range(slot + 1, (day + 1) * len(meal_types)):
+                if later in open_slots and not any(allowed(candidate, day, reserve(later))
+                                                   for candidate in shortlist[meal_types[later % len(meal_types)]]):
+                    return False
+            return True
+
+        # Greedy pass: best marginal meal per slot that leaves the rest of the day solvable
+        for slot in sorted(open_slots):
+            day, position = divmod(slot, len(meal_types))
+            extra_time = reserve(slot)
+            ranked = sorted((candidate for candidate in shortlist[meal_types[position]]
+                             if allowed(candidate, day, extra_time)), key=gain, reverse=True)
+            for candidate in ranked[:LOOKAHEAD_TRIES]:
+                place(slot, day, candidate)
+                if completable(slot):
+                    break
+                unplace(slot, day, candidate)
+            else:
+                if ranked:
+                    place(slot, day, ranked[0])
+
+        # Local search: replace one generated meal at a time while the plan gets no worse
+        movable = sorted(open_slots)
+        iterations = 0
+        while movable and iterations < MAX_ITERATIONS:
+            if iterations & 255 == 0 and time.perf_counter() >= deadline:
+                break
+            iterations += 1
+            slot = self._random.choice(movable)
+            day, position = divmod(slot, len(meal_types))
+            meal_type = meal_types[position]
+            pool = eligible[meal_type] if self._random.random() < EXPLORE_RATE else shortlist[meal_type]
+            if not pool:
+                continue
+            candidate = self._random.choice(pool)
+            current = slots[slot]
+            if not allowed(candidate, day, replacing=current):
+                continue
+            if current is None:
+                place(slot, day, candidate)
+            elif gain(candidate, current) >= 0:
+                unplace(slot, day, current)
+                place(slot, day, candidate)
+
+        for slot in movable:
+            day, position = divmod(slot, len(meal_types))
+            meal_date = date.fromordinal(first + day)
+            candidate = slots[slot]
+            if candidate is None:
+                result.unfilled.append((meal_date, meal_types[position]))
+            else:
+                result.meals.append((meal_date, meal_types[position], self._ids[candidate]))
+                result.total_rating += ratings[candidate]
+        result.ingredients = sum(1 for count in counts.values() if count)
+        result.iterations = iterations
+        result.elapsed = time.perf_counter() - started
+        return result
@@ -0,0 +1,112 @@
+import time
+from bisect import bisect_left
+from functools import wraps
+from typing import Dict, List
+
+class Histogram:
+    """Latency histogram with fixed, roughly logarithmic buckets.
+
+    Recording is a counter bump and a bisect over a short tuple, cheap
+    enough to leave on for every call. Percentiles are reported as the
+    upper bound of the bucket they fall in.
+    """
+
+    # Upper bucket bounds in seconds; the last bucket is open-ended
+    BOUNDS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025,
+              0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+    __slots__ = ('count', 'total', 'max', 'buckets')
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.buckets = [0] * (len(self.BOUNDS) + 1)
+
+    def record(self, seconds: float):
+        self.count += 1
+        self.total += seconds
+        if seconds > self.max:
+            self.max = seconds
+        self.buckets[bisect_left(self.BOUNDS, seconds)] += 1
+
+    def percentile(self, p: float) -> float:
+        """Upper bound (seconds) of the bucket holding the p-th percentile"""
+        if not self.count:
+            return 0.0
+        rank = max(1, round(p / 100 * self.count))
+        seen = 0
+        for bucket, hits in enumerate(self.buckets):
+            seen += hits
+            if seen >= rank:
+                # The true value is never above the slowest call seen
+                return min(self.BOUNDS[bucket], self.max) if bucket < len(self.BOUNDS) else self.max
+        return self.max
+
+    def to_dict(self) -> dict:
+        return {
+            "count": self.count,
+            "total_ms": round(self.total * 1000, 3),
+            "mean_ms": round(self.total / self.count * 1000, 3) if self.count else 0.0,
+            "p50_ms": round(self.percentile(50) * 1000, 3),
+            "p90_ms": round(self.percentile(90) * 1000, 3),
+            "p99_ms": round(self.percentile(99) * 1000, 3),
+            "max_ms": round(self.max * 1000, 3),
+            "buckets": {self._label(bucket): hits for bucket, hits in enumerate(self.buckets) if hits}
+        }
+
+    def _label(self, bucket: int) -> str:
+        if bucket < len(self.BOUNDS):
+            return f"<={self.BOUNDS[bucket] * 1000:g}ms"
+        return f">{self.BOUNDS[-1] * 1000:g}ms"
+
+
+class Metrics:
+    """Named operation timers and counters for one RecipeManager"""
+
+    def __init__(self):
+        self.timers = {}  # {operation: Histogram}
+        self.counters = {}  # {name: int}
+
+    def observe(self, operation: str, seconds: float):
+        histogram = self.timers.get(operation)
+        if histogram is None:
+            histogram = self.timers[operation] = Histogram()
+        histogram.record(seconds)
+
+    def count(self, name: str, amount: int = 1):
+        self.counters[name] = self.counters.get(name, 0) + amount
+
+    def reset(self):
+        self.timers.clear()
+        self.counters.clear()
+
+    def snapshot(self) -> Dict[str, dict]:
+        return {
+            "operations": {operation: histogram.to_dict()
+                           for operation, histogram in sorted(self.timers.items())},
+            "counters": dict(sorted(self.counters.items()))
+        }
+
+    def report_lines(self) -> List[str]:
+        """Human-readable summary, one line per operation"""
+        lines = [f"{'operation':24} {'calls':>7} {'mean ms':>9} {'p90 ms':>9} {'max ms':>9}"]
+        for operation, histogram in sorted(self.timers.items()):
+            stats = histogram.to_dict()
+            lines.append(f"{operation:24} {stats['count']:>7} {stats['mean_ms']:>9.3f} "
+                         f"{stats['p90_ms']:>9.3f} {stats['max_ms']:>9.3f}")
+        return lines
+
+
+def timed(operation: str):
+    """Record the duration of every call of a method in self.metrics"""
+    def decorator(method):
+        @wraps(method)
+        def wrapper(self, *args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return method(self, *args, **kwargs)
+            finally:
+                self.metrics.observe(operation, time.perf_counter() - started)
+        return wrapper
+    return decorator
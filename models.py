@@ -1,33 +1,117 @@
 import json
 import uuid
-from datetime import datetime, date
-from typing import List, Dict, Optional
+from bisect import bisect_left, insort
+from collections.abc import Mapping
+from datetime import datetime, date, timedelta
+from typing import Iterable, Iterator, List, Dict, Optional, Tuple
+from meal_history import MealHistory
+
+class SymbolTable:
+    """Shared pool of canonical strings for names that repeat across recipes.
+
+    Categories, tags, ingredient names and common amounts ("to taste",
+    "1 tsp") are stored once and referenced from every recipe using them.
+    """
+    
+    def __init__(self):
+        self._symbols = {}  # {text: canonical text}
+    
+    def intern(self, text: str) -> str:
+        return self._symbols.setdefault(text, text)
+    
+    def update(self, texts: Iterable[str]):
+        """Adopt already shared strings (e.g. from an unpickled snapshot) as canonical"""
+        for text in texts:
+            self._symbols.setdefault(text, text)
+    
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._symbols)
+    
+    def __len__(self) -> int:
+        return len(self._symbols)
+
+SYMBOLS = SymbolTable()
+
+# created_date is kept as microseconds since this epoch when it round-trips exactly
+_EPOCH = datetime(1970, 1, 1)
+_MICROSECOND = timedelta(microseconds=1)
+
+def _pack_timestamp(iso_string: str):
+    try:
+        moment = datetime.fromisoformat(iso_string)
+        if moment.tzinfo is None and moment.isoformat() == iso_string:
+            return (moment - _EPOCH) // _MICROSECOND
+    except (TypeError, ValueError):
+        pass
+    return iso_string
 
 class Recipe:
+    __slots__ = ('id', 'name', 'ingredients', 'instructions', 'prep_time', 'cook_time',
+                 'servings', 'category', '_created', 'rating', 'tags', '_listeners',
+                 '__weakref__')
+    
     def __init__(self, name: str, ingredients: Dict[str, str], instructions: List[str], 
                  prep_time: int, cook_time: int, servings: int, category: str = "Main Course"):
         self.id = str(uuid.uuid4())
         self.name = name
-        self.ingredients = ingredients  # {"ingredient": "amount"}
+        self.ingredients = {SYMBOLS.intern(ingredient): SYMBOLS.intern(amount)
+                            for ingredient, amount in ingredients.items()}  # {"ingredient": "amount"}
         self.instructions = instructions
         self.prep_time = prep_time  # in minutes
         self.cook_time = cook_time  # in minutes
         self.servings = servings
-        self.category = category
+        self.category = SYMBOLS.intern(category)
         self.created_date = datetime.now().isoformat()
         self.rating = 0
         self.tags = []
+        self._listeners = ()
+    
+    @property
+    def created_date(self) -> str:
+        if isinstance(self._created, int):
+            return (_EPOCH + self._created * _MICROSECOND).isoformat()
+        return self._created
+    
+    @created_date.setter
+    def created_date(self, value: str):
+        self._created = _pack_timestamp(value)
     
     def total_time(self) -> int:
         return self.prep_time + self.cook_time
     
+    def add_listener(self, listener):
+        """Register a callback(recipe, attribute, old_value, new_value) for changes"""
+        self._listeners += (listener,)
+    
+    def _notify(self, attribute: str, old_value, new_value):
+        for listener in self._listeners:
+            listener(self, attribute, old_value, new_value)
+    
     def add_tag(self, tag: str):
         if tag not in self.tags:
-            self.tags.append(tag)
+            self.tags.append(SYMBOLS.intern(tag))
+            self._notify('tags', None, tag)
+    
+    def set_ingredient(self, ingredient: str, amount: str):
+        """Add an ingredient or change its amount"""
+        self.ingredients[SYMBOLS.intern(ingredient)] = SYMBOLS.intern(amount)
+        self._notify('ingredients', None, ingredient)
     
     def set_rating(self, rating: int):
         if 1 <= rating <= 5:
+            old_rating = self.rating
             self.rating = rating
+            self._notify('rating', old_rating, rating)
+    
+    def __getstate__(self):
+        # Listeners belong to whoever loaded the recipe, so they are not pickled
+        return (self.id, self.name, self.ingredients, self.instructions, self.prep_time,
+                self.cook_time, self.servings, self.category, self._created, self.rating, self.tags)
+    
+    def __setstate__(self, state):
+        (self.id, self.name, self.ingredients, self.instructions, self.prep_time,
+         self.cook_time, self.servings, self.category, self._created, self.rating, self.tags) = state
+        self._listeners = ()
     
     def to_dict(self) -> dict:
         return {
@@ -46,31 +130,158 @@ class Recipe:
     
     @classmethod
     def from_dict(cls, data: dict):
-        recipe = cls(
-            data['name'], data['ingredients'], data['instructions'],
-            data['prep_time'], data['cook_time'], data['servings'], data['category']
-        )
+        # Skip __init__ so no throwaway uuid/timestamp is generated per loaded recipe
+        recipe = cls.__new__(cls)
         recipe.id = data['id']
+        recipe.name = data['name']
+        recipe.ingredients = {SYMBOLS.intern(ingredient): SYMBOLS.intern(amount)
+                              for ingredient, amount in data['ingredients'].items()}
+        recipe.instructions = data['instructions']
+        recipe.prep_time = data['prep_time']
+        recipe.cook_time = data['cook_time']
+        recipe.servings = data['servings']
+        recipe.category = SYMBOLS.intern(data['category'])
         recipe.created_date = data['created_date']
         recipe.rating = data.get('rating', 0)
-        recipe.tags = data.get('tags', [])
+        recipe.tags = [SYMBOLS.intern(tag) for tag in data.get('tags', [])]
+        recipe._listeners = ()
         return recipe
 
+def _day_dict(day: Tuple[str, ...]) -> Dict[str, str]:
+    """{meal_type: recipe_id} of a day stored as (meal_type, recipe_id, meal_type, ...)"""
+    return dict(zip(day[::2], day[1::2]))
+
+class _MealsByDate(Mapping):
+    """Read-only {date_string: {meal_type: recipe_id}} view over ordinal-keyed days"""
+    
+    __slots__ = ('_days',)
+    
+    def __init__(self, days: Dict[int, Tuple[str, ...]]):
+        self._days = days
+    
+    def __getitem__(self, date_str: str) -> Dict[str, str]:
+        try:
+            ordinal = date.fromisoformat(date_str).toordinal()
+        except (TypeError, ValueError):
+            raise KeyError(date_str)
+        return _day_dict(self._days[ordinal])
+    
+    def __iter__(self):
+        for ordinal in self._days:
+            yield date.fromordinal(ordinal).isoformat()
+    
+    def __len__(self) -> int:
+        return len(self._days)
+
 class MealPlan:
+    __slots__ = ('_days', '_dates', '_history')
+    
     def __init__(self):
-        self.meals = {}  # {date_string: {meal_type: recipe_id}}
+        # A day is a flat (meal_type, recipe_id, meal_type, recipe_id, ...)
+        # tuple, under half the size of a dict with the same three meals
+        self._days = {}  # {date ordinal: (meal_type, recipe_id, ...)}
+        self._dates = []  # sorted ordinals of the days in self._days
+        self._history = None  # MealHistory, built on first use
+    
+    @property
+    def history(self) -> MealHistory:
+        """Usage aggregates, built on first use and then kept in step with every change"""
+        if self._history is None:
+            self._history = MealHistory(self)
+        return self._history
+    
+    @property
+    def meals(self) -> Mapping:
+        """{date_string: {meal_type: recipe_id}}"""
+        return _MealsByDate(self._days)
+    
+    @meals.setter
+    def meals(self, meals: Dict[str, Dict[str, str]]):
+        self._days = {}
+        self._dates = []
+        self._history = None
+        for date_str, day_meals in meals.items():
+            for meal_type, recipe_id in day_meals.items():
+                self.add_meal(date.fromisoformat(date_str), meal_type, recipe_id)
     
     def add_meal(self, date_obj: date, meal_type: str, recipe_id: str):
-        date_str = date_obj.isoformat()
-        if date_str not in self.meals:
-            self.meals[date_str] = {}
-        self.meals[date_str][meal_type] = recipe_id
+        ordinal = date_obj.toordinal()
+        day = self._days.get(ordinal)
+        if day is None:
+            day = ()
+            insort(self._dates, ordinal)
+        # Recipes are planned over and over, so share one id string per recipe
+        meal_type = SYMBOLS.intern(meal_type)
+        recipe_id = SYMBOLS.intern(recipe_id)
+        replaced = None
+        for position in range(0, len(day), 2):
+            if day[position] == meal_type:
+                replaced = day[position + 1]
+                self._days[ordinal] = day[:position + 1] + (recipe_id,) + day[position + 2:]
+                break
+        else:
+            self._days[ordinal] = day + (meal_type, recipe_id)
+        if self._history is not None:
+            if replaced is not None:
+                self._history.remove(ordinal, replaced)
+            self._history.add(ordinal, recipe_id)
     
     def get_meals_for_date(self, date_obj: date) -> Dict[str, str]:
-        return self.meals.get(date_obj.isoformat(), {})
+        return _day_dict(self._days.get(date_obj.toordinal(), ()))
+    
+    def meal_count(self) -> int:
+        """Number of planned meals"""
+        return sum(map(len, self._days.values())) // 2
+    
+    def span(self) -> Optional[Tuple[date, date]]:
+        """(first planned day, day after the last) or None without meals"""
+        if not self._dates:
+            return None
+        return date.fromordinal(self._dates[0]), date.fromordinal(self._dates[-1] + 1)
+    
+    def _ordinals_between(self, start_date: date, end_date: date) -> List[int]:
+        """Planned days in [start_date, end_date), oldest first"""
+        lo = bisect_left(self._dates, start_date.toordinal())
+        hi = bisect_left(self._dates, end_date.toordinal(), lo)
+        return self._dates[lo:hi]
+    
+    def iter_meals(self, start_date: date, end_date: date) -> Iterator[Tuple[date, str, str]]:
+        """Yield (date, meal_type, recipe_id) for planned meals in [start_date, end_date)"""
+        for ordinal in self._ordinals_between(start_date, end_date):
+            day = date.fromordinal(ordinal)
+            meals = self._days.get(ordinal, ())
+            for meal_type, recipe_id in zip(meals[::2], meals[1::2]):
+                yield day, meal_type, recipe_id
+    
+    def remove_meals(self, start_date: date, end_date: date) -> int:
+        """Unplan every meal in [start_date, end_date); returns how many were removed"""
+        lo = bisect_left(self._dates, start_date.toordinal())
+        hi = bisect_left(self._dates, end_date.toordinal(), lo)
+        removed = 0
+        for ordinal in self._dates[lo:hi]:
+            day = self._days.pop(ordinal)
+            if self._history is not None:
+                for recipe_id in day[1::2]:
+                    self._history.remove(ordinal, recipe_id)
+            removed += len(day) // 2
+        del self._dates[lo:hi]
+        return removed
+    
+    def reschedule(self, start_date: date, end_date: date, shift_days: int) -> List[Tuple[date, str, str]]:
+        """Move meals in [start_date, end_date) by shift_days, replacing meals in the target slots.
+
+        Returns the moved meals as (new_date, meal_type, recipe_id).
+        """
+        shift = timedelta(days=shift_days)
+        moved = [(day + shift, meal_type, recipe_id)
+                 for day, meal_type, recipe_id in self.iter_meals(start_date, end_date)]
+        self.remove_meals(start_date, end_date)
+        for day, meal_type, recipe_id in moved:
+            self.add_meal(day, meal_type, recipe_id)
+        return moved
     
     def to_dict(self) -> dict:
-        return {'meals': self.meals}
+        return {'meals': dict(self.meals.items())}
     
     @classmethod
     def from_dict(cls, data: dict):
@@ -0,0 +1,89 @@
+from heapq import nsmallest
+from typing import Iterable, List, Optional, Set, Tuple
+from quantities import normalize_name
+
+# int.bit_count() is Python 3.10+
+_popcount = getattr(int, 'bit_count', None) or (lambda mask: bin(mask).count('1'))
+
+# Ingredients most kitchens always have; pantry queries can leave them out
+STAPLES = frozenset({"salt", "pepper", "black pepper", "water", "oil", "olive oil",
+                     "vegetable oil", "sugar", "flour", "butter"})
+
+class PantryIndex:
+    """Ingredient bitsets for "what can I cook with what I have" queries.
+
+    Every distinct (normalized) ingredient name gets a bit, and each recipe
+    is the OR of its ingredients' bits. For a pantry, the ingredients still
+    to buy are recipe_mask & ~pantry_mask, so ranking the whole catalog is
+    one AND and one popcount per recipe.
+    """
+
+    def __init__(self):
+        self._bits = {}  # {ingredient name, normalized or as written: bit}
+        self._names = []  # bit -> ingredient name
+        self._positions = {}  # {recipe_id: insertion position}
+        self._ids = []  # position -> recipe_id
+        self._masks = []  # position -> ingredient bitset
+
+    def _bit(self, ingredient: str) -> int:
+        bit = self._bits.get(ingredient)
+        if bit is None:
+            name = normalize_name(ingredient)
+            bit = self._bits.get(name)
+            if bit is None:
+                bit = self._bits[name] = len(self._names)
+                self._names.append(name)
+            # Remember the spelling as written too, so it is normalized only once
+            self._bits[ingredient] = bit
+        return bit
+
+    def mask(self, ingredients: Iterable[str]) -> int:
+        """Bitset of the known ingredients among ingredients; unknown names are ignored"""
+        mask = 0
+        for ingredient in ingredients:
+            bit = self._bits.get(normalize_name(ingredient))
+            if bit is not None:
+                mask |= 1 << bit
+        return mask
+
+    def add(self, recipe_id: str, ingredients: Iterable[str]):
+        """Index a recipe, replacing its ingredients if it is already known"""
+        mask = 0
+        for ingredient in ingredients:
+            mask |= 1 << self._bit(ingredient)
+        position = self._positions.get(recipe_id)
+        if position is None:
+            self._positions[recipe_id] = len(self._ids)
+            self._ids.append(recipe_id)
+            self._masks.append(mask)
+        else:
+            self._masks[position] = mask
+
+    def mask_of(self, recipe_id: str) -> int:
+        """Ingredient bitset of an indexed recipe"""
+        return self._masks[self._positions[recipe_id]]
+
+    def add_ingredient(self, recipe_id: str, ingredient: str):
+        position = self._positions[recipe_id]
+        self._masks[position] |= 1 << self._bit(ingredient)
+
+    def rank(self, have: Set[str], limit: Optional[int] = None,
+             max_missing: Optional[int] = None) -> List[Tuple[str, int]]:
+        """(recipe_id, number of ingredients missing) for recipes cookable from have.
+
+        Fewest missing first (fully makeable recipes lead), ties in catalog
+        order. max_missing drops recipes needing more; limit caps the list.
+        """
+        need = ~self.mask(have)
+        missing = [_popcount(mask & need) for mask in self._masks]
+        positions = range(len(missing))
+        if max_missing is not None:
+            positions = [position for position in positions if missing[position] <= max_missing]
+        if limit is None:
+            ordered = sorted(positions, key=missing.__getitem__)
+        else:
+            ordered = nsmallest(limit, positions, key=missing.__getitem__)
+        return [(self._ids[position], missing[position]) for position in ordered]
+
+    def __len__(self) -> int:
+        return len(self._ids)
@@ -0,0 +1,163 @@
+import re
+from collections import defaultdict
+from typing import Dict, List, NamedTuple, Optional
+
+class Quantity(NamedTuple):
+    amount: float
+    unit: str  # 'g', 'ml', '' for a bare count, or another unit word such as 'large'
+
+# Unit spellings -> (canonical unit, factor to canonical)
+UNITS = {
+    'g': ('g', 1), 'gram': ('g', 1), 'grams': ('g', 1),
+    'kg': ('g', 1000), 'kilogram': ('g', 1000), 'kilograms': ('g', 1000),
+    'mg': ('g', 0.001),
+    'oz': ('g', 28.3495), 'ounce': ('g', 28.3495), 'ounces': ('g', 28.3495),
+    'lb': ('g', 453.592), 'lbs': ('g', 453.592), 'pound': ('g', 453.592), 'pounds': ('g', 453.592),
+    'ml': ('ml', 1), 'milliliter': ('ml', 1), 'milliliters': ('ml', 1),
+    'millilitre': ('ml', 1), 'millilitres': ('ml', 1),
+    'l': ('ml', 1000), 'liter': ('ml', 1000), 'liters': ('ml', 1000),
+    'litre': ('ml', 1000), 'litres': ('ml', 1000),
+    'tsp': ('ml', 4.92892), 'teaspoon': ('ml', 4.92892), 'teaspoons': ('ml', 4.92892),
+    'tbsp': ('ml', 14.7868), 'tablespoon': ('ml', 14.7868), 'tablespoons': ('ml', 14.7868),
+    'cup': ('ml', 236.588), 'cups': ('ml', 236.588),
+}
+
+# Words that qualify a count; "4 large" eggs and "2 large" eggs add up to "6 large"
+COUNT_WORDS = {
+    'large': 'large', 'medium': 'medium', 'small': 'small', 'whole': '',
+    'clove': 'cloves', 'cloves': 'cloves', 'can': 'cans', 'cans': 'cans',
+    'slice': 'slices', 'slices': 'slices', 'pinch': 'pinch', 'pinches': 'pinch',
+    'bunch': 'bunches', 'bunches': 'bunches',
+}
+
+UNICODE_FRACTIONS = {'½': 0.5, '¼': 0.25, '¾': 0.75, '⅓': 1 / 3, '⅔': 2 / 3, '⅛': 0.125}
+
+_NUMBER = r'(?:\d+/\d+|\d+(?:\.\d+)?(?:\s+\d+/\d+)?|[½¼¾⅓⅔⅛])'
+_AMOUNT = re.compile(rf'^\s*(?P<number>{_NUMBER})(?:\s*-\s*{_NUMBER})?\s*(?P<unit>[a-zA-Z]+\.?)?')
+_SPACES = re.compile(r'\s+')
+
+
+def collapse_spaces(text: str) -> str:
+    """Trim and collapse runs of whitespace to one space"""
+    return _SPACES.sub(' ', str(text)).strip()
+
+
+def normalize_name(text: str) -> str:
+    """Lowercase and collapse whitespace, so "Olive  Oil " matches "olive oil\""""
+    return collapse_spaces(text).lower()
+
+
+def _parse_number(text: str) -> float:
+    if text in UNICODE_FRACTIONS:
+        return UNICODE_FRACTIONS[text]
+    total = 0.0
+    for part in text.split():
+        if '/' in part:
+            numerator, denominator = part.split('/')
+            total += int(numerator) / int(denominator)
+        else:
+            total += float(part)
+    return total
+
+
+def parse_amount(text: str) -> Optional[Quantity]:
+    """Parse a free-form amount like "2 1/4 cups" or "100g grated".
+
+    Returns None for amounts without a leading number ("to taste"). Any text
+    after the number and unit is treated as a preparation note and ignored.
+    For ranges ("2-3 cloves") the lower bound is used.
+    """
+    match = _AMOUNT.match(text)
+    if match is None:
+        return None
+    try:
+        amount = _parse_number(match.group('number'))
+    except (ValueError, ZeroDivisionError):
+        return None
+
+    word = (match.group('unit') or '').rstrip('.').lower()
+    if word in UNITS:
+        unit, factor = UNITS[word]
+        return Quantity(amount * factor, unit)
+    if word in COUNT_WORDS:
+        return Quantity(amount, COUNT_WORDS[word])
+    # Unknown words ("2 ripe", "1 packet") only add up with the same word
+    return Quantity(amount, word)
+
+
+def _format_number(value: float) -> str:
+    return f"{round(value, 2):g}"
+
+
+def format_quantity(quantity: Quantity) -> str:
+    """Render a normalized quantity in a readable unit"""
+    amount, unit = quantity
+    if unit == 'g':
+        return f"{_format_number(amount / 1000)} kg" if amount >= 1000 else f"{_format_number(amount)} g"
+    if unit == 'ml':
+        # Kitchen measures read better than litres until well past a quart
+        if amount >= 2000:
+            return f"{_format_number(amount / 1000)} l"
+        if amount >= UNITS['cup'][1] / 4:
+            cups = _format_number(amount / UNITS['cup'][1])
+            return f"{cups} cup" if cups == '1' else f"{cups} cups"
+        if amount >= UNITS['tbsp'][1]:
+            return f"{_format_number(amount / UNITS['tbsp'][1])} tbsp"
+        return f"{_format_number(amount / UNITS['tsp'][1])} tsp"
+    return f"{_format_number(amount)} {unit}".rstrip()
+
+
+class QuantityCache:
+    """Parsed ingredient amounts per recipe.
+
+    Entries remember the amount text they were parsed from, so a changed
+    amount is re-parsed even if invalidate() was not called for it.
+    """
+
+    def __init__(self):
+        self._recipes = {}  # {recipe_id: {ingredient: (amount text, Quantity or None)}}
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, recipe_id: str, ingredient: str, amount: str) -> Optional[Quantity]:
+        parsed = self._recipes.setdefault(recipe_id, {})
+        cached = parsed.get(ingredient)
+        if cached is not None and cached[0] == amount:
+            self.hits += 1
+            return cached[1]
+        self.misses += 1
+        quantity = parse_amount(amount)
+        parsed[ingredient] = (amount, quantity)
+        return quantity
+
+    def invalidate(self, recipe_id: str):
+        self._recipes.pop(recipe_id, None)
+
+    def __len__(self) -> int:
+        return len(self._recipes)
+
+
+class ShoppingTotals:
+    """Accumulates ingredient amounts into per-unit totals"""
+
+    def __init__(self):
+        self._totals = defaultdict(dict)  # {ingredient: {unit: amount}}
+        self._unparsed = defaultdict(dict)  # {ingredient: {amount text: None}} (ordered set)
+
+    def add(self, ingredient: str, amount: str, quantity: Optional[Quantity]):
+        if quantity is None:
+            self._unparsed[ingredient][amount] = None
+            # Keep the ingredient's first-seen position in the result
+            self._totals[ingredient]
+            return
+        units = self._totals[ingredient]
+        units[quantity.unit] = units.get(quantity.unit, 0) + quantity.amount
+
+    def result(self) -> Dict[str, List[str]]:
+        """{ingredient: ["6 large", "to taste", ...]} in first-seen order"""
+        shopping_list = {}
+        for ingredient, units in self._totals.items():
+            lines = [format_quantity(Quantity(amount, unit)) for unit, amount in units.items()]
+            lines.extend(self._unparsed.get(ingredient, ()))
+            shopping_list[ingredient] = lines
+        return shopping_list
@@ -0,0 +1,55 @@
+from collections import OrderedDict
+from typing import Dict, Hashable, Optional, Tuple
+
+class QueryCache:
+    """Bounded LRU of query results, tied to a catalog generation.
+
+    Results are stored as tuples of recipe ids. Every lookup passes the
+    current generation; as soon as it differs from the one the entries were
+    computed at, the whole cache is dropped, so a result is never served
+    after the catalog has changed.
+    """
+
+    def __init__(self, maxsize: int = 256):
+        self.maxsize = maxsize
+        self._entries = OrderedDict()  # {key: ids}, least recently used first
+        self._generation = None
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def get(self, key: Hashable, generation: int) -> Optional[Tuple[str, ...]]:
+        if generation != self._generation:
+            if self._entries:
+                self.invalidations += 1
+                self._entries.clear()
+            self._generation = generation
+        ids = self._entries.get(key)
+        if ids is None:
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return ids
+
+    def put(self, key: Hashable, generation: int, ids: Tuple[str, ...]) -> Tuple[str, ...]:
+        if self.maxsize <= 0 or generation != self._generation:
+            return ids
+        self._entries[key] = ids
+        if len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+        return ids
+
+    def stats(self) -> Dict[str, int]:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+            "invalidations": self.invalidations
+        }
+
+    def __len__(self) -> int:
+        return len(self._entries)
@@ -0,0 +1,55 @@
+from bisect import bisect_left, insort
+from typing import List
+
+class RatingIndex:
+    """Rated recipes bucketed by star rating (1-5).
+
+    Each bucket holds insertion positions in sorted order, so the best
+    recipes come out rating-first with ties in catalog order (the same order
+    a stable sort gives) and a page costs O(offset buckets + limit).
+    """
+
+    MAX_RATING = 5
+
+    def __init__(self):
+        self._positions = {}  # {recipe_id: insertion position}
+        self._ids = {}  # {insertion position: recipe_id}
+        self._ratings = {}  # {recipe_id: rating} for rated recipes
+        self._buckets = [[] for _ in range(self.MAX_RATING + 1)]  # rating -> sorted positions
+
+    def add(self, recipe_id: str, rating: int):
+        """Track a recipe (or update it if it is already known)"""
+        if recipe_id not in self._positions:
+            position = len(self._positions)
+            self._positions[recipe_id] = position
+            self._ids[position] = recipe_id
+        self.set_rating(recipe_id, rating)
+
+    def set_rating(self, recipe_id: str, rating: int):
+        position = self._positions[recipe_id]
+        old_rating = self._ratings.pop(recipe_id, 0)
+        if old_rating:
+            bucket = self._buckets[old_rating]
+            del bucket[bisect_left(bucket, position)]
+        if 1 <= rating <= self.MAX_RATING:
+            self._ratings[recipe_id] = rating
+            insort(self._buckets[rating], position)
+
+    def top(self, limit: int, offset: int = 0) -> List[str]:
+        """Ids of the best rated recipes, skipping the first offset"""
+        results = []
+        for rating in range(self.MAX_RATING, 0, -1):
+            if len(results) >= limit:
+                break
+            bucket = self._buckets[rating]
+            if offset >= len(bucket):
+                offset -= len(bucket)
+                continue
+            end = offset + limit - len(results)
+            results.extend(self._ids[position] for position in bucket[offset:end])
+            offset = 0
+        return results
+
+    def __len__(self) -> int:
+        """Number of rated recipes"""
+        return len(self._ratings)
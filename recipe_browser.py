@@ -0,0 +1,143 @@
+"""Paged recipe browsing for the interactive menu.
+
+Recipe ids are pulled from a generator only as far as the pages shown so
+far, and only the recipes on the current page are loaded and formatted,
+so a screen costs the same with ten recipes or a hundred thousand.
+Selections return the recipe's id, never its position in a list.
+"""
+from typing import Callable, Iterator, List, Optional
+from recipe_manager import RecipeManager
+from models import Recipe
+
+PAGE_SIZE = 10
+ID_WIDTH = 8  # characters of a recipe id shown next to its name
+MIN_ID_PREFIX = 4  # shortest id prefix accepted as a selection
+
+def summary_line(recipe: Recipe) -> str:
+    return f"{recipe.name} ({recipe.category}, {recipe.total_time()} min, Rating: {recipe.rating})"
+
+class RecipeBrowser:
+    """Page through the catalog, or the recipes matching a filter.
+
+    describe formats one recipe as the lines shown under its entry; the
+    first line goes next to the entry's number and id.
+    """
+
+    def __init__(self, manager: RecipeManager, page_size: int = PAGE_SIZE,
+                 describe: Optional[Callable[[Recipe], List[str]]] = None):
+        self.manager = manager
+        self.page_size = page_size
+        self.describe = describe if describe is not None else lambda recipe: [summary_line(recipe)]
+        self.query = ""
+        self._reset()
+
+    def _reset(self):
+        self.page = 0
+        self._seen = []  # ids pulled from the source so far, in order
+        self._source = self._ids()
+        self._total = None
+
+    def _ids(self) -> Iterator[str]:
+        if self.query:
+            yield from self.manager.search_recipe_ids(self.query)
+        else:
+            yield from self.manager.recipes
+
+    def total(self) -> int:
+        if self._total is None:
+            if self.query:
+                self._total = len(self.manager.search_recipe_ids(self.query))
+            else:
+                self._total = len(self.manager.recipes)
+        return self._total
+
+    def page_count(self) -> int:
+        return max(1, -(-self.total() // self.page_size))
+
+    def set_filter(self, query: str):
+        """Show only recipes matching query (name, ingredient or tag); empty shows all"""
+        self.query = query.strip()
+        self._reset()
+
+    def page_ids(self, page: Optional[int] = None) -> List[str]:
+        """Ids on page (default: the current one), pulling more from the source as needed"""
+        page = self.page if page is None else page
+        start = page * self.page_size
+        end = start + self.page_size
+        for recipe_id in self._source:
+            self._seen.append(recipe_id)
+            if len(self._seen) >= end:
+                break
+        return self._seen[start:end]
+
+    def go_to(self, page: int) -> bool:
+        if 0 <= page < self.page_count() and (page == 0 or self.page_ids(page)):
+            self.page = page
+            return True
+        return False
+
+    def show_page(self) -> List[str]:
+        """Print the current page; returns its ids in display order"""
+        ids = self.page_ids()
+        if not ids:
+            print("No recipes match." if self.query else "No recipes found. Add some recipes first!")
+            return ids
+        heading = f"Page {self.page + 1}/{self.page_count()}, {self.total()} recipe(s)"
+        if self.query:
+            heading += f" matching '{self.query}'"
+        print(f"\n{heading}:")
+        for number, recipe in enumerate(self.manager.get_recipes(ids), 1):
+            lines = self.describe(recipe)
+            print(f"{number:>3}. [{recipe.id[:ID_WIDTH]}] {lines[0] if lines else recipe.name}")
+            for line in lines[1:]:
+                print(f"     {line}")
+        return ids
+
+    def resolve(self, text: str, page_ids: List[str]) -> Optional[str]:
+        """Recipe id for a number on the current page, a full id or a unique id prefix.
+
+        Digits alone always mean a number on the page, even past its end, as
+        ids often start with digits too; a prefix needs MIN_ID_PREFIX
+        characters.
+        """
+        if text.isdigit():
+            return page_ids[int(text) - 1] if 1 <= int(text) <= len(page_ids) else None
+        if text in self.manager.recipes:
+            return text
+        if len(text) < MIN_ID_PREFIX:
+            return None
+        matches = [recipe_id for recipe_id in page_ids if recipe_id.startswith(text)]
+        if not matches:
+            for recipe_id in self.manager.recipes:
+                if recipe_id.startswith(text):
+                    matches.append(recipe_id)
+                    if len(matches) > 1:
+                        break
+        return matches[0] if len(matches) == 1 else None
+
+    def browse(self, prompt: str = "Select a recipe") -> Optional[str]:
+        """Interactive paging; returns the chosen recipe id, or None if cancelled"""
+        while True:
+            ids = self.show_page()
+            print("\n[n]ext, [p]rev, [g]o to page N, [/]text to filter (/ alone clears), [q]uit")
+            choice = input(f"{prompt} (number or id): ").strip()
+            command = choice.lower()
+            if command in ('', 'q', 'quit'):
+                return None
+            if command in ('n', 'next'):
+                if not self.go_to(self.page + 1):
+                    print("Already on the last page.")
+            elif command in ('p', 'prev'):
+                if not self.go_to(self.page - 1):
+                    print("Already on the first page.")
+            elif command.startswith('g') and command[1:].strip().isdigit():
+                if not self.go_to(int(command[1:]) - 1):
+                    print(f"Pages run from 1 to {self.page_count()}.")
+            elif choice.startswith('/'):
+                self.set_filter(choice[1:])
+            else:
+                recipe_id = self.resolve(choice, ids)
+                if recipe_id is not None:
+                    return recipe_id
+                print(f"No such recipe; enter its number on this page, or its id "
+                      f"(at least {MIN_ID_PREFIX} characters).")
@@ -1,126 +1,820 @@
-import json
-import os
-from datetime import date, datetime, timedelta
-from typing import List, Dict, Optional
+from contextlib import contextmanager
+from datetime import date, timedelta
+from typing import Callable, Iterable, Iterator, List, Dict, Optional, Tuple
 from collections import defaultdict
-from models import Recipe, MealPlan
+from models import SYMBOLS, Recipe, MealPlan
+from search_index import SearchIndex
+from columns import RecipeColumns
+from rating_index import RatingIndex
+from quantities import QuantityCache, ShoppingTotals, normalize_name
+from pantry import STAPLES, PantryIndex
+from meal_planner import MealPlanGenerator, PlanConstraints, PlanResult
+from meal_history import periods
+from similarity import SimilarityIndex, fingerprint, recipe_features
+from query_cache import QueryCache
+from journal import Journal
+from metrics import Metrics, timed
+from snapshot import SnapshotCache
+from storage import (DataFileError, FileLock, JsonStorage, LazyRecipeMap, SqliteStorage,
+                     file_stamp, open_storage)
+
+# Tries at reading the data file and its journal as one consistent version
+LOAD_ATTEMPTS = 5
+# Everything a load builds; a reload swaps it in only once it has succeeded
+LOADED_STATE = ('recipes', 'meal_plan', '_search_index', '_columns', '_ratings', '_quantities',
+                '_pantry', '_similar', '_data_stamp')
+# Rough in-memory cost measured with tracemalloc on synthetic catalogs: a
+# recipe with its search, column, rating and pantry index entries, and a
+# planned meal
+RECIPE_MEMORY = 11000
+MEAL_MEMORY = 80
 
 class RecipeManager:
-    def __init__(self, data_file: str = "recipes_data.json"):
+    def __init__(self, data_file: str = "recipes_data.json", journal: bool = False,
+                 compact_every: int = 1000, storage=None, lazy: bool = False,
+                 max_resident: Optional[int] = None, snapshot: bool = True,
+                 query_cache_size: int = 256, compression: Optional[str] = None):
         self.data_file = data_file
+        # JSON by default; a .db/.sqlite data file (or an explicit storage) selects SQLite.
+        # compression ('gzip', 'lzma' or 'json') converts a JSON data file on the next save.
+        self.storage = storage if storage is not None else open_storage(data_file, compression)
+        self._db = self.storage if isinstance(self.storage, SqliteStorage) else None
+        if lazy and getattr(self.storage, 'write_compression', None) is not None:
+            # Lazy loading reads recipes back by byte offset, which a compressed file lacks
+            print(f"Compressed data files cannot be loaded lazily: loading all of {data_file}")
+            lazy = False
         self.recipes = {}  # {recipe_id: Recipe}
+        if lazy and self._db is None:
+            # Recipes stay on disk until first accessed; at most max_resident are cached
+            self.recipes = LazyRecipeMap(self.storage, max_resident, self._watch_recipe)
         self.meal_plan = MealPlan()
+        self._search_index = SearchIndex()
+        self._columns = RecipeColumns()
+        self._ratings = RatingIndex()
+        self._quantities = QuantityCache()
+        self._pantry = PantryIndex()
+        # Similar-recipe table, persisted to data_file + '.similar'; loaded on first use
+        self._similar = None
+        self._similar_path = data_file + '.similar'
+        # In journal mode each mutation is appended to data_file + '.journal'
+        # and only every compact_every records is the full snapshot rewritten.
+        # A journal left by another process is replayed in either mode.
+        # SQLite already writes each mutation as it happens.
+        self._journal = Journal(data_file + '.journal') if self._db is None else None
+        self._append_journal = journal
+        self.compact_every = compact_every
+        self._recording = True
+        self._batch_depth = 0
+        self._pending = []  # mutations applied in memory but not yet persisted
+        self._pending_overflow = False  # too many to keep: only a full save persists them
+        # Writers from every process serialize on data_file + '.lock'.
+        # _data_stamp identifies the data file as last loaded or written
+        # here, so commits by other processes can be noticed and merged.
+        self._lock = FileLock(data_file) if self._db is None else None
+        self._data_stamp = None  # for SQLite, the database's data_version instead
+        # A fully built copy of the catalog next to the JSON file, so startup
+        # can skip parsing and indexing while the JSON file is unchanged
+        self._snapshot = None
+        if snapshot and not lazy and isinstance(self.storage, JsonStorage):
+            self._snapshot = SnapshotCache(data_file)
+        self._generation = 0  # bumped by every mutation
+        # Recent search/filter results; any mutation invalidates them all
+        self._query_cache = QueryCache(query_cache_size)
+        self.metrics = Metrics()
         self.load_data()
     
+    @timed('load_data')
     def load_data(self):
-        """Load recipes and meal plans from JSON file"""
+        """Load recipes and meal plans from the data file.
+
+        Raises DataFileError if an existing data file cannot be read, rather
+        than going on with an empty catalog that the next save would write
+        over it.
+        """
+        try:
+            self._load()
+        except Exception as e:
+            raise DataFileError(f"Could not load {self.data_file}: {e}") from e
+    
+    def _load(self):
+        if self._db is not None:
+            # Recipes are read from the database on demand
+            self.recipes = self._db.recipes
+            self.recipes.on_hydrate = self._watch_recipe
+            self.meal_plan = self._db.load_meal_plan()
+            self._data_stamp = self._db.data_version()
+            print(f"Opened {len(self.recipes)} recipes in {self.data_file}")
+            return
+        
+        # Readers take no lock: saves are atomic renames, so the file read is
+        # always a complete version. Only if it was replaced between reading
+        # it and its journal (a compaction) is the load repeated.
+        for attempt in range(LOAD_ATTEMPTS):
+            stamp = file_stamp(self.data_file)
+            data, ops = self._load_version()
+            if file_stamp(self.data_file) == stamp:
+                break
+            if isinstance(self.recipes, LazyRecipeMap):
+                self.recipes.close()
+            self._reset_state()
+        else:
+            raise DataFileError(f"{self.data_file} kept being replaced while it was read "
+                                f"({LOAD_ATTEMPTS} attempts)")
+        self._data_stamp = stamp
+        # Parsed from JSON and still identical to it: make the next start fast
+        if data is not None and not ops and self._snapshot is not None:
+            self._save_snapshot(stamp)
+    
+    def _load_version(self) -> Tuple[Optional[dict], List[dict]]:
+        """Read the data file and replay its journal; returns (parsed JSON or None, journal records)"""
+        if isinstance(self.recipes, LazyRecipeMap):
+            f = self.recipes.open_file()
+            if f is not None:
+                rest = self.storage.scan(self._index_record, f)
+                self.meal_plan = MealPlan.from_dict(rest.get('meal_plan', {}))
+                print(f"Indexed {len(self.recipes)} recipes from {self.data_file}")
+            data = None
+        else:
+            state = self._snapshot.load() if self._snapshot is not None else None
+            if state is not None:
+                self.metrics.count('snapshot_hits')
+                self._restore_snapshot(state)
+                print(f"Loaded {len(self.recipes)} recipes from {self.data_file} (snapshot)")
+                data = None
+            else:
+                if self._snapshot is not None:
+                    self.metrics.count('snapshot_misses')
+                data = self.storage.load()
+        
+        if data is not None:
+            # Load recipes
+            for recipe_data in data.get('recipes', []):
+                recipe = Recipe.from_dict(recipe_data)
+                self.recipes[recipe.id] = recipe
+                self._attach_recipe(recipe)
+            
+            # Load meal plan
+            meal_plan_data = data.get('meal_plan', {})
+            self.meal_plan = MealPlan.from_dict(meal_plan_data)
+            
+            print(f"Loaded {len(self.recipes)} recipes from {self.data_file}")
+        
+        # Replay mutations made since the last snapshot
+        ops = self._journal.replay()
+        self._apply_ops(ops)
+        if ops:
+            print(f"Replayed {len(ops)} journal records from {self._journal.path}")
+        return data, ops
+    
+    def _reset_state(self):
+        """Start an empty in-memory catalog to load into"""
+        if isinstance(self.recipes, LazyRecipeMap):
+            self.recipes = LazyRecipeMap(self.storage, self.recipes.max_resident, self._watch_recipe)
+        else:
+            self.recipes = {}
+        self.meal_plan = MealPlan()
+        self._search_index = SearchIndex()
+        self._columns = RecipeColumns()
+        self._ratings = RatingIndex()
+        self._quantities = QuantityCache()
+        self._pantry = PantryIndex()
+        self._similar = None
+        self._generation += 1
+    
+    def _reload(self):
+        """Load the data file again into a fresh catalog and swap it in.
+
+        If the load fails (e.g. another process left an unreadable file),
+        the catalog as it was is kept, unpersisted changes included.
+        """
+        previous = {name: getattr(self, name) for name in LOADED_STATE}
+        journal_position = self._journal.tell()
+        self._reset_state()
         try:
-            if os.path.exists(self.data_file):
-                with open(self.data_file, 'r') as f:
-                    data = json.load(f)
-                
-                # Load recipes
-                for recipe_data in data.get('recipes', []):
-                    recipe = Recipe.from_dict(recipe_data)
-                    self.recipes[recipe.id] = recipe
-                
-                # Load meal plan
-                meal_plan_data = data.get('meal_plan', {})
-                self.meal_plan = MealPlan.from_dict(meal_plan_data)
-                
-                print(f"Loaded {len(self.recipes)} recipes from {self.data_file}")
+            self._load()
         except Exception as e:
-            print(f"Error loading data: {e}")
+            if isinstance(self.recipes, LazyRecipeMap):
+                self.recipes.close()
+            for name, value in previous.items():
+                setattr(self, name, value)
+            self._journal.seek(journal_position)
+            raise DataFileError(f"Could not load {self.data_file}: {e}") from e
+        if isinstance(previous['recipes'], LazyRecipeMap):
+            previous['recipes'].close()
     
+    def has_external_changes(self) -> bool:
+        """Whether another process committed to the data file or its journal since we read or wrote it"""
+        if self._db is not None:
+            # Queries already see other processes' commits, but the meal
+            # plan, hydrated recipes and cached query results do not
+            return self._db.data_version() != self._data_stamp
+        if file_stamp(self.data_file) != self._data_stamp:
+            return True
+        return self._journal.size() != self._journal.offset
+    
+    def reload_if_changed(self) -> bool:
+        """Pick up commits made by other processes; returns whether there were any.
+
+        Costs two stat calls when nothing changed. Takes no lock, so it
+        never waits for a writer.
+        """
+        if not self.has_external_changes():
+            return False
+        self._catch_up()
+        return True
+    
+    def _catch_up(self):
+        """Merge in what other processes committed since we last read or wrote.
+
+        A journal that grew is replayed from where we left off; a replaced
+        data file is loaded again. Our own unpersisted mutations are then
+        applied once more on top, so they are not lost and win over older
+        changes to the same fields.
+
+        Raises DataFileError, keeping the catalog as it is, if the new data
+        file cannot be read, or if our unpersisted changes were too many to
+        keep as records and so cannot be applied over it.
+        """
+        if self._db is not None:
+            # Our own writes are in the database already
+            self._data_stamp = self._db.data_version()
+            self.recipes.forget()
+            self.meal_plan = self._db.load_meal_plan()
+            self._generation += 1
+            return
+        if file_stamp(self.data_file) != self._data_stamp:
+            if self._pending_overflow:
+                raise DataFileError(f"{self.data_file} was replaced by another process during a "
+                                    f"large batch of changes, which cannot be merged into it; "
+                                    f"nothing was saved. Reopen the catalog and repeat the batch")
+            self._reload()
+        else:
+            ops = self._journal.read_new()
+            if not ops:
+                return
+            self._apply_ops(ops)
+            print(f"Applied {len(ops)} changes made by another process")
+        self._apply_ops(self._pending)
+    
+    def _apply_ops(self, ops: List[dict]):
+        """Apply journal records without recording them again"""
+        self._recording = False
+        try:
+            for op in ops:
+                self._apply_op(op)
+        finally:
+            self._recording = True
+    
+    @timed('save_data')
     def save_data(self):
-        """Save recipes and meal plans to JSON file"""
+        """Save recipes and meal plans to the data file.
+
+        Raises DataFileError if they could not be written; the changes stay
+        pending in memory for a later save.
+        """
+        try:
+            if self._db is not None:
+                self._db.commit()
+                self._save_similar()
+                return
+            with self._lock:
+                self.finish_save(self.prepare_save()())
+        except DataFileError:
+            raise
+        except Exception as e:
+            raise DataFileError(f"Could not save {self.data_file}: {e}") from e
+    
+    @property
+    def write_lock(self) -> FileLock:
+        """The lock to hold around prepare_save() and finish_save()"""
+        return self._lock
+    
+    def prepare_save(self) -> Callable[[], tuple]:
+        """Merge other processes' commits and capture the catalog for a full save.
+
+        save_data() in steps, for callers that write the file on another
+        thread. Call with write_lock held. Returns the step that writes the
+        file, which reads nothing but the captured recipes: it may run on
+        any thread as long as the catalog is not changed until its result
+        has been passed to finish_save().
+        """
+        self._catch_up()
+        if isinstance(self.recipes, LazyRecipeMap):
+            recipe_dicts = self.recipes.iter_dicts()
+        else:
+            recipes = list(self.recipes.values())
+            recipe_dicts = (recipe.to_dict() for recipe in recipes)
+        meal_plan_dict = self.meal_plan.to_dict()
+        
+        def write() -> tuple:
+            locations = self.storage.save(recipe_dicts, meal_plan_dict)
+            return locations, file_stamp(self.data_file)
+        return write
+    
+    def finish_save(self, written: tuple):
+        """Adopt the file written by the step from prepare_save() (still holding write_lock)"""
+        locations, self._data_stamp = written
+        if isinstance(self.recipes, LazyRecipeMap):
+            self.recipes.saved(locations)
+        self._pending = []
+        self._pending_overflow = False
+        self._journal.clear()
+        if self._snapshot is not None:
+            self._save_snapshot(self._data_stamp)
+        self._save_similar()
+        print(f"Data saved to {self.data_file}")
+    
+    def close(self):
+        """Save anything not yet persisted, wait for the snapshot writer and release open files.
+
+        If saving fails, DataFileError is raised and the manager stays usable.
+        """
+        if self.unsaved_changes or (self._similar is not None and self._similar.dirty):
+            self.save_data()
+        if self._snapshot is not None:
+            self._snapshot.wait()
+        if isinstance(self.recipes, LazyRecipeMap):
+            self.recipes.close()
+        if self._db is not None:
+            self._db.close()
+    
+    def memory_estimate(self) -> int:
+        """Approximate bytes this catalog keeps in memory"""
+        meals = self.meal_plan.meal_count() * MEAL_MEMORY
+        if self._db is not None:
+            return meals  # recipes and their indexes stay in the database
+        return len(self.recipes) * RECIPE_MEMORY + meals
+    
+    def iter_recipe_dicts(self) -> Iterator[dict]:
+        """Yield every recipe as a dict, without hydrating lazily loaded ones"""
+        if isinstance(self.recipes, LazyRecipeMap):
+            return self.recipes.iter_dicts()
+        return (recipe.to_dict() for recipe in self.recipes.values())
+    
+    def _snapshot_state(self) -> dict:
+        return {
+            'symbols': list(SYMBOLS),
+            'recipes': self.recipes,
+            'meal_plan': self.meal_plan,
+            'search_index': self._search_index,
+            'columns': self._columns,
+            'ratings': self._ratings,
+            'pantry': self._pantry
+        }
+    
+    def _restore_snapshot(self, state: dict):
+        SYMBOLS.update(state['symbols'])
+        self.recipes = state['recipes']
+        # Restored recipes have no listeners yet; they can all share one
+        # tuple because add_listener() replaces it rather than mutating it
+        listeners = (self._on_recipe_changed,)
+        for recipe in self.recipes.values():
+            recipe._listeners = listeners
+        self.meal_plan = state['meal_plan']
+        self._search_index = state['search_index']
+        self._columns = state['columns']
+        self._ratings = state['ratings']
+        self._pantry = state['pantry']
+    
+    def _save_snapshot(self, stamp: Optional[Tuple[int, int, int]]):
+        """Rewrite the snapshot in the background as that of data file version stamp"""
+        generation = self._generation
+        self._snapshot.save_in_background(self._snapshot_state,
+                                          lambda: self._generation == generation, stamp)
+    
+    def compact(self):
+        """Fold the journal into a fresh snapshot"""
+        self.save_data()
+    
+    def _record(self, op: dict):
+        """Persist a single mutation"""
+        self._generation += 1
+        if not self._recording:
+            return
+        if self._db is not None:
+            # New recipes were already written by assigning into self.recipes
+            if op['op'] != 'put_recipe':
+                self._db.apply_op(op)
+            return
+        if not self._pending_overflow:
+            self._pending.append(op)
+            if len(self._pending) >= self.compact_every:
+                # A batch this big is persisted by a full save anyway
+                self._pending = []
+                self._pending_overflow = True
+        if not self._batch_depth:
+            self._flush()
+    
+    def _flush(self, compact: bool = True):
+        """Persist pending mutations: append them to the journal, or rewrite the data file.
+
+        With compact unset a journal grown past compact_every is left for
+        the caller to compact.
+        """
+        if not self._append_journal or self._pending_overflow:
+            self.save_data()
+            return
         try:
-            data = {
-                'recipes': [recipe.to_dict() for recipe in self.recipes.values()],
-                'meal_plan': self.meal_plan.to_dict()
-            }
-            with open(self.data_file, 'w') as f:
-                json.dump(data, f, indent=2)
-            print(f"Data saved to {self.data_file}")
+            with self._lock:
+                self._catch_up()
+                self._journal.append_many(self._pending)
+            self._pending = []
+        except DataFileError:
+            raise
         except Exception as e:
-            print(f"Error saving data: {e}")
+            print(f"Error writing journal: {e}")
+            self.save_data()
+            return
+        if compact and self.compaction_due:
+            self.compact()
+    
+    @contextmanager
+    def batch(self, save: bool = True):
+        """Group mutations so they are persisted once, when the outermost batch exits.
+
+        In journal mode a small batch is appended to the journal with one
+        fsync instead. With save=False no full rewrite is done on exit, not
+        even a journal compaction; the caller saves later if unsaved_changes
+        or compaction_due is set.
+        """
+        self._batch_depth += 1
+        if self._db is not None:
+            self._db.defer_commits = True
+        try:
+            yield self
+        finally:
+            self._batch_depth -= 1
+            if self._batch_depth == 0:
+                if self._db is not None:
+                    self._db.defer_commits = False
+                    self._db.commit()
+                elif self._pending or self._pending_overflow:
+                    if save or (self._append_journal and not self._pending_overflow):
+                        self._flush(compact=save)
+    
+    @property
+    def unsaved_changes(self) -> bool:
+        """Whether batched mutations are waiting for save_data()"""
+        return bool(self._pending) or self._pending_overflow
+    
+    @property
+    def compaction_due(self) -> bool:
+        """Whether the journal has grown enough to be folded into the data file by save_data()"""
+        return self._journal is not None and len(self._journal) >= self.compact_every
+    
+    def _apply_op(self, op: dict):
+        """Apply a journal record to the in-memory catalog"""
+        kind = op['op']
+        if kind == 'put_recipe':
+            recipe = Recipe.from_dict(op['recipe'])
+            self.recipes[recipe.id] = recipe
+            self._attach_recipe(recipe)
+        elif kind == 'add_meal':
+            self.meal_plan.add_meal(date.fromisoformat(op['date']), op['meal_type'], op['recipe_id'])
+        elif kind == 'replace_meals':
+            self.meal_plan.remove_meals(date.fromisoformat(op['start']), date.fromisoformat(op['end']))
+            for date_str, meal_type, recipe_id in op['meals']:
+                self.meal_plan.add_meal(date.fromisoformat(date_str), meal_type, recipe_id)
+        elif op.get('id') in self.recipes:
+            recipe = self.recipes[op['id']]
+            if kind == 'set_rating':
+                recipe.set_rating(op['rating'])
+            elif kind == 'add_tag':
+                recipe.add_tag(op['tag'])
+            elif kind == 'set_ingredient':
+                recipe.set_ingredient(op['ingredient'], op['amount'])
+    
+    def _attach_recipe(self, recipe: Recipe):
+        """Index a recipe and keep the indexes in sync with later edits"""
+        if self._db is None:
+            self._search_index.add(recipe.id, recipe.name, recipe.ingredients.keys(), recipe.tags)
+            self._columns.add(recipe.id, recipe.category, recipe.prep_time, recipe.cook_time,
+                              recipe.servings, recipe.rating)
+            self._ratings.add(recipe.id, recipe.rating)
+            self._pantry.add(recipe.id, recipe.ingredients)
+        self._update_similar(recipe)
+        self._watch_recipe(recipe)
+    
+    def _index_record(self, recipe_data: dict, offset: int, length: int):
+        """Index a recipe seen while scanning the data file without building it"""
+        self.recipes.add_location(recipe_data['id'], offset, length)
+        self._search_index.add(recipe_data['id'], recipe_data['name'],
+                               recipe_data['ingredients'].keys(), recipe_data.get('tags', []))
+        self._columns.add(recipe_data['id'], recipe_data['category'], recipe_data['prep_time'],
+                          recipe_data['cook_time'], recipe_data['servings'],
+                          recipe_data.get('rating', 0))
+        self._ratings.add(recipe_data['id'], recipe_data.get('rating', 0))
+        self._pantry.add(recipe_data['id'], recipe_data['ingredients'])
+    
+    def _watch_recipe(self, recipe: Recipe):
+        recipe.add_listener(self._on_recipe_changed)
+    
+    def _on_recipe_changed(self, recipe: Recipe, attribute: str, old_value, new_value):
+        if isinstance(self.recipes, LazyRecipeMap):
+            self.recipes.mark_dirty(recipe)
+        if attribute == 'tags':
+            if self._db is None:
+                self._search_index.add_text(recipe.id, new_value)
+            self._update_similar(recipe)
+            self._record({'op': 'add_tag', 'id': recipe.id, 'tag': new_value})
+        elif attribute == 'ingredients':
+            self._quantities.invalidate(recipe.id)
+            if self._db is None:
+                self._search_index.add_text(recipe.id, new_value)
+                self._pantry.add_ingredient(recipe.id, new_value)
+            self._update_similar(recipe)
+            self._record({'op': 'set_ingredient', 'id': recipe.id, 'ingredient': new_value,
+                          'amount': recipe.ingredients[new_value]})
+        elif attribute == 'rating':
+            if self._db is None:
+                self._columns.set_rating(recipe.id, new_value)
+                self._ratings.set_rating(recipe.id, new_value)
+            self._record({'op': 'set_rating', 'id': recipe.id, 'rating': new_value})
+    
+    def _put_recipe(self, recipe: Recipe):
+        self.recipes[recipe.id] = recipe
+        self._attach_recipe(recipe)
+        self._quantities.invalidate(recipe.id)
+        self._record({'op': 'put_recipe', 'recipe': recipe.to_dict()})
     
     def add_recipe(self, recipe: Recipe):
         """Add a new recipe"""
-        self.recipes[recipe.id] = recipe
-        self.save_data()
+        self._put_recipe(recipe)
         print(f"Recipe '{recipe.name}' added successfully!")
     
+    def add_recipes(self, recipes: Iterable[Recipe]) -> int:
+        """Add many recipes with a single save at the end"""
+        count = 0
+        with self.batch():
+            for recipe in recipes:
+                self._put_recipe(recipe)
+                count += 1
+        return count
+    
+    def plan_meal(self, meal_date: date, meal_type: str, recipe_id: str):
+        """Assign a recipe to a meal slot"""
+        self.meal_plan.add_meal(meal_date, meal_type, recipe_id)
+        self._record({'op': 'add_meal', 'date': meal_date.isoformat(),
+                      'meal_type': meal_type, 'recipe_id': recipe_id})
+    
+    def remove_meals(self, start_date: date, end_date: date) -> int:
+        """Unplan every meal in [start_date, end_date)"""
+        removed = self.meal_plan.remove_meals(start_date, end_date)
+        if removed:
+            self._record({'op': 'replace_meals', 'start': start_date.isoformat(),
+                          'end': end_date.isoformat(), 'meals': []})
+        return removed
+    
+    def reschedule_meals(self, start_date: date, end_date: date, shift_days: int) -> int:
+        """Move meals in [start_date, end_date) by shift_days"""
+        moved = self.meal_plan.reschedule(start_date, end_date, shift_days)
+        if moved:
+            # Recorded as "clear the range, then plan these meals" so replaying it is idempotent
+            self._record({'op': 'replace_meals', 'start': start_date.isoformat(),
+                          'end': end_date.isoformat(),
+                          'meals': [[day.isoformat(), meal_type, recipe_id]
+                                    for day, meal_type, recipe_id in moved]})
+        return len(moved)
+    
+    def _plan_candidates(self, constraints: PlanConstraints,
+                         include_ids: List[str]) -> Iterator[Tuple[str, str, float, int, int]]:
+        """(recipe_id, category, total_time, rating, ingredient bitset) for the meal planner"""
+        if self._db is not None:
+            pantry = PantryIndex()
+            for recipe_id, category, total_time, rating, ingredients in self._db.planning_rows(
+                    constraints.min_rating, constraints.max_day_time, include_ids):
+                pantry.add(recipe_id, ingredients)
+                yield recipe_id, category, total_time, rating, pantry.mask_of(recipe_id)
+            return
+        # Straight from the column arrays and pantry bitsets: no recipe is hydrated
+        for recipe_id, category, total_time, rating in self._columns.rows():
+            yield recipe_id, category, total_time, rating, self._pantry.mask_of(recipe_id)
+    
+    @timed('generate_meal_plan')
+    def generate_meal_plan(self, start_date: date, days: int,
+                           constraints: Optional[PlanConstraints] = None, replace: bool = False,
+                           time_budget: float = 0.5) -> PlanResult:
+        """Fill every meal slot of days days from start_date under constraints.
+
+        Meals already planned in the range are kept, unless replace is set.
+        Stops improving the plan after time_budget seconds.
+        """
+        constraints = constraints if constraints is not None else PlanConstraints()
+        end_date = start_date + timedelta(days=max(days, 0))
+        # Meals planned just outside the range still count for no_repeat_days
+        margin = timedelta(days=max(constraints.no_repeat_days - 1, 0))
+        fixed = [meal for meal in self.meal_plan.iter_meals(start_date - margin, end_date + margin)
+                 if not (replace and start_date <= meal[0] < end_date)]
+        candidates = self._plan_candidates(constraints, sorted({recipe_id for _, _, recipe_id in fixed}))
+        result = MealPlanGenerator(candidates, constraints).generate(start_date, days, fixed, time_budget)
+        
+        if replace:
+            self.meal_plan.remove_meals(start_date, end_date)
+        for meal_date, meal_type, recipe_id in result.meals:
+            self.meal_plan.add_meal(meal_date, meal_type, recipe_id)
+        if result.meals or replace:
+            # One record for the whole range, like reschedule_meals
+            self._record({'op': 'replace_meals', 'start': start_date.isoformat(),
+                          'end': end_date.isoformat(),
+                          'meals': [[day.isoformat(), meal_type, recipe_id] for day, meal_type, recipe_id
+                                    in self.meal_plan.iter_meals(start_date, end_date)]})
+        return result
+    
+    def get_recipes(self, recipe_ids: Iterable[str]) -> List[Recipe]:
+        """Recipes for the given ids in order, skipping unknown ones"""
+        if self._db is not None:
+            return self.recipes.get_many(list(recipe_ids))
+        return [self.recipes[recipe_id] for recipe_id in recipe_ids if recipe_id in self.recipes]
+    
+    def _cached_ids(self, key: tuple, run_query) -> Tuple[str, ...]:
+        """Ids run_query() returns, memoized until the next mutation (by any process, for SQLite)"""
+        generation = self._generation
+        if self._db is not None:
+            generation = (generation, self._db.data_version())
+        ids = self._query_cache.get(key, generation)
+        if ids is None:
+            ids = self._query_cache.put(key, generation, tuple(run_query()))
+        return ids
+    
+    def _cached_query(self, key: tuple, run_query) -> List[Recipe]:
+        """Recipes for the ids run_query() returns, memoized until the next mutation"""
+        return self.get_recipes(self._cached_ids(key, run_query))
+    
+    def search_recipe_ids(self, query: str) -> Tuple[str, ...]:
+        """Ids of search_recipes(query) without loading the recipes"""
+        if self._db is not None:
+            return self._cached_ids(('search', query.lower()), lambda: self._db.search(query))
+        return self._cached_ids(('search', query.lower()), lambda: self._search_index.search(query))
+    
+    @timed('search_recipes')
     def search_recipes(self, query: str) -> List[Recipe]:
         """Search recipes by name, ingredients, or tags"""
-        query = query.lower()
-        results = []
-        
-        for recipe in self.recipes.values():
-            # Search in name
-            if query in recipe.name.lower():
-                results.append(recipe)
-                continue
-            
-            # Search in ingredients
-            if any(query in ingredient.lower() for ingredient in recipe.ingredients.keys()):
-                results.append(recipe)
-                continue
-            
-            # Search in tags
-            if any(query in tag.lower() for tag in recipe.tags):
-                results.append(recipe)
-        
-        return results
+        return self.get_recipes(self.search_recipe_ids(query))
     
+    @timed('filter_by_category')
     def filter_by_category(self, category: str) -> List[Recipe]:
         """Filter recipes by category"""
-        return [recipe for recipe in self.recipes.values() 
-                if recipe.category.lower() == category.lower()]
+        if self._db is not None:
+            return self._cached_query(('category', category.lower()),
+                                      lambda: self._db.filter_by_category(category))
+        return self._cached_query(('category', category.lower()),
+                                  lambda: self._columns.ids_in_category(category))
     
+    @timed('filter_by_time')
     def filter_by_time(self, max_time: int) -> List[Recipe]:
         """Filter recipes by maximum total cooking time"""
-        return [recipe for recipe in self.recipes.values() 
-                if recipe.total_time() <= max_time]
+        if self._db is not None:
+            return self._cached_query(('time', max_time), lambda: self._db.filter_by_time(max_time))
+        return self._cached_query(('time', max_time), lambda: self._columns.ids_within_time(max_time))
     
-    def get_top_rated(self, limit: int = 5) -> List[Recipe]:
-        """Get top rated recipes"""
-        rated_recipes = [recipe for recipe in self.recipes.values() if recipe.rating > 0]
-        return sorted(rated_recipes, key=lambda x: x.rating, reverse=True)[:limit]
+    @timed('get_top_rated')
+    def get_top_rated(self, limit: int = 5, offset: int = 0) -> List[Recipe]:
+        """Get top rated recipes, best first; offset pages through the rest"""
+        if self._db is not None:
+            return self.recipes.get_many(self._db.get_top_rated(limit, offset))
+        return [self.recipes[recipe_id] for recipe_id in self._ratings.top(limit, offset)]
     
+    @timed('find_by_pantry')
+    def find_by_pantry(self, pantry: Iterable[str], ignore_staples: bool = False,
+                       limit: Optional[int] = 10,
+                       max_missing: Optional[int] = None) -> List[Tuple[Recipe, List[str]]]:
+        """Recipes ranked by how well the pantry covers them.
+
+        Fully makeable recipes come first, then those missing the fewest
+        ingredients. With ignore_staples, STAPLES (salt, pepper, oil...)
+        count as always available. Returns (recipe, missing ingredients).
+        """
+        have = {normalize_name(ingredient) for ingredient in pantry}
+        if ignore_staples:
+            have |= STAPLES
+        if self._db is not None:
+            ranked = self._db.rank_by_pantry(sorted(have), limit, max_missing)
+            recipes = self.recipes.get_many([recipe_id for recipe_id, missing in ranked])
+        else:
+            ranked = self._pantry.rank(have, limit, max_missing)
+            recipes = [self.recipes[recipe_id] for recipe_id, missing in ranked]
+        return [(recipe, [ingredient for ingredient in recipe.ingredients
+                          if normalize_name(ingredient) not in have])
+                for recipe in recipes]
+    
+    def _update_similar(self, recipe: Recipe):
+        if self._similar is not None:
+            self._similar.add(recipe.id, recipe_features(recipe.ingredients, recipe.tags, recipe.category),
+                              fingerprint(recipe.ingredients, recipe.tags, recipe.category))
+    
+    def _similarity_source(self) -> Optional[tuple]:
+        """Identifies the saved catalog version the recipes in memory match; None with unsaved changes"""
+        if self.unsaved_changes:
+            return None
+        if self._db is not None:
+            return file_stamp(self.data_file)
+        if self._data_stamp is None:
+            return None
+        return self._data_stamp, self._journal.offset
+    
+    def _save_similar(self):
+        """Save the similar-recipe table if loaded and not saved for the current catalog version"""
+        if self._similar is None:
+            return
+        source = self._similarity_source()
+        if self._similar.dirty or (source is not None and source != self._similar.source):
+            self._similar.source = source
+            try:
+                self._similar.save(self._similar_path)
+            except OSError as e:
+                print(f"Error saving similar-recipe table: {e}")
+    
+    def _similarity_index(self) -> SimilarityIndex:
+        """Load the saved similar-recipe table, re-indexing recipes that changed since.
+
+        A table saved for the catalog version now loaded is used as is;
+        only otherwise is every recipe checked against it.
+        """
+        if self._similar is not None:
+            return self._similar
+        source = self._similarity_source()
+        index = SimilarityIndex.load(self._similar_path)
+        if index is not None and source is not None and index.source == source:
+            self._similar = index
+            return index
+        index = index or SimilarityIndex()
+        stale = []
+        for recipe_data in self.iter_recipe_dicts():
+            ingredients, tags, category = (recipe_data['ingredients'], recipe_data.get('tags', []),
+                                         recipe_data['category'])
+            recipe_fingerprint = fingerprint(ingredients, tags, category)
+            if index.fingerprint_of(recipe_data['id']) != recipe_fingerprint:
+                stale.append((recipe_data['id'], recipe_features(ingredients, tags, category),
+                              recipe_fingerprint))
+        if stale:
+            print(f"Indexing {len(stale)} recipes for similar-recipe suggestions...")
+            if len(index):
+                for recipe_id, features, recipe_fingerprint in stale:
+                    index.add(recipe_id, features, recipe_fingerprint)
+            else:
+                index.build(stale)
+        self._similar = index
+        self._save_similar()
+        return index
+    
+    @timed('similar_recipes')
+    def similar_recipes(self, recipe_id: str, limit: int = 5) -> List[Tuple[Recipe, float]]:
+        """Recipes sharing the most ingredients, tags and category with recipe_id.
+
+        Returns (recipe, estimated overlap from 0 to 1) pairs, closest first.
+        """
+        ranked = self._similarity_index().similar(recipe_id, limit)
+        ids = [other for other, score in ranked if other in self.recipes]
+        recipes = self.recipes.get_many(ids) if self._db is not None else [self.recipes[other] for other in ids]
+        scores = dict(ranked)
+        return [(recipe, scores[recipe.id]) for recipe in recipes]
+    
+    def _shopping_items(self, start_date: date, days: int):
+        """Yield (recipe_id, recipe_name, ingredient, amount) for meals in the period"""
+        end_date = start_date + timedelta(days=max(days, 0))
+        if self._db is not None:
+            yield from self._db.shopping_rows(start_date, end_date)
+            return
+        
+        # Only days that actually have meals are visited
+        for meal_date, meal_type, recipe_id in self.meal_plan.iter_meals(start_date, end_date):
+            if recipe_id in self.recipes:
+                recipe = self.recipes[recipe_id]
+                for ingredient, amount in recipe.ingredients.items():
+                    yield recipe_id, recipe.name, ingredient, amount
+    
+    @timed('generate_shopping_list')
     def generate_shopping_list(self, start_date: date, days: int = 7) -> Dict[str, List[str]]:
         """Generate shopping list for meal plan"""
         shopping_list = defaultdict(list)
-        
-        for i in range(days):
-            current_date = start_date + timedelta(days=i)
-            meals = self.meal_plan.get_meals_for_date(current_date)
-            
-            for meal_type, recipe_id in meals.items():
-                if recipe_id in self.recipes:
-                    recipe = self.recipes[recipe_id]
-                    for ingredient, amount in recipe.ingredients.items():
-                        shopping_list[ingredient].append(f"{amount} (for {recipe.name})")
-        
+        for recipe_id, recipe_name, ingredient, amount in self._shopping_items(start_date, days):
+            shopping_list[ingredient].append(f"{amount} (for {recipe_name})")
         return dict(shopping_list)
     
+    @timed('generate_aggregated_shopping_list')
+    def generate_aggregated_shopping_list(self, start_date: date, days: int = 7) -> Dict[str, List[str]]:
+        """Shopping list with amounts summed per ingredient, e.g. {"eggs": ["6 large"]}.
+
+        Amounts that cannot be parsed ("to taste") are listed once as written.
+        """
+        totals = ShoppingTotals()
+        for recipe_id, recipe_name, ingredient, amount in self._shopping_items(start_date, days):
+            totals.add(ingredient, amount, self._quantities.get(recipe_id, ingredient, amount))
+        return totals.result()
+    
+    @timed('get_recipe_stats')
     def get_recipe_stats(self) -> Dict[str, any]:
         """Get statistics about recipes"""
         if not self.recipes:
             return {"message": "No recipes found"}
         
-        total_recipes = len(self.recipes)
-        categories = defaultdict(int)
-        total_time = 0
-        rated_count = 0
-        total_rating = 0
-        
-        for recipe in self.recipes.values():
-            categories[recipe.category] += 1
-            total_time += recipe.total_time()
-            if recipe.rating > 0:
-                rated_count += 1
-                total_rating += recipe.rating
+        # Running totals (or one SQL aggregate) instead of walking every recipe
+        totals = self._db.recipe_stats() if self._db is not None else self._columns.summary()
+        total_recipes = totals['total_recipes']
+        categories = totals['categories']
+        total_time = totals['total_time']
+        rated_count = totals['rated_recipes']
+        total_rating = totals['total_rating']
         
         avg_time = total_time / total_recipes
         avg_rating = total_rating / rated_count if rated_count > 0 else 0
@@ -132,3 +826,98 @@ class RecipeManager:
             "average_rating": round(avg_rating, 1),
             "rated_recipes": rated_count
         }
+    
+    def _history_window(self, start_date: Optional[date], end_date: Optional[date]) -> Tuple[date, date]:
+        """Fill in an open end of [start_date, end_date) from the planned history"""
+        span = self.meal_plan.span()
+        if start_date is None:
+            start_date = span[0] if span else date.today()
+        if end_date is None:
+            end_date = span[1] if span else start_date
+        return start_date, max(start_date, end_date)
+    
+    @timed('most_planned')
+    def most_planned(self, start_date: Optional[date] = None, end_date: Optional[date] = None,
+                     limit: int = 10) -> List[Tuple[Recipe, int]]:
+        """Recipes planned most often in [start_date, end_date) (default: all history), with counts"""
+        start_date, end_date = self._history_window(start_date, end_date)
+        ranked = []
+        for recipe_id, meals in self.meal_plan.history.counts(start_date, end_date).most_common():
+            if len(ranked) >= limit:
+                break
+            if recipe_id in self.recipes:
+                ranked.append((recipe_id, meals))
+        recipes = {recipe.id: recipe for recipe in self.get_recipes([recipe_id for recipe_id, _ in ranked])}
+        return [(recipes[recipe_id], meals) for recipe_id, meals in ranked if recipe_id in recipes]
+    
+    def _usage_by_period(self, start_date: Optional[date], end_date: Optional[date], period: str,
+                         keys_of) -> List[Tuple[date, Dict[str, int]]]:
+        """[(period start, {key: meals})] where keys_of(recipe) lists the keys a meal counts toward"""
+        start_date, end_date = self._history_window(start_date, end_date)
+        history = self.meal_plan.history
+        windows = [(period_start, history.counts(period_start, period_end))
+                   for period_start, period_end in periods(start_date, end_date, period)]
+        # Each distinct recipe is looked up once, however often it was planned
+        planned = {recipe_id for _, counts in windows for recipe_id in counts}
+        keys = {recipe.id: keys_of(recipe) for recipe in self.get_recipes(planned)}
+        result = []
+        for period_start, counts in windows:
+            usage = defaultdict(int)
+            for recipe_id, meals in counts.items():
+                for key in keys.get(recipe_id, ()):
+                    usage[key] += meals
+            result.append((period_start, dict(sorted(usage.items(), key=lambda item: (-item[1], item[0])))))
+        return result
+    
+    @timed('ingredient_usage')
+    def ingredient_usage(self, start_date: Optional[date] = None, end_date: Optional[date] = None,
+                         period: str = 'week') -> List[Tuple[date, Dict[str, int]]]:
+        """Meals using each ingredient per week or month, most used first"""
+        return self._usage_by_period(start_date, end_date, period,
+                                     lambda recipe: {normalize_name(name) for name in recipe.ingredients})
+    
+    @timed('category_mix')
+    def category_mix(self, start_date: Optional[date] = None, end_date: Optional[date] = None,
+                     period: str = 'month') -> List[Tuple[date, Dict[str, int]]]:
+        """Meals per recipe category per week or month"""
+        return self._usage_by_period(start_date, end_date, period, lambda recipe: (recipe.category,))
+    
+    @timed('not_cooked_in')
+    def not_cooked_in(self, days: int, as_of: Optional[date] = None, include_never: bool = False,
+                      limit: Optional[int] = None) -> List[Tuple[Recipe, Optional[date]]]:
+        """Recipes not planned in the days days before as_of (default today), longest ago first.
+
+        Each comes with the last day it was planned; recipes never planned
+        before as_of are listed first (last day None) with include_never.
+        """
+        as_of = as_of or date.today()
+        cutoff = as_of - timedelta(days=days)
+        planned = self.meal_plan.history.last_planned(as_of)
+        candidates = self.recipes if include_never else planned
+        stale = []
+        for recipe_id in candidates:
+            last = planned.get(recipe_id)
+            if (last is None and include_never) or (last is not None and last < cutoff):
+                stale.append((last or date.min, recipe_id, last))
+        stale.sort(key=lambda item: item[:2])
+        stale = [item for item in stale if item[1] in self.recipes][:limit]
+        last_planned = {recipe_id: last for _, recipe_id, last in stale}
+        return [(recipe, last_planned[recipe.id]) for recipe in self.get_recipes(list(last_planned))]
+    
+    def diagnostics(self) -> Dict[str, any]:
+        """Operation timings, I/O byte counts and cache statistics as plain data"""
+        report = self.metrics.snapshot()
+        report["io"] = {}
+        for name, source in (("storage", self.storage), ("journal", self._journal)):
+            # SQLite does its own paging, so only the file-based stores count bytes
+            if source is not None and hasattr(source, 'bytes_read'):
+                report["io"][name] = {"bytes_read": source.bytes_read,
+                                      "bytes_written": source.bytes_written}
+        report["caches"] = {"quantities": {"recipes": len(self._quantities),
+                                           "hits": self._quantities.hits,
+                                           "misses": self._quantities.misses},
+                            "queries": self._query_cache.stats()}
+        if isinstance(self.recipes, LazyRecipeMap):
+            report["caches"]["resident_recipes"] = self.recipes.resident_count()
+        report["catalog"] = {"recipes": len(self.recipes), "planned_days": len(self.meal_plan.meals)}
+        return report
@@ -0,0 +1,156 @@
+from array import array
+from typing import Dict, Iterable, List, Set
+
+class _Postings(dict):
+    """{gram: {text}} that creates empty postings on first use.
+
+    Postings restored from a snapshot stay packed as arrays of text
+    numbers and are only turned into sets when a gram is looked up, so
+    restoring an index costs next to nothing.
+    """
+
+    def __init__(self, packed: Dict[str, bytes] = None, texts: Dict[int, str] = None):
+        super().__init__()
+        self._packed = packed or {}  # {gram: array('I') bytes of text numbers}
+        self._texts = texts or {}  # {text number: text}
+
+    def __missing__(self, gram: str) -> Set[str]:
+        packed = self._packed.pop(gram, None)
+        posting = set()
+        if packed is not None:
+            numbers = array('I')
+            numbers.frombytes(packed)
+            posting.update(map(self._texts.__getitem__, numbers))
+        self[gram] = posting
+        return posting
+
+    def get(self, gram: str, default=None):
+        if gram in self or gram in self._packed:
+            return self[gram]
+        return default
+
+    def discard(self, gram: str, text: str):
+        """Drop text from gram's posting, and the posting once it is empty"""
+        posting = self.get(gram)
+        if posting is not None:
+            posting.discard(text)
+            if not posting:
+                del self[gram]
+
+    def packed(self, numbers: Dict[str, int]) -> Dict[str, bytes]:
+        """Every posting as array('I') bytes of text numbers"""
+        packed = dict(self._packed)
+        for gram, posting in list(self.items()):
+            if posting:
+                packed[gram] = array('I', map(numbers.__getitem__, posting)).tobytes()
+        return packed
+
+class SearchIndex:
+    """Substring index over recipe names, ingredient names and tags.
+
+    Every distinct lowercased text is broken into its 3-character grams
+    once, however many recipes share it, and maps to the recipes that
+    contain it. A query is answered by intersecting the posting sets of its
+    grams, confirming the substring match on the few surviving texts and
+    taking the recipes of the texts that match, so results are identical to
+    a linear scan. Queries shorter than a gram match most texts anyway and
+    are checked against every distinct text instead.
+    """
+
+    GRAM_SIZE = 3
+
+    def __init__(self):
+        self._postings = _Postings()  # {gram: {text}}
+        self._recipes = {}  # {text: {recipe_id}}
+        self._texts = {}  # {recipe_id: {lowercased text}}
+        self._positions = {}  # {recipe_id: insertion position}
+        self._next_position = 0
+
+    @classmethod
+    def _grams(cls, text: str) -> Set[str]:
+        return {text[i:i + cls.GRAM_SIZE] for i in range(len(text) - cls.GRAM_SIZE + 1)}
+
+    def add(self, recipe_id: str, name: str, ingredient_names: Iterable[str], tags: Iterable[str]):
+        """Index (or re-index) a recipe, keeping its original position"""
+        if recipe_id in self._positions:
+            self.remove(recipe_id, keep_position=True)
+        else:
+            self._positions[recipe_id] = self._next_position
+            self._next_position += 1
+
+        texts = {name.lower()}
+        texts.update(map(str.lower, ingredient_names))
+        texts.update(map(str.lower, tags))
+        self._texts[recipe_id] = texts
+        for text in texts:
+            self._link(recipe_id, text)
+
+    def add_text(self, recipe_id: str, text: str):
+        """Index one more searchable string for an already indexed recipe"""
+        text = text.lower()
+        texts = self._texts[recipe_id]
+        if text not in texts:
+            texts.add(text)
+            self._link(recipe_id, text)
+
+    def _link(self, recipe_id: str, text: str):
+        recipes = self._recipes.get(text)
+        if recipes is None:
+            # First recipe with this text: only now is it broken into grams
+            recipes = self._recipes[text] = set()
+            postings = self._postings
+            for gram in self._grams(text):
+                postings[gram].add(text)
+        recipes.add(recipe_id)
+
+    def remove(self, recipe_id: str, keep_position: bool = False):
+        for text in self._texts.pop(recipe_id, ()):
+            recipes = self._recipes[text]
+            recipes.discard(recipe_id)
+            if not recipes:
+                del self._recipes[text]
+                for gram in self._grams(text):
+                    self._postings.discard(gram, text)
+        if not keep_position:
+            self._positions.pop(recipe_id, None)
+
+    def search(self, query: str) -> List[str]:
+        """Return ids of recipes with a text containing query, in insertion order"""
+        query = query.lower()
+        if not query:
+            matches: Iterable[str] = self._texts.keys()
+        else:
+            if len(query) < self.GRAM_SIZE:
+                candidates: Iterable[str] = self._recipes
+            else:
+                postings = []
+                for gram in self._grams(query):
+                    posting = self._postings.get(gram)
+                    if not posting:
+                        return []
+                    postings.append(posting)
+                postings.sort(key=len)
+                candidates = set(postings[0]).intersection(*postings[1:])
+            matches = set()
+            for text in candidates:
+                if query in text:
+                    matches.update(self._recipes[text])
+
+        return sorted(matches, key=self._positions.__getitem__)
+
+    def __getstate__(self):
+        numbers = {text: number for number, text in enumerate(self._recipes)}
+        return {'postings': self._postings.packed(numbers), 'recipes': self._recipes,
+                'texts': self._texts, 'positions': self._positions,
+                'next_position': self._next_position}
+
+    def __setstate__(self, state):
+        self._recipes = state['recipes']
+        self._texts = state['texts']
+        self._positions = state['positions']
+        self._next_position = state['next_position']
+        # Text numbers follow _recipes' order, which pickling preserves
+        self._postings = _Postings(state['postings'], dict(enumerate(self._recipes)))
+
+    def __len__(self) -> int:
+        return len(self._texts)
@@ -0,0 +1,407 @@
+"""Local HTTP/JSON service around one shared RecipeManager.
+
+Everyone talks to the same in-memory catalog instead of loading (and
+overwriting) the data file themselves. Requests are handled on one asyncio
+event loop: reads run straight against the catalog, so they are never
+queued behind each other or behind a slow client. Mutations go through a
+single writer task that applies everything queued at once inside one
+RecipeManager.batch() and saves once per group, answering each request
+only when its change is on disk. While an eager JSON catalog is being
+written out (a full save or a journal compaction), the rewrite runs on a
+worker thread and reads keep being served. Commits made to the data file
+by other processes are picked up within CHANGE_CHECK_INTERVAL seconds.
+
+Endpoints (JSON in, JSON out):
+
+    GET  /recipes?q=&category=&max_time=&limit=&offset=
+    GET  /recipes/top?limit=&offset=
+    GET  /recipes/<id>
+    GET  /recipes/<id>/similar?limit=
+    POST /recipes                       {recipe object, as for import}
+    POST /recipes/<id>/rating           {"rating": 4}
+    POST /recipes/<id>/tags             {"tag": "quick"}
+    GET  /stats
+    GET  /meal-plan?start=&days=
+    POST /meal-plan                     {"date": ..., "meal_type": ..., "recipe_id": ...}
+    POST /meal-plan/generate            {"start": ..., "days": ..., "max_time": ..., ...}
+    GET  /shopping-list?start=&days=&itemized=1
+    GET  /diagnostics
+"""
+import asyncio
+import json
+import time
+import uuid
+from datetime import date, datetime, timedelta
+from http import HTTPStatus
+from typing import Callable, Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, unquote, urlsplit
+from import_pipeline import normalize_record
+from meal_planner import PlanConstraints
+from models import Recipe
+from recipe_manager import RecipeManager
+from storage import DataFileError, JsonStorage, LazyRecipeMap
+
+MAX_BODY = 1 << 20  # bytes accepted in a request body
+MAX_WRITE_BATCH = 512  # queued writes applied (and saved) together
+DEFAULT_LIMIT = 50
+CHANGE_CHECK_INTERVAL = 1.0  # seconds between checks for other processes' commits
+# Plan generation runs on the writer, holding up every other write (and,
+# while it searches, every read): these bound one request's share
+MAX_PLAN_DAYS = 366
+MAX_PLAN_TIME_BUDGET = 2.0
+
+class HttpError(Exception):
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+
+def recipe_summary(recipe: Recipe) -> dict:
+    return {
+        'id': recipe.id,
+        'name': recipe.name,
+        'category': recipe.category,
+        'total_time': recipe.total_time(),
+        'rating': recipe.rating,
+        'tags': recipe.tags
+    }
+
+def _param(query: Dict[str, List[str]], name: str, default=None, kind: type = str):
+    values = query.get(name)
+    if not values:
+        return default
+    try:
+        if kind is date:
+            return datetime.strptime(values[-1], "%Y-%m-%d").date()
+        return kind(values[-1])
+    except ValueError:
+        raise HttpError(400, f"invalid {name}: {values[-1]!r}")
+
+def _field(body: dict, name: str, kind: type = str, default=None):
+    if name not in body:
+        if default is not None:
+            return default
+        raise HttpError(400, f"missing {name}")
+    try:
+        if kind is date:
+            return datetime.strptime(str(body[name]), "%Y-%m-%d").date()
+        return kind(body[name])
+    except (TypeError, ValueError):
+        raise HttpError(400, f"invalid {name}: {body[name]!r}")
+
+def _meal_categories(body: dict) -> Dict[str, List[str]]:
+    """{meal_type: [category, ...]} from a "categories" field of lists or comma-separated strings"""
+    categories = body.get('categories') or {}
+    if not isinstance(categories, dict):
+        raise HttpError(400, "categories must map meal types to lists of categories")
+    result = {}
+    for meal_type, allowed in categories.items():
+        if isinstance(allowed, str):
+            allowed = allowed.split(',')
+        if not isinstance(allowed, list) or not all(isinstance(category, str) for category in allowed):
+            raise HttpError(400, f"invalid categories for {meal_type}: {allowed!r}")
+        result[meal_type.strip().lower()] = [category.strip() for category in allowed if category.strip()]
+    return result
+
+class RecipeServer:
+    def __init__(self, manager: RecipeManager):
+        self.manager = manager
+        self._writes = None  # asyncio.Queue of (change, future), created on the loop
+        self._writer = None
+        self.requests = 0
+        self.write_batches = 0
+        self.writes = 0
+        self._checked_at = 0.0  # when reads last looked for other processes' commits
+        # Saving an eager JSON catalog only reads the in-memory recipes, so
+        # it can run beside the reads. Lazy maps and SQLite connections must
+        # stay on the loop thread.
+        self._save_off_loop = (isinstance(manager.storage, JsonStorage)
+                               and not isinstance(manager.recipes, LazyRecipeMap))
+        self._saving = False  # a rewrite is running on a worker thread
+
+    async def start(self, host: str = "127.0.0.1", port: int = 8080) -> asyncio.AbstractServer:
+        self._writes = asyncio.Queue()
+        self._writer = asyncio.ensure_future(self._write_loop())
+        return await asyncio.start_server(self._serve_connection, host, port)
+
+    async def close(self):
+        """Finish queued writes, then stop the writer"""
+        if self._writer is not None:
+            await self._writes.join()
+            self._writer.cancel()
+            try:
+                await self._writer
+            except asyncio.CancelledError:
+                pass
+
+    # Writes
+
+    async def submit(self, change: Callable[[], object]):
+        """Queue a mutation for the writer; returns its result once it is saved"""
+        future = asyncio.get_running_loop().create_future()
+        await self._writes.put((change, future))
+        return await future
+
+    async def _apply(self, jobs: List[Tuple[Callable[[], object], asyncio.Future]]) -> List[tuple]:
+        """Apply and persist a group of changes; [(future, result, error)] in job order"""
+        outcomes = []
+        with self.manager.batch(save=False):
+            for change, future in jobs:
+                try:
+                    outcomes.append((future, change(), None))
+                except Exception as e:
+                    outcomes.append((future, None, e))
+        if self.manager.unsaved_changes or self.manager.compaction_due:
+            await self._save()
+        return outcomes
+
+    async def _save(self):
+        """Rewrite the data file, on a worker thread when possible"""
+        manager = self.manager
+        if not self._save_off_loop:
+            manager.save_data()
+            return
+        loop = asyncio.get_running_loop()
+        lock = manager.write_lock
+        await loop.run_in_executor(None, lock.acquire)
+        try:
+            # Merging other processes' commits changes the catalog, so it
+            # happens here on the loop; the worker only reads the recipes,
+            # which nothing changes until this group is answered
+            write = manager.prepare_save()
+            self._saving = True
+            try:
+                written = await loop.run_in_executor(None, write)
+            finally:
+                self._saving = False
+            manager.finish_save(written)
+        finally:
+            lock.release()
+
+    async def _write_loop(self):
+        while True:
+            jobs = [await self._writes.get()]
+            while len(jobs) < MAX_WRITE_BATCH and not self._writes.empty():
+                jobs.append(self._writes.get_nowait())
+            try:
+                outcomes = await self._apply(jobs)
+            except Exception as e:
+                # Nothing in the group is known to be on disk: fail all of it,
+                # and keep serving. Changes applied in memory stay pending for
+                # the next group's save.
+                print(f"Could not persist {len(jobs)} change(s): {e}")
+                outcomes = [(future, None, e) for _, future in jobs]
+            self.write_batches += 1
+            self.writes += len(jobs)
+            for future, result, error in outcomes:
+                if future.cancelled():
+                    continue
+                if error is not None:
+                    future.set_exception(error)
+                else:
+                    future.set_result(result)
+            for _ in jobs:
+                self._writes.task_done()
+
+    # HTTP
+
+    async def _serve_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            while True:
+                try:
+                    request = await self._read_request(reader)
+                except HttpError as e:
+                    await self._respond(writer, e.status, {'error': str(e)}, keep_alive=False)
+                    break
+                if request is None:
+                    break
+                method, target, body, keep_alive = request
+                self.requests += 1
+                try:
+                    status, payload = 200, await self.dispatch(method, target, body)
+                except HttpError as e:
+                    status, payload = e.status, {'error': str(e)}
+                except Exception as e:
+                    status, payload = 500, {'error': f"{type(e).__name__}: {e}"}
+                await self._respond(writer, status, payload, keep_alive)
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def _read_request(self, reader: asyncio.StreamReader) -> Optional[Tuple[str, str, bytes, bool]]:
+        line = await reader.readline()
+        if not line.strip():
+            return None
+        try:
+            method, target, version = line.decode('latin-1').split()
+        except ValueError:
+            raise HttpError(400, "malformed request line")
+        headers = {}
+        while True:
+            line = await reader.readline()
+            if line in (b'\r\n', b'\n', b''):
+                break
+            name, _, value = line.decode('latin-1').partition(':')
+            headers[name.strip().lower()] = value.strip()
+        try:
+            length = int(headers.get('content-length', 0))
+        except ValueError:
+            raise HttpError(400, "invalid Content-Length")
+        if length > MAX_BODY:
+            raise HttpError(413, "request body too large")
+        body = await reader.readexactly(length) if length else b''
+        connection = headers.get('connection', '').lower()
+        keep_alive = connection != 'close' if version == 'HTTP/1.1' else connection == 'keep-alive'
+        return method.upper(), target, body, keep_alive
+
+    async def _respond(self, writer: asyncio.StreamWriter, status: int, payload, keep_alive: bool):
+        body = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+        head = (f"HTTP/1.1 {status} {HTTPStatus(status).phrase}\r\n"
+                "Content-Type: application/json; charset=utf-8\r\n"
+                f"Content-Length: {len(body)}\r\n"
+                f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n")
+        writer.write(head.encode('latin-1') + body)
+        await writer.drain()
+
+    async def dispatch(self, method: str, target: str, body: bytes):
+        """Route one request; returns the JSON payload or raises HttpError"""
+        url = urlsplit(target)
+        parts = [unquote(part) for part in url.path.strip('/').split('/') if part]
+        query = parse_qs(url.query)
+        if method == 'GET':
+            now = time.monotonic()
+            if now - self._checked_at >= CHANGE_CHECK_INTERVAL and not self._saving:
+                self._checked_at = now
+                try:
+                    self.manager.reload_if_changed()
+                except DataFileError as e:
+                    # The catalog as last read is kept and still served
+                    print(f"Could not pick up changes from other processes: {e}")
+            return self._get(parts, query)
+        if method == 'POST':
+            try:
+                data = json.loads(body or b'{}')
+            except ValueError:
+                raise HttpError(400, "body must be JSON")
+            if not isinstance(data, dict):
+                raise HttpError(400, "body must be a JSON object")
+            return await self._post(parts, data)
+        raise HttpError(405, f"method {method} not allowed")
+
+    def _recipe(self, recipe_id: str) -> Recipe:
+        if recipe_id not in self.manager.recipes:
+            raise HttpError(404, f"no recipe {recipe_id}")
+        return self.manager.recipes[recipe_id]
+
+    def _get(self, parts: List[str], query: Dict[str, List[str]]):
+        manager = self.manager
+        limit = _param(query, 'limit', DEFAULT_LIMIT, int)
+        offset = _param(query, 'offset', 0, int)
+        if parts == ['recipes']:
+            if 'q' in query:
+                results = manager.search_recipes(_param(query, 'q'))
+            elif 'category' in query:
+                results = manager.filter_by_category(_param(query, 'category'))
+            elif 'max_time' in query:
+                results = manager.filter_by_time(_param(query, 'max_time', kind=int))
+            else:
+                raise HttpError(400, "give one of q, category or max_time")
+            return {'total': len(results),
+                    'recipes': [recipe_summary(recipe) for recipe in results[offset:offset + limit]]}
+        if parts == ['recipes', 'top']:
+            return {'recipes': [recipe_summary(recipe) for recipe in manager.get_top_rated(limit, offset)]}
+        if len(parts) == 2 and parts[0] == 'recipes':
+            return self._recipe(parts[1]).to_dict()
+        if len(parts) == 3 and parts[0] == 'recipes' and parts[2] == 'similar':
+            self._recipe(parts[1])
+            return {'recipes': [dict(recipe_summary(recipe), similarity=round(score, 3))
+                                for recipe, score in manager.similar_recipes(parts[1], limit)]}
+        if parts == ['stats']:
+            return manager.get_recipe_stats()
+        if parts == ['meal-plan']:
+            start = _param(query, 'start', date.today(), date)
+            days = _param(query, 'days', 7, int)
+            return {'meals': [{'date': meal_date.isoformat(), 'meal_type': meal_type, 'recipe_id': recipe_id}
+                              for meal_date, meal_type, recipe_id
+                              in manager.meal_plan.iter_meals(start, start + timedelta(days=max(days, 0)))]}
+        if parts == ['shopping-list']:
+            start = _param(query, 'start', date.today(), date)
+            days = _param(query, 'days', 7, int)
+            if _param(query, 'itemized', 0, int):
+                return manager.generate_shopping_list(start, days)
+            return manager.generate_aggregated_shopping_list(start, days)
+        if parts == ['diagnostics']:
+            report = manager.diagnostics()
+            report['server'] = {'requests': self.requests, 'writes': self.writes,
+                                'write_batches': self.write_batches,
+                                'queued_writes': self._writes.qsize()}
+            return report
+        raise HttpError(404, "not found")
+
+    async def _post(self, parts: List[str], data: dict):
+        manager = self.manager
+        if parts == ['recipes']:
+            try:
+                recipe_data = normalize_record(data)
+            except (ValueError, KeyError, TypeError) as e:
+                raise HttpError(400, str(e))
+            recipe_data['id'] = recipe_data['id'] or str(uuid.uuid4())
+            recipe = Recipe.from_dict(recipe_data)
+            await self.submit(lambda: manager.add_recipe(recipe))
+            return {'id': recipe.id}
+        if len(parts) == 3 and parts[0] == 'recipes' and parts[2] in ('rating', 'tags'):
+            recipe = self._recipe(parts[1])
+            if parts[2] == 'rating':
+                rating = _field(data, 'rating', int)
+                if not 1 <= rating <= 5:
+                    raise HttpError(400, "rating must be between 1 and 5")
+                await self.submit(lambda: recipe.set_rating(rating))
+            else:
+                tag = _field(data, 'tag').strip()
+                if not tag:
+                    raise HttpError(400, "tag cannot be empty")
+                await self.submit(lambda: recipe.add_tag(tag))
+            return recipe_summary(recipe)
+        if parts == ['meal-plan']:
+            meal_date = _field(data, 'date', date)
+            meal_type = _field(data, 'meal_type').lower()
+            recipe_id = self._recipe(_field(data, 'recipe_id')).id
+            await self.submit(lambda: manager.plan_meal(meal_date, meal_type, recipe_id))
+            return {'date': meal_date.isoformat(), 'meal_type': meal_type, 'recipe_id': recipe_id}
+        if parts == ['meal-plan', 'generate']:
+            start = _field(data, 'start', date)
+            days = _field(data, 'days', int, 7)
+            if not 1 <= days <= MAX_PLAN_DAYS:
+                raise HttpError(400, f"days must be between 1 and {MAX_PLAN_DAYS}")
+            time_budget = _field(data, 'time_budget', float, 0.2)
+            if not 0 <= time_budget <= MAX_PLAN_TIME_BUDGET:
+                raise HttpError(400, f"time_budget must be between 0 and {MAX_PLAN_TIME_BUDGET} seconds")
+            constraints = PlanConstraints(
+                max_day_time=_field(data, 'max_time', int) if data.get('max_time') is not None else None,
+                min_rating=_field(data, 'min_rating', int, 0),
+                meal_categories=_meal_categories(data),
+                max_per_category=(_field(data, 'max_per_category', int)
+                                  if data.get('max_per_category') is not None else None),
+                no_repeat_days=_field(data, 'no_repeat', int, 7))
+            replace = bool(data.get('replace'))
+            result = await self.submit(
+                lambda: manager.generate_meal_plan(start, days, constraints, replace, time_budget))
+            return {'meals': [{'date': meal_date.isoformat(), 'meal_type': meal_type, 'recipe_id': recipe_id}
+                              for meal_date, meal_type, recipe_id in result.meals],
+                    'unfilled': [{'date': meal_date.isoformat(), 'meal_type': meal_type}
+                                 for meal_date, meal_type in result.unfilled],
+                    'ingredients': result.ingredients}
+        raise HttpError(404, "not found")
+
+async def serve(manager: RecipeManager, host: str = "127.0.0.1", port: int = 8080):
+    """Serve until cancelled (e.g. Ctrl-C), then flush queued writes"""
+    server = RecipeServer(manager)
+    listener = await server.start(host, port)
+    print(f"Serving {len(manager.recipes)} recipes on http://{host}:{port}")
+    try:
+        async with listener:
+            await listener.serve_forever()
+    finally:
+        await server.close()
@@ -0,0 +1,194 @@
+import os
+import pickle
+import random
+import zlib
+from collections import Counter, defaultdict
+from operator import eq
+from typing import Iterable, List, Optional, Set, Tuple
+from quantities import normalize_name
+
+NUM_HASHES = 32
+BANDS = 8  # NUM_HASHES = BANDS * rows per band
+ROWS = NUM_HASHES // BANDS
+TOP_K = 5
+# Recipes sharing a band bucket are candidates. Huge buckets are only
+# partly scanned, and only the candidates sharing the most bands are scored.
+MAX_BUCKET_SCAN = 200
+MAX_CANDIDATES = 20
+SIMILARITY_VERSION = 1
+
+_PRIME = (1 << 31) - 1
+_rng = random.Random(20240601)
+_COEFFICIENTS = [(_rng.randrange(1, _PRIME), _rng.randrange(_PRIME)) for _ in range(NUM_HASHES)]
+# Features repeat across recipes (the same ingredients and tags), so each
+# feature's hash values are computed once
+_feature_hashes = {}  # {feature: tuple of NUM_HASHES hash values}
+
+
+def recipe_features(ingredients: Iterable[str], tags: Iterable[str], category: str) -> Set[str]:
+    """Sparse feature set of a recipe: its ingredients, tags and category"""
+    features = {"i:" + normalize_name(ingredient) for ingredient in ingredients}
+    features.update("t:" + normalize_name(tag) for tag in tags)
+    features.add("c:" + normalize_name(category))
+    return features
+
+
+def fingerprint(ingredients: Iterable[str], tags: Iterable[str], category: str) -> int:
+    """Cheap checksum of the fields features are built from, to spot changed recipes"""
+    text = '\x1f'.join((category, '\x1e'.join(ingredients), '\x1e'.join(tags)))
+    return zlib.crc32(text.encode('utf-8'))
+
+
+def _hashes(feature: str) -> Tuple[int, ...]:
+    hashes = _feature_hashes.get(feature)
+    if hashes is None:
+        h = zlib.crc32(feature.encode('utf-8'))
+        hashes = _feature_hashes[feature] = tuple((a * h + b) % _PRIME for a, b in _COEFFICIENTS)
+    return hashes
+
+
+def minhash(features: Set[str]) -> Tuple[int, ...]:
+    """MinHash signature; matching positions estimate the Jaccard similarity"""
+    if not features:
+        return (_PRIME,) * NUM_HASHES
+    return tuple(map(min, zip(*map(_hashes, features))))
+
+
+def estimate_similarity(a: Tuple[int, ...], b: Tuple[int, ...]) -> float:
+    return sum(map(eq, a, b)) / NUM_HASHES
+
+
+class SimilarityIndex:
+    """Top-k similar recipes via MinHash signatures and LSH banding.
+
+    Each signature is cut into BANDS bands; recipes sharing any band land in
+    the same bucket and become candidates, so finding neighbours never
+    compares a recipe against the whole catalog. Every recipe's neighbour
+    list is precomputed when it is added, and offered to its neighbours'
+    lists in turn, so adding one recipe is incremental.
+    """
+
+    def __init__(self, top_k: int = TOP_K):
+        self.top_k = top_k
+        self._signatures = {}  # {recipe_id: signature}, in insertion order
+        self._fingerprints = {}  # {recipe_id: fingerprint of its features}
+        self._positions = {}  # {recipe_id: insertion position} for stable tie-breaks
+        self._buckets = defaultdict(list)  # {(band, band values): [recipe_id]}
+        self._neighbours = {}  # {recipe_id: [(score, recipe_id)]}, best first
+        self.dirty = False  # changed since last saved
+        # Identifies the saved catalog version the index matches, if known;
+        # set by the owner before save() and compared after load()
+        self.source = None
+
+    def _bands(self, signature: Tuple[int, ...]):
+        for band in range(BANDS):
+            yield band, signature[band * ROWS:(band + 1) * ROWS]
+
+    def _candidates(self, recipe_id: str) -> List[str]:
+        """Recipes sharing the most bands with recipe_id"""
+        shared = Counter()
+        for key in self._bands(self._signatures[recipe_id]):
+            bucket = self._buckets.get(key, ())
+            if len(bucket) > MAX_BUCKET_SCAN:
+                bucket = bucket[-MAX_BUCKET_SCAN:]
+            shared.update(bucket)
+        shared.pop(recipe_id, None)
+        return [other for other, bands in shared.most_common(MAX_CANDIDATES)]
+
+    def _rank(self, recipe_id: str, candidates: Iterable[str]) -> List[Tuple[float, str]]:
+        signature = self._signatures[recipe_id]
+        scored = [(estimate_similarity(signature, self._signatures[other]), other)
+                  for other in candidates if other in self._signatures]
+        scored.sort(key=lambda item: (-item[0], self._positions[item[1]]))
+        return [item for item in scored[:self.top_k] if item[0] > 0]
+
+    def _offer(self, recipe_id: str, other: str, score: float):
+        """Put other into recipe_id's neighbour list if it ranks in the top k"""
+        neighbours = [item for item in self._neighbours.get(recipe_id, []) if item[1] != other]
+        neighbours.append((score, other))
+        neighbours.sort(key=lambda item: (-item[0], self._positions[item[1]]))
+        self._neighbours[recipe_id] = neighbours[:self.top_k]
+
+    def _insert(self, recipe_id: str, features: Set[str], recipe_fingerprint: int):
+        if recipe_id in self._signatures:
+            for key in self._bands(self._signatures[recipe_id]):
+                self._buckets[key].remove(recipe_id)
+        else:
+            self._positions[recipe_id] = len(self._positions)
+        signature = minhash(features)
+        self._signatures[recipe_id] = signature
+        self._fingerprints[recipe_id] = recipe_fingerprint
+        for key in self._bands(signature):
+            self._buckets[key].append(recipe_id)
+        self.dirty = True
+
+    def add(self, recipe_id: str, features: Set[str], recipe_fingerprint: int = 0):
+        """Index (or re-index) one recipe and update the affected neighbour lists"""
+        self._insert(recipe_id, features, recipe_fingerprint)
+        neighbours = self._rank(recipe_id, self._candidates(recipe_id))
+        self._neighbours[recipe_id] = neighbours
+        for score, other in neighbours:
+            self._offer(other, recipe_id, score)
+
+    def build(self, recipes: Iterable[Tuple[str, Set[str], int]]):
+        """Index many recipes at once: signatures first, then every neighbour list"""
+        added = []
+        for recipe_id, features, recipe_fingerprint in recipes:
+            self._insert(recipe_id, features, recipe_fingerprint)
+            added.append(recipe_id)
+        for recipe_id in added:
+            self._neighbours[recipe_id] = self._rank(recipe_id, self._candidates(recipe_id))
+
+    def fingerprint_of(self, recipe_id: str) -> Optional[int]:
+        return self._fingerprints.get(recipe_id)
+
+    def similar(self, recipe_id: str, limit: int = TOP_K) -> List[Tuple[str, float]]:
+        """(recipe_id, estimated Jaccard similarity) of the closest recipes, best first"""
+        if recipe_id not in self._signatures:
+            return []
+        # Re-score on read: neighbours edited since the list was built may have moved
+        ranked = self._rank(recipe_id, [other for score, other in self._neighbours.get(recipe_id, [])])
+        return [(other, score) for score, other in ranked[:limit]]
+
+    def __contains__(self, recipe_id) -> bool:
+        return recipe_id in self._signatures
+
+    def __len__(self) -> int:
+        return len(self._signatures)
+
+    def save(self, path: str):
+        """Atomically write signatures and neighbour lists to path"""
+        state = {'version': SIMILARITY_VERSION, 'num_hashes': NUM_HASHES, 'top_k': self.top_k,
+                 'signatures': self._signatures, 'fingerprints': self._fingerprints,
+                 'neighbours': self._neighbours, 'source': self.source}
+        temp_file = path + '.tmp'
+        with open(temp_file, 'wb') as f:
+            pickle.dump(state, f, protocol=pickle.HIGHEST_PROTOCOL)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_file, path)
+        self.dirty = False
+
+    @classmethod
+    def load(cls, path: str) -> Optional['SimilarityIndex']:
+        """Read an index saved by save(), or None if missing, unreadable or outdated"""
+        try:
+            with open(path, 'rb') as f:
+                state = pickle.load(f)
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            print(f"Ignoring unreadable similarity table {path}: {e}")
+            return None
+        if state.get('version') != SIMILARITY_VERSION or state.get('num_hashes') != NUM_HASHES:
+            return None
+        index = cls(state['top_k'])
+        index._signatures = state['signatures']
+        index._fingerprints = state['fingerprints']
+        index._neighbours = state['neighbours']
+        index.source = state.get('source')
+        for position, (recipe_id, signature) in enumerate(index._signatures.items()):
+            index._positions[recipe_id] = position
+            for key in index._bands(signature):
+                index._buckets[key].append(recipe_id)
+        return index
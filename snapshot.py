@@ -0,0 +1,99 @@
+import gc
+import os
+import pickle
+import threading
+from typing import Callable, Optional, Tuple
+from storage import file_stamp
+
+SNAPSHOT_VERSION = 5
+
+class SnapshotCache:
+    """Binary sidecar (data_file + '.snapshot') holding a fully built catalog.
+
+    The sidecar is a small pickled header followed by the pickled state.
+    The header records the format version and the data file's size and
+    modification time; a snapshot is only used while both still match, so
+    editing or replacing the JSON file simply falls back to parsing it.
+    Like the data file itself, the sidecar is trusted local state.
+    """
+
+    def __init__(self, data_path: str):
+        self.data_path = data_path
+        self.path = data_path + '.snapshot'
+        self._writer = None  # last background writer thread
+
+    def source_key(self) -> Optional[Tuple[int, int, int]]:
+        """(inode, size, mtime_ns) of the data file, or None if it does not exist"""
+        return file_stamp(self.data_path)
+
+    def load(self) -> Optional[dict]:
+        """Return the saved state if the snapshot matches the data file, else None"""
+        key = self.source_key()
+        if key is None or not os.path.exists(self.path):
+            return None
+        try:
+            with open(self.path, 'rb') as f:
+                header = pickle.load(f)
+                if header.get('version') != SNAPSHOT_VERSION or tuple(header.get('source', ())) != key:
+                    return None
+                # The state is millions of small containers; collecting
+                # mid-load only slows it down
+                gc_was_enabled = gc.isenabled()
+                gc.disable()
+                try:
+                    return pickle.load(f)
+                finally:
+                    if gc_was_enabled:
+                        gc.enable()
+        except Exception as e:
+            print(f"Ignoring unreadable snapshot {self.path}: {e}")
+            return None
+
+    def save(self, payload: bytes, key: Tuple[int, int, int]):
+        """Atomically write a pickled state as the snapshot of data file version key"""
+        temp_file = self.path + '.tmp'
+        with open(temp_file, 'wb') as f:
+            pickle.dump({'version': SNAPSHOT_VERSION, 'source': key}, f,
+                        protocol=pickle.HIGHEST_PROTOCOL)
+            f.write(payload)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_file, self.path)
+
+    def save_in_background(self, build_state: Callable[[], dict], is_current: Callable[[], bool],
+                           key: Optional[Tuple[int, int, int]]):
+        """Regenerate the snapshot of data file version key on a worker thread.
+
+        key must be the file_stamp() of the version the state was loaded
+        from or saved as, taken while that was known to be the file on disk.
+        The state from build_state() is pickled on the worker and thrown
+        away unless is_current() still holds afterwards, i.e. the catalog
+        was not changed while it was being captured, and the data file is
+        still that version. Writers run one at a time, oldest first. The
+        thread is not a daemon, so a snapshot being written when the program
+        exits is finished rather than abandoned.
+        """
+        if key is None:
+            return
+        previous = self._writer
+
+        def write():
+            if previous is not None:
+                previous.join()
+            if not is_current():
+                return
+            try:
+                payload = pickle.dumps(build_state(), protocol=pickle.HIGHEST_PROTOCOL)
+                if is_current() and self.source_key() == key:
+                    self.save(payload, key)
+            except Exception:
+                # A stale or missing snapshot only costs startup time
+                pass
+
+        self._writer = threading.Thread(target=write, name="snapshot-writer")
+        self._writer.start()
+
+    def wait(self):
+        """Block until background writes have finished"""
+        if self._writer is not None:
+            self._writer.join()
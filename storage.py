@@ -0,0 +1,772 @@
+import codecs
+import json
+import os
+import re
+import sqlite3
+import sys
+import weakref
+from collections import OrderedDict, defaultdict
+from collections.abc import Mapping
+from datetime import date
+from itertools import groupby
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+from models import Recipe, MealPlan
+from compressed_format import COMPRESSIONS, detect_compression, open_compressed, read_catalog, write_catalog
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - no advisory locks (e.g. Windows)
+    fcntl = None
+
+# Recipes are read from disk in chunks of this many bytes when scanning lazily
+CHUNK_SIZE = 1 << 20
+
+_WHITESPACE = re.compile(r'[ \t\n\r]*')
+_DECODER = json.JSONDecoder()
+
+
+class _JsonStream:
+    """Decodes a JSON document one value at a time while tracking byte offsets"""
+
+    def __init__(self, f):
+        self._file = f
+        self._decoder = codecs.getincrementaldecoder('utf-8')()
+        self._text = ''
+        self._pos = 0
+        self.offset = 0  # byte offset of self._pos in the file
+        self._eof = False
+
+    def _fill(self) -> bool:
+        if self._eof:
+            return False
+        chunk = self._file.read(CHUNK_SIZE)
+        self._eof = not chunk
+        self._text = self._text[self._pos:] + self._decoder.decode(chunk, final=self._eof)
+        self._pos = 0
+        return not self._eof
+
+    def _advance(self, end: int):
+        self.offset += len(self._text[self._pos:end].encode('utf-8'))
+        self._pos = end
+
+    def peek(self) -> str:
+        """Skip whitespace and return the next character ('' at end of input)"""
+        while True:
+            self._advance(_WHITESPACE.match(self._text, self._pos).end())
+            if self._pos < len(self._text):
+                return self._text[self._pos]
+            if not self._fill():
+                return ''
+
+    def expect(self, char: str):
+        if self.peek() != char:
+            raise ValueError(f"Expected {char!r} at byte {self.offset} of the data file")
+        self._advance(self._pos + 1)
+
+    def value(self) -> Tuple[object, int, int]:
+        """Decode the next value and return it with its byte offset and length"""
+        self.peek()
+        while True:
+            try:
+                value, end = _DECODER.raw_decode(self._text, self._pos)
+            except json.JSONDecodeError:
+                if self._fill():
+                    continue
+                raise
+            # A number ending at the buffer boundary may continue in the next chunk
+            if end == len(self._text) and not isinstance(value, (dict, list, str)) and self._fill():
+                continue
+            start = self.offset
+            self._advance(end)
+            return value, start, self.offset - start
+
+
+class DataFileError(Exception):
+    """The data file exists but could not be read"""
+
+
+def file_stamp(path: str) -> Optional[Tuple[int, int, int]]:
+    """(inode, size, mtime_ns) of path, or None if it does not exist.
+
+    Every save replaces the data file, so a new stamp means another commit.
+    """
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return (st.st_ino, st.st_size, st.st_mtime_ns)
+
+def _fsync_directory(path: str):
+    """Make a rename in path's directory durable (a no-op where unsupported)"""
+    try:
+        fd = os.open(os.path.dirname(os.path.abspath(path)), os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+class FileLock:
+    """Advisory exclusive lock on path + '.lock', shared by all processes using a data file.
+
+    Only writers take it, so two processes never interleave a save or a
+    journal append; readers rely on saves being atomic renames instead and
+    never wait. Re-entrant within one owner. Without fcntl it does nothing.
+    """
+
+    def __init__(self, path: str):
+        self.path = path + '.lock'
+        self._fd = None
+        self._depth = 0
+
+    def acquire(self):
+        """Wait for the lock; it may be released from another thread than the one acquiring it"""
+        if self._depth == 0 and fcntl is not None:
+            fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX)
+            except OSError:
+                os.close(fd)
+                raise
+            self._fd = fd
+        self._depth += 1
+
+    def release(self):
+        self._depth -= 1
+        if self._depth == 0 and self._fd is not None:
+            fcntl.flock(self._fd, fcntl.LOCK_UN)
+            os.close(self._fd)
+            self._fd = None
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.release()
+
+
+class JsonStorage:
+    """Whole-file JSON persistence (the default backend).
+
+    The file may also be in the compressed format of compressed_format.py,
+    which is detected on load and kept on save. compression='gzip', 'lzma'
+    or 'json' converts the file to that format on the next save instead.
+    """
+
+    def __init__(self, path: str, compression: Optional[str] = None):
+        if compression not in (None, 'json') + COMPRESSIONS:
+            raise ValueError(f"unknown format {compression!r}: use json, {', '.join(COMPRESSIONS)}")
+        self.path = path
+        self.requested_compression = compression
+        self.compression = detect_compression(path)  # of the file on disk: None is plain JSON
+        self.bytes_read = 0
+        self.bytes_written = 0
+
+    @property
+    def write_compression(self) -> Optional[str]:
+        """Format the next save writes: None for plain JSON"""
+        if self.requested_compression is None:
+            return self.compression
+        return None if self.requested_compression == 'json' else self.requested_compression
+
+    def exists(self) -> bool:
+        return os.path.exists(self.path)
+
+    def load(self) -> Optional[dict]:
+        """Return the decoded data file, or None if it does not exist yet.
+
+        For a compressed file 'recipes' is an iterator that decompresses and
+        decodes one recipe at a time.
+        """
+        if not self.exists():
+            return None
+        self.compression = detect_compression(self.path)
+        if self.compression is not None:
+            self.bytes_read += os.path.getsize(self.path)
+            meal_plan, recipes = read_catalog(self.path, self.compression)
+            return {'recipes': recipes, 'meal_plan': meal_plan}
+        with open(self.path, 'r') as f:
+            data = json.load(f)
+            self.bytes_read += os.fstat(f.fileno()).st_size
+            return data
+
+    def scan(self, on_recipe: Callable[[dict, int, int], None], f=None) -> dict:
+        """Stream the data file, calling on_recipe(recipe_data, offset, length) per recipe.
+
+        Returns the remaining top-level entries (the meal plan). f may be an
+        already open handle on the data file.
+        """
+        if f is None:
+            with open(self.path, 'rb') as f:
+                return self.scan(on_recipe, f)
+        rest = {}
+        f.seek(0)
+        stream = _JsonStream(f)
+        stream.expect('{')
+        if stream.peek() == '}':
+            self.bytes_read += f.tell()
+            return rest
+        while True:
+            key = stream.value()[0]
+            stream.expect(':')
+            if key == 'recipes':
+                stream.expect('[')
+                if stream.peek() == ']':
+                    stream.expect(']')
+                else:
+                    while True:
+                        on_recipe(*stream.value())
+                        if stream.peek() != ',':
+                            break
+                        stream.expect(',')
+                    stream.expect(']')
+            else:
+                rest[key] = stream.value()[0]
+            if stream.peek() != ',':
+                break
+            stream.expect(',')
+        stream.expect('}')
+        self.bytes_read += f.tell()
+        return rest
+
+    def read_record(self, offset: int, length: int, f=None) -> dict:
+        """Decode one recipe found by scan()"""
+        if f is None:
+            with open(self.path, 'rb') as f:
+                return self.read_record(offset, length, f)
+        f.seek(offset)
+        self.bytes_read += length
+        return json.loads(f.read(length))
+
+    def save(self, recipe_dicts: Iterable[dict], meal_plan_dict: dict) -> List[Tuple[int, int]]:
+        """Atomically replace the data file, streaming one recipe at a time.
+
+        The output matches json.dump(data, indent=2). Returns the byte
+        (offset, length) of every recipe written, in order.
+        """
+        locations = []
+        # Write a sibling file and swap it in so a crash never leaves a torn snapshot
+        temp_file = self.path + '.tmp'
+        compression = self.write_compression
+        if compression is not None:
+            # Compressed files have no byte locations to hand out
+            with open(temp_file, 'wb') as raw:
+                with open_compressed(raw, 'wb', compression) as f:
+                    write_catalog(f, recipe_dicts, meal_plan_dict)
+                self.bytes_written += raw.tell()
+                raw.flush()
+                os.fsync(raw.fileno())
+            os.replace(temp_file, self.path)
+            _fsync_directory(self.path)
+            self.compression = compression
+            return locations
+        with open(temp_file, 'wb') as f:
+            f.write(b'{\n  "recipes": [')
+            position = f.tell()
+            separator = b'\n    '
+            for recipe_data in recipe_dicts:
+                record = json.dumps(recipe_data, indent=2).replace('\n', '\n    ').encode('utf-8')
+                f.write(separator)
+                f.write(record)
+                position += len(separator)
+                locations.append((position, len(record)))
+                position += len(record)
+                separator = b',\n    '
+            f.write(b'\n  ],' if locations else b'],')
+            meal_plan = json.dumps(meal_plan_dict, indent=2).replace('\n', '\n  ')
+            f.write(f'\n  "meal_plan": {meal_plan}\n}}'.encode('utf-8'))
+            self.bytes_written += f.tell()
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_file, self.path)
+        _fsync_directory(self.path)
+        self.compression = None
+        return locations
+
+
+class LazyRecipeMap(Mapping):
+    """Dict-like catalog over a JSON data file that hydrates recipes on first access.
+
+    Untouched recipes cost only their byte location in the file. At most
+    max_resident hydrated recipes are cached (least recently used first out);
+    recipes added or changed since the last save are pinned until it happens.
+    Assigning adds or replaces a recipe; there is no deletion.
+    The map keeps the data file it indexed open, so its byte locations stay
+    valid even after another process replaces the file.
+    """
+
+    def __init__(self, storage: JsonStorage, max_resident: Optional[int] = None,
+                 on_hydrate: Optional[Callable[[Recipe], None]] = None):
+        self._storage = storage
+        self._locations = {}  # {recipe_id: (offset, length), or None if never saved}
+        self._resident = OrderedDict()  # {recipe_id: Recipe}, least recently used first
+        self._pinned = {}  # {recipe_id: Recipe} not yet written to disk
+        self.max_resident = max_resident
+        self.on_hydrate = on_hydrate
+        self._file = None  # open handle on the version of the data file indexed
+
+    def open_file(self):
+        """Open (or reopen) the current data file and return the handle, or None if missing"""
+        self.close()
+        if self._storage.exists():
+            self._file = open(self._storage.path, 'rb')
+        return self._file
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def add_location(self, recipe_id: str, offset: int, length: int):
+        self._locations[recipe_id] = (offset, length)
+
+    def __getitem__(self, recipe_id: str) -> Recipe:
+        recipe = self._pinned.get(recipe_id)
+        if recipe is not None:
+            return recipe
+        recipe = self._resident.get(recipe_id)
+        if recipe is not None:
+            self._resident.move_to_end(recipe_id)
+            return recipe
+
+        recipe = Recipe.from_dict(self._storage.read_record(*self._locations[recipe_id], self._file))
+        if self.on_hydrate is not None:
+            self.on_hydrate(recipe)
+        self._resident[recipe_id] = recipe
+        self._evict()
+        return recipe
+
+    def __setitem__(self, recipe_id: str, recipe: Recipe):
+        self._locations.setdefault(recipe_id, None)
+        self._resident.pop(recipe_id, None)
+        self._pinned[recipe_id] = recipe
+
+    def __contains__(self, recipe_id) -> bool:
+        return recipe_id in self._locations
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._locations)
+
+    def __len__(self) -> int:
+        return len(self._locations)
+
+    def _evict(self):
+        if self.max_resident is not None:
+            while len(self._resident) > self.max_resident:
+                self._resident.popitem(last=False)
+
+    def resident_count(self) -> int:
+        return len(self._resident) + len(self._pinned)
+
+    def mark_dirty(self, recipe: Recipe):
+        """Keep a changed recipe in memory until the next save"""
+        self._resident.pop(recipe.id, None)
+        self._pinned[recipe.id] = recipe
+
+    def iter_dicts(self) -> Iterator[dict]:
+        """Yield every recipe as a dict without hydrating the ones on disk"""
+        for recipe_id, location in self._locations.items():
+            recipe = self._pinned.get(recipe_id) or self._resident.get(recipe_id)
+            if recipe is not None:
+                yield recipe.to_dict()
+            else:
+                yield self._storage.read_record(*location, self._file)
+
+    def saved(self, locations: List[Tuple[int, int]]):
+        """Adopt the locations written by JsonStorage.save (in iteration order)"""
+        self.open_file()
+        for recipe_id, location in zip(list(self._locations), locations):
+            self._locations[recipe_id] = location
+        self._resident.update(self._pinned)
+        self._pinned.clear()
+        self._evict()
+
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS recipes (
+    id TEXT PRIMARY KEY,
+    name TEXT NOT NULL,
+    name_lower TEXT NOT NULL,
+    category TEXT NOT NULL,
+    category_lower TEXT NOT NULL,
+    prep_time INTEGER NOT NULL,
+    cook_time INTEGER NOT NULL,
+    total_time INTEGER NOT NULL,
+    servings INTEGER NOT NULL,
+    created_date TEXT NOT NULL,
+    rating INTEGER NOT NULL DEFAULT 0,
+    instructions TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS ingredients (
+    recipe_id TEXT NOT NULL REFERENCES recipes(id),
+    position INTEGER NOT NULL,
+    name TEXT NOT NULL,
+    name_lower TEXT NOT NULL,
+    amount TEXT NOT NULL,
+    PRIMARY KEY (recipe_id, position)
+);
+CREATE TABLE IF NOT EXISTS tags (
+    recipe_id TEXT NOT NULL REFERENCES recipes(id),
+    position INTEGER NOT NULL,
+    tag TEXT NOT NULL,
+    tag_lower TEXT NOT NULL,
+    PRIMARY KEY (recipe_id, position)
+);
+CREATE TABLE IF NOT EXISTS meal_plan (
+    date TEXT NOT NULL,
+    meal_type TEXT NOT NULL,
+    recipe_id TEXT NOT NULL,
+    PRIMARY KEY (date, meal_type)
+);
+CREATE INDEX IF NOT EXISTS idx_recipes_category ON recipes(category_lower);
+CREATE INDEX IF NOT EXISTS idx_recipes_total_time ON recipes(total_time);
+CREATE INDEX IF NOT EXISTS idx_recipes_rating ON recipes(rating);
+CREATE INDEX IF NOT EXISTS idx_meal_plan_date ON meal_plan(date);
+"""
+
+RECIPE_COLUMNS = ("id, name, category, prep_time, cook_time, servings, "
+                  "created_date, rating, instructions")
+
+# Keeps IN (...) lists well below SQLite's bound-parameter limit
+BATCH_SIZE = 500
+
+
+class SqliteRecipeMap(Mapping):
+    """Dict-like view of the recipes table that hydrates Recipe objects on access.
+
+    Iteration follows insertion order (rowid), like the dict used by the JSON
+    backend. Recipes handed out stay cached while referenced, so repeated
+    lookups return the same object. Assigning adds or replaces a recipe;
+    the catalog has no way to delete one.
+    """
+
+    def __init__(self, storage: 'SqliteStorage'):
+        self._storage = storage
+        self._live = weakref.WeakValueDictionary()  # {recipe_id: Recipe}
+        self.on_hydrate = None
+
+    def __getitem__(self, recipe_id: str) -> Recipe:
+        recipes = self.get_many([recipe_id])
+        if not recipes:
+            raise KeyError(recipe_id)
+        return recipes[0]
+
+    def __setitem__(self, recipe_id: str, recipe: Recipe):
+        self._storage.put_recipe(recipe)
+        self._live[recipe_id] = recipe
+
+    def __contains__(self, recipe_id) -> bool:
+        row = self._storage.conn.execute(
+            "SELECT 1 FROM recipes WHERE id = ?", (recipe_id,)).fetchone()
+        return row is not None
+
+    def __iter__(self) -> Iterator[str]:
+        for (recipe_id,) in self._storage.conn.execute("SELECT id FROM recipes ORDER BY rowid"):
+            yield recipe_id
+
+    def __len__(self) -> int:
+        return self._storage.conn.execute("SELECT COUNT(*) FROM recipes").fetchone()[0]
+
+    def values(self):
+        return _RecipeValues(self)
+
+    def forget(self):
+        """Hydrate recipes afresh from now on, e.g. after another process changed them"""
+        self._live = weakref.WeakValueDictionary()
+
+    def get_many(self, recipe_ids: List[str]) -> List[Recipe]:
+        """Hydrate recipes in the given order, skipping unknown ids"""
+        found = {}
+        missing = []
+        for recipe_id in recipe_ids:
+            recipe = self._live.get(recipe_id)
+            if recipe is not None:
+                found[recipe_id] = recipe
+            else:
+                missing.append(recipe_id)
+
+        for start in range(0, len(missing), BATCH_SIZE):
+            for recipe in self._storage.load_recipes(missing[start:start + BATCH_SIZE]):
+                self._live[recipe.id] = recipe
+                found[recipe.id] = recipe
+                if self.on_hydrate is not None:
+                    self.on_hydrate(recipe)
+
+        return [found[recipe_id] for recipe_id in recipe_ids if recipe_id in found]
+
+
+class _RecipeValues:
+    def __init__(self, mapping: SqliteRecipeMap):
+        self._mapping = mapping
+
+    def __iter__(self) -> Iterator[Recipe]:
+        batch = []
+        for recipe_id in self._mapping:
+            batch.append(recipe_id)
+            if len(batch) == BATCH_SIZE:
+                yield from self._mapping.get_many(batch)
+                batch = []
+        yield from self._mapping.get_many(batch)
+
+    def __len__(self) -> int:
+        return len(self._mapping)
+
+
+class SqliteStorage:
+    """SQLite persistence with normalized tables and indexed queries.
+
+    Every mutation is written (and committed) as it happens, and recipes are
+    read from the database on demand, so nothing needs to be loaded up front.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        # Callers may hand a manager from thread to thread (CatalogRegistry
+        # does), but never use it from two threads at once
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.executescript(SCHEMA)
+        self.recipes = SqliteRecipeMap(self)
+        # While set, writes accumulate in one transaction until commit()
+        self.defer_commits = False
+
+    def close(self):
+        self.conn.close()
+
+    def commit(self):
+        self.conn.commit()
+
+    def data_version(self) -> int:
+        """Changes whenever another connection (e.g. another process) commits to the database"""
+        return self.conn.execute("PRAGMA data_version").fetchone()[0]
+
+    def load_recipes(self, recipe_ids: List[str]) -> List[Recipe]:
+        """Build Recipe objects for the given ids in a handful of queries"""
+        if not recipe_ids:
+            return []
+        marks = ','.join('?' * len(recipe_ids))
+        ingredients = defaultdict(dict)
+        for recipe_id, name, amount in self.conn.execute(
+                f"SELECT recipe_id, name, amount FROM ingredients "
+                f"WHERE recipe_id IN ({marks}) ORDER BY recipe_id, position", recipe_ids):
+            ingredients[recipe_id][name] = amount
+        tags = defaultdict(list)
+        for recipe_id, tag in self.conn.execute(
+                f"SELECT recipe_id, tag FROM tags "
+                f"WHERE recipe_id IN ({marks}) ORDER BY recipe_id, position", recipe_ids):
+            tags[recipe_id].append(tag)
+
+        recipes = []
+        for row in self.conn.execute(
+                f"SELECT {RECIPE_COLUMNS} FROM recipes WHERE id IN ({marks})", recipe_ids):
+            (recipe_id, name, category, prep_time, cook_time, servings,
+             created_date, rating, instructions) = row
+            recipes.append(Recipe.from_dict({
+                'id': recipe_id,
+                'name': name,
+                'ingredients': ingredients.get(recipe_id, {}),
+                'instructions': json.loads(instructions),
+                'prep_time': prep_time,
+                'cook_time': cook_time,
+                'servings': servings,
+                'category': category,
+                'created_date': created_date,
+                'rating': rating,
+                'tags': tags.get(recipe_id, [])
+            }))
+        return recipes
+
+    def put_recipe(self, recipe: Recipe, commit: bool = True):
+        """Insert or replace a recipe, keeping its original position"""
+        self.conn.execute(
+            "INSERT INTO recipes (id, name, name_lower, category, category_lower, prep_time, "
+            "cook_time, total_time, servings, created_date, rating, instructions) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?) "
+            "ON CONFLICT(id) DO UPDATE SET name = excluded.name, name_lower = excluded.name_lower, "
+            "category = excluded.category, category_lower = excluded.category_lower, "
+            "prep_time = excluded.prep_time, cook_time = excluded.cook_time, "
+            "total_time = excluded.total_time, servings = excluded.servings, "
+            "created_date = excluded.created_date, rating = excluded.rating, "
+            "instructions = excluded.instructions",
+            (recipe.id, recipe.name, recipe.name.lower(), recipe.category, recipe.category.lower(),
+             recipe.prep_time, recipe.cook_time, recipe.total_time(), recipe.servings,
+             recipe.created_date, recipe.rating, json.dumps(recipe.instructions)))
+        self.conn.execute("DELETE FROM ingredients WHERE recipe_id = ?", (recipe.id,))
+        self.conn.executemany(
+            "INSERT INTO ingredients (recipe_id, position, name, name_lower, amount) "
+            "VALUES (?, ?, ?, ?, ?)",
+            [(recipe.id, position, name, name.lower(), amount)
+             for position, (name, amount) in enumerate(recipe.ingredients.items())])
+        self.conn.execute("DELETE FROM tags WHERE recipe_id = ?", (recipe.id,))
+        self.conn.executemany(
+            "INSERT INTO tags (recipe_id, position, tag, tag_lower) VALUES (?, ?, ?, ?)",
+            [(recipe.id, position, tag, tag.lower()) for position, tag in enumerate(recipe.tags)])
+        if commit and not self.defer_commits:
+            self.conn.commit()
+
+    def apply_op(self, op: dict, commit: bool = True):
+        """Write a single mutation record (see RecipeManager._record)"""
+        kind = op['op']
+        if kind == 'put_recipe':
+            self.put_recipe(Recipe.from_dict(op['recipe']), commit=False)
+        elif kind == 'set_rating':
+            self.conn.execute("UPDATE recipes SET rating = ? WHERE id = ?", (op['rating'], op['id']))
+        elif kind == 'add_tag':
+            self.conn.execute(
+                "INSERT INTO tags (recipe_id, position, tag, tag_lower) "
+                "SELECT ?, COALESCE(MAX(position) + 1, 0), ?, ? FROM tags WHERE recipe_id = ?",
+                (op['id'], op['tag'], op['tag'].lower(), op['id']))
+        elif kind == 'set_ingredient':
+            updated = self.conn.execute(
+                "UPDATE ingredients SET amount = ? WHERE recipe_id = ? AND name = ?",
+                (op['amount'], op['id'], op['ingredient'])).rowcount
+            if not updated:
+                self.conn.execute(
+                    "INSERT INTO ingredients (recipe_id, position, name, name_lower, amount) "
+                    "SELECT ?, COALESCE(MAX(position) + 1, 0), ?, ?, ? FROM ingredients WHERE recipe_id = ?",
+                    (op['id'], op['ingredient'], op['ingredient'].lower(), op['amount'], op['id']))
+        elif kind == 'add_meal':
+            self.conn.execute(
+                "INSERT INTO meal_plan (date, meal_type, recipe_id) VALUES (?, ?, ?) "
+                "ON CONFLICT(date, meal_type) DO UPDATE SET recipe_id = excluded.recipe_id",
+                (op['date'], op['meal_type'], op['recipe_id']))
+        elif kind == 'replace_meals':
+            self.conn.execute("DELETE FROM meal_plan WHERE date >= ? AND date < ?",
+                              (op['start'], op['end']))
+            for date_str, meal_type, recipe_id in op['meals']:
+                self.apply_op({'op': 'add_meal', 'date': date_str, 'meal_type': meal_type,
+                               'recipe_id': recipe_id}, commit=False)
+        if commit and not self.defer_commits:
+            self.conn.commit()
+
+    def load_meal_plan(self) -> MealPlan:
+        meal_plan = MealPlan()
+        for date_str, meal_type, recipe_id in self.conn.execute(
+                "SELECT date, meal_type, recipe_id FROM meal_plan ORDER BY date, rowid"):
+            meal_plan.add_meal(date.fromisoformat(date_str), meal_type, recipe_id)
+        return meal_plan
+
+    def search(self, query: str) -> List[str]:
+        query = query.lower()
+        rows = self.conn.execute(
+            "SELECT id FROM recipes r WHERE instr(name_lower, ?) > 0 "
+            "OR EXISTS (SELECT 1 FROM ingredients i WHERE i.recipe_id = r.id AND instr(i.name_lower, ?) > 0) "
+            "OR EXISTS (SELECT 1 FROM tags t WHERE t.recipe_id = r.id AND instr(t.tag_lower, ?) > 0) "
+            "ORDER BY rowid", (query, query, query))
+        return [recipe_id for (recipe_id,) in rows]
+
+    def filter_by_category(self, category: str) -> List[str]:
+        rows = self.conn.execute(
+            "SELECT id FROM recipes WHERE category_lower = ? ORDER BY rowid", (category.lower(),))
+        return [recipe_id for (recipe_id,) in rows]
+
+    def filter_by_time(self, max_time: int) -> List[str]:
+        rows = self.conn.execute(
+            "SELECT id FROM recipes WHERE total_time <= ? ORDER BY rowid", (max_time,))
+        return [recipe_id for (recipe_id,) in rows]
+
+    def get_top_rated(self, limit: int, offset: int = 0) -> List[str]:
+        rows = self.conn.execute(
+            "SELECT id FROM recipes WHERE rating > 0 ORDER BY rating DESC, rowid LIMIT ? OFFSET ?",
+            (limit, offset))
+        return [recipe_id for (recipe_id,) in rows]
+
+    def rank_by_pantry(self, have: List[str], limit: Optional[int] = None,
+                       max_missing: Optional[int] = None) -> List[Tuple[str, int]]:
+        """(recipe_id, ingredients missing) with fewest missing first, ties in insertion order"""
+        placeholders = ", ".join("?" * len(have))
+        sql = ("SELECT r.id, COUNT(i.recipe_id) AS missing FROM recipes r "
+               "LEFT JOIN ingredients i ON i.recipe_id = r.id "
+               f"AND i.name_lower NOT IN ({placeholders}) GROUP BY r.id ")
+        params = list(have)
+        if max_missing is not None:
+            sql += "HAVING missing <= ? "
+            params.append(max_missing)
+        sql += "ORDER BY missing, r.rowid"
+        if limit is not None:
+            sql += " LIMIT ?"
+            params.append(limit)
+        return self.conn.execute(sql, params).fetchall()
+
+    def planning_rows(self, min_rating: int = 0, max_time: Optional[int] = None,
+                      include_ids: Iterable[str] = ()) -> Iterator[tuple]:
+        """Yield (recipe_id, category, total_time, rating, normalized ingredient names)
+        for recipes a meal plan may use, plus the recipes in include_ids"""
+        include_ids = list(include_ids)
+        where = "r.rating >= ?"
+        params = [min_rating]
+        if max_time is not None:
+            where += " AND r.total_time <= ?"
+            params.append(max_time)
+        if include_ids:
+            where = f"({where}) OR r.id IN ({', '.join('?' * len(include_ids))})"
+            params.extend(include_ids)
+        rows = self.conn.execute(
+            "SELECT r.id, r.category, r.total_time, r.rating, i.name_lower FROM recipes r "
+            f"LEFT JOIN ingredients i ON i.recipe_id = r.id WHERE {where} "
+            "ORDER BY r.rowid, i.position", params)
+        for (recipe_id, category, total_time, rating), group in groupby(rows, key=lambda row: row[:4]):
+            yield recipe_id, category, total_time, rating, [row[4] for row in group if row[4] is not None]
+
+    def shopping_rows(self, start_date: date, end_date: date) -> Iterator[tuple]:
+        """Yield (recipe_id, recipe_name, ingredient, amount) for meals in [start_date, end_date)"""
+        yield from self.conn.execute(
+            "SELECT r.id, r.name, i.name, i.amount FROM meal_plan m "
+            "JOIN recipes r ON r.id = m.recipe_id "
+            "JOIN ingredients i ON i.recipe_id = r.id "
+            "WHERE m.date >= ? AND m.date < ? "
+            "ORDER BY m.date, m.rowid, i.position",
+            (start_date.isoformat(), end_date.isoformat()))
+
+    def recipe_stats(self) -> Dict[str, any]:
+        total_recipes, total_time = self.conn.execute(
+            "SELECT COUNT(*), COALESCE(SUM(total_time), 0) FROM recipes").fetchone()
+        rated_count, total_rating = self.conn.execute(
+            "SELECT COUNT(*), COALESCE(SUM(rating), 0) FROM recipes WHERE rating > 0").fetchone()
+        categories = dict(self.conn.execute(
+            "SELECT category, COUNT(*) FROM recipes GROUP BY category ORDER BY MIN(rowid)"))
+        return {
+            "total_recipes": total_recipes,
+            "categories": categories,
+            "total_time": total_time,
+            "rated_recipes": rated_count,
+            "total_rating": total_rating
+        }
+
+
+def open_storage(path: str, compression: Optional[str] = None):
+    """Pick a storage backend from the data file extension"""
+    if os.path.splitext(path)[1].lower() in ('.db', '.sqlite', '.sqlite3'):
+        return SqliteStorage(path)
+    return JsonStorage(path, compression)
+
+
+def migrate_json_to_sqlite(json_path: str, db_path: str) -> int:
+    """Copy a JSON data file into a (new or existing) SQLite database"""
+    data = JsonStorage(json_path).load() or {}
+    storage = SqliteStorage(db_path)
+    try:
+        with storage.conn:
+            count = 0
+            for recipe_data in data.get('recipes', []):
+                storage.put_recipe(Recipe.from_dict(recipe_data), commit=False)
+                count += 1
+            for date_str, meals in data.get('meal_plan', {}).get('meals', {}).items():
+                for meal_type, recipe_id in meals.items():
+                    storage.apply_op({'op': 'add_meal', 'date': date_str,
+                                      'meal_type': meal_type, 'recipe_id': recipe_id}, commit=False)
+    finally:
+        storage.close()
+    return count
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 3:
+        print("Usage: python storage.py <recipes_data.json> <recipes_data.db>")
+        sys.exit(1)
+    migrated = migrate_json_to_sqlite(sys.argv[1], sys.argv[2])
+    print(f"Migrated {migrated} recipes from {sys.argv[1]} to {sys.argv[2]}")
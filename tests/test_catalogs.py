@@ -0,0 +1,133 @@
+"""Eviction and reopening of the same catalog from several threads.
+
+Run with: python -m unittest discover tests
+"""
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+import unittest
+from contextlib import redirect_stdout
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import catalogs
+from catalogs import CatalogRegistry
+from models import Recipe
+from recipe_manager import RecipeManager
+
+
+class TrackedManager(RecipeManager):
+    """RecipeManager that fails the test if two are open on one data file at once"""
+
+    guard = threading.Lock()
+    open_paths = set()
+    opened = []  # data files, one entry per manager opened
+    overlaps = []  # data files opened while another manager still had them open
+    before_close = None  # called with the data file before a manager closes
+
+    def __init__(self, data_file, **options):
+        with self.guard:
+            if data_file in self.open_paths:
+                self.overlaps.append(data_file)
+            self.open_paths.add(data_file)
+            self.opened.append(data_file)
+        super().__init__(data_file, **options)
+
+    def close(self):
+        if self.before_close is not None:
+            self.before_close(self.data_file)
+        super().close()
+        with self.guard:
+            self.open_paths.discard(self.data_file)
+
+
+class EvictionRaceTest(unittest.TestCase):
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        TrackedManager.open_paths = set()
+        TrackedManager.opened = []
+        TrackedManager.overlaps = []
+        TrackedManager.before_close = None
+        patcher = mock.patch.object(catalogs, 'RecipeManager', TrackedManager)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        devnull = open(os.devnull, 'w')
+        self.addCleanup(devnull.close)
+        quiet = redirect_stdout(devnull)
+        quiet.__enter__()
+        self.addCleanup(quiet.__exit__, None, None, None)
+
+    def test_reopen_waits_for_eviction_to_finish(self):
+        registry = CatalogRegistry(self.root, max_open=1)
+        with registry.catalog('a') as manager:
+            manager.add_recipe(Recipe("Soup", {"water": "1 l"}, ["boil"], 1, 2, 3))
+        path_a = registry.path_of('a')
+
+        closing, finish_closing = threading.Event(), threading.Event()
+
+        def before_close(data_file):
+            if data_file == path_a:
+                closing.set()
+                finish_closing.wait(5)
+
+        TrackedManager.before_close = staticmethod(before_close)
+        # Opening b evicts a, whose close is held until finish_closing
+        evictor = threading.Thread(target=self._use, args=(registry, 'b'))
+        evictor.start()
+        self.assertTrue(closing.wait(5))
+
+        reopened = []
+        reopener = threading.Thread(target=self._use, args=(registry, 'a', reopened))
+        reopener.start()
+        reopener.join(0.2)
+        self.assertTrue(reopener.is_alive(), "a was reopened while it was still closing")
+        self.assertEqual(TrackedManager.opened.count(path_a), 1)
+
+        finish_closing.set()
+        evictor.join(5)
+        reopener.join(5)
+        self.assertEqual(TrackedManager.overlaps, [])
+        self.assertEqual(TrackedManager.opened.count(path_a), 2)
+        self.assertEqual(reopened, ["Soup"])
+        registry.close()
+        self.assertEqual(TrackedManager.open_paths, set())
+
+    def test_concurrent_eviction_and_reopening(self):
+        registry = CatalogRegistry(self.root, max_open=1)
+        names = ['a', 'b', 'c']
+        failures = []
+        # A slow close leaves room for another thread to ask for the catalog
+        TrackedManager.before_close = staticmethod(lambda data_file: time.sleep(0.002))
+
+        def worker(seed):
+            rng = random.Random(seed)
+            try:
+                for _ in range(30):
+                    self._use(registry, rng.choice(names))
+            except Exception as e:
+                failures.append(e)
+
+        threads = [threading.Thread(target=worker, args=(seed,)) for seed in range(6)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join(60)
+        registry.close()
+        self.assertEqual(failures, [])
+        self.assertEqual(TrackedManager.overlaps, [])
+        self.assertEqual(TrackedManager.open_paths, set())
+        self.assertGreater(registry.evictions, 0)
+
+    @staticmethod
+    def _use(registry, name, names=None):
+        with registry.catalog(name) as manager:
+            if names is not None:
+                names.extend(recipe.name for recipe in manager.recipes.values())
+
+
+if __name__ == '__main__':
+    unittest.main()